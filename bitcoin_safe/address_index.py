@@ -0,0 +1,116 @@
+#
+# Bitcoin Safe
+# Copyright (C) 2024 Andreas Griffin
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of version 3 of the GNU General Public License as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see https://www.gnu.org/licenses/gpl-3.0.html
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS
+# BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN
+# ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+# CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+import itertools
+import threading
+from typing import Dict, List, Optional, Tuple
+
+import bdkpython as bdk
+
+
+class AddressIndex:
+    """Maps address -> (wallet id, keychain, index) for all open wallets.
+
+    Every wallet instance registers with its own key, since several wallet
+    instances can have the same id (e.g. while the descriptor is edited).
+    A wallet extends its entries whenever it derives (or peeks) further
+    addresses, so lookups are a dict access, also for look-ahead addresses
+    beyond the tip.
+    """
+
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self._keys = itertools.count()
+        # address -> {key: (keychain, index)}
+        self._index: Dict[str, Dict[int, Tuple[bdk.KeychainKind, int]]] = {}
+        # key -> wallet id
+        self._wallet_ids: Dict[int, str] = {}
+        # key -> {keychain: [address of index 0, 1, ...]}
+        self._addresses: Dict[int, Dict[bdk.KeychainKind, List[str]]] = {}
+
+    def register(self, wallet_id: str) -> int:
+        "Returns the key of the wallet instance"
+        with self.lock:
+            key = next(self._keys)
+            self._wallet_ids[key] = wallet_id
+            self._addresses[key] = {bdk.KeychainKind.EXTERNAL: [], bdk.KeychainKind.INTERNAL: []}
+            return key
+
+    def set_wallet_id(self, key: int, wallet_id: str) -> None:
+        with self.lock:
+            if key in self._wallet_ids:
+                self._wallet_ids[key] = wallet_id
+
+    def remove(self, key: int) -> None:
+        with self.lock:
+            self._wallet_ids.pop(key, None)
+            for addresses in self._addresses.pop(key, {}).values():
+                for address in addresses:
+                    entries = self._index.get(address)
+                    if entries is None:
+                        continue
+                    entries.pop(key, None)
+                    if not entries:
+                        del self._index[address]
+
+    def count(self, key: int, keychain: bdk.KeychainKind) -> int:
+        "The number of indexed addresses of the keychain"
+        with self.lock:
+            return len(self._addresses.get(key, {}).get(keychain, []))
+
+    def extend(self, key: int, keychain: bdk.KeychainKind, start: int, addresses: List[str]) -> None:
+        """Indexes addresses, where addresses[0] has the derivation index start.
+
+        Addresses that are indexed already are skipped.
+        """
+        with self.lock:
+            indexed = self._addresses.get(key, {}).get(keychain)
+            if indexed is None or start > len(indexed):
+                return
+            for index in range(len(indexed), start + len(addresses)):
+                address = addresses[index - start]
+                indexed.append(address)
+                self._index.setdefault(address, {})[key] = (keychain, index)
+
+    def get(self, key: int, address: str) -> Optional[Tuple[bdk.KeychainKind, int]]:
+        "Returns (keychain, index) of the address in the wallet instance"
+        entries = self._index.get(address)
+        return entries.get(key) if entries else None
+
+    def lookup(self, address: str) -> List[Tuple[str, bdk.KeychainKind, int]]:
+        "Returns [(wallet id, keychain, index)] of all wallets that derived the address"
+        with self.lock:
+            return [
+                (self._wallet_ids[key], keychain, index)
+                for key, (keychain, index) in self._index.get(address, {}).items()
+            ]
+
+
+# all wallets share this index
+address_index = AddressIndex()
@@ -0,0 +1,177 @@
+#
+# Bitcoin Safe
+# Copyright (C) 2024 Andreas Griffin
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of version 3 of the GNU General Public License as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see https://www.gnu.org/licenses/gpl-3.0.html
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS
+# BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN
+# ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+# CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+import bdkpython as bdk
+
+logger = logging.getLogger(__name__)
+
+
+class _PooledBlockchain:
+    def __init__(self) -> None:
+        # None until the connection is opened (outside of the lock)
+        self.blockchain: Optional[bdk.Blockchain] = None
+        self.in_use = False
+        self.last_ok = time.monotonic()
+
+
+class BlockchainPool:
+    """Shares bdk.Blockchain connections between all wallets.
+
+    Connections are keyed by the blockchain config (str(bdk.BlockchainConfig)),
+    so all wallets with identical server settings reuse the same connections,
+    and a changed network config simply leads to new connections.
+
+    - connection() checks out a connection exclusively (for syncing). At most
+      max_per_key connections per key are opened, further callers wait.
+    - get() returns a connection for short calls (broadcast, get_height),
+      that may be shared with a running sync.
+
+    A connection that was not used for health_check_interval seconds is
+    checked with get_height() before it is handed out, and connections
+    that raised an exception are dropped and rebuilt lazily.
+    """
+
+    def __init__(
+        self, max_per_key: int = 2, health_check_interval: float = 30, max_idle: float = 10 * 60
+    ) -> None:
+        self.max_per_key = max_per_key
+        self.health_check_interval = health_check_interval
+        self.max_idle = max_idle
+        self._condition = threading.Condition()
+        self._entries: Dict[str, List[_PooledBlockchain]] = {}
+
+    @staticmethod
+    def _is_healthy(blockchain: Optional[bdk.Blockchain]) -> bool:
+        if blockchain is None:
+            return False
+        try:
+            blockchain.get_height()
+            return True
+        except Exception as e:
+            logger.warning(f"Dropping blockchain connection, because of {e}")
+            return False
+
+    def _prune_idle(self) -> None:
+        now = time.monotonic()
+        for key, entries in list(self._entries.items()):
+            entries[:] = [entry for entry in entries if entry.in_use or now - entry.last_ok < self.max_idle]
+            if not entries:
+                del self._entries[key]
+
+    def _remove(self, key: str, entry: _PooledBlockchain) -> None:
+        with self._condition:
+            entries = self._entries.get(key, [])
+            if entry in entries:
+                entries.remove(entry)
+            self._condition.notify_all()
+
+    def _checked(self, entry: _PooledBlockchain, factory: Callable[[], bdk.Blockchain]) -> bdk.Blockchain:
+        "Returns the blockchain of entry, which is (re)opened if it fails the health check"
+        if entry.blockchain is None:
+            logger.info("Opening a new blockchain connection")
+            entry.blockchain = factory()
+        elif time.monotonic() - entry.last_ok >= self.health_check_interval and not self._is_healthy(
+            entry.blockchain
+        ):
+            entry.blockchain = factory()
+        entry.last_ok = time.monotonic()
+        return entry.blockchain
+
+    def _acquire(
+        self, key: str, factory: Callable[[], bdk.Blockchain]
+    ) -> Tuple[_PooledBlockchain, bdk.Blockchain]:
+        with self._condition:
+            self._prune_idle()
+            while True:
+                entries = self._entries.setdefault(key, [])
+                idle = [entry for entry in entries if not entry.in_use]
+                if idle:
+                    entry = idle[0]
+                    break
+                if len(entries) < self.max_per_key:
+                    entry = _PooledBlockchain()
+                    entries.append(entry)
+                    break
+                self._condition.wait()
+            entry.in_use = True
+
+        try:
+            return entry, self._checked(entry, factory)
+        except Exception:
+            self._remove(key, entry)
+            raise
+
+    def _release(self, key: str, entry: _PooledBlockchain, ok: bool) -> None:
+        if not ok:
+            # the connection might be broken. It is rebuilt when needed
+            self._remove(key, entry)
+            return
+        with self._condition:
+            entry.in_use = False
+            entry.last_ok = time.monotonic()
+            self._condition.notify_all()
+
+    @contextmanager
+    def connection(self, key: str, factory: Callable[[], bdk.Blockchain]) -> Iterator[bdk.Blockchain]:
+        entry, blockchain = self._acquire(key, factory)
+        ok = False
+        try:
+            yield blockchain
+            ok = True
+        finally:
+            self._release(key, entry, ok=ok)
+
+    def get(self, key: str, factory: Callable[[], bdk.Blockchain]) -> bdk.Blockchain:
+        with self._condition:
+            entries = [entry for entry in self._entries.get(key, []) if entry.blockchain is not None]
+            entry: Optional[_PooledBlockchain] = next(
+                (entry for entry in entries if not entry.in_use), entries[0] if entries else None
+            )
+        if entry is None:
+            with self.connection(key, factory) as blockchain:
+                return blockchain
+        if entry.in_use and entry.blockchain:
+            # a running sync proves that the connection works
+            return entry.blockchain
+        return self._checked(entry, factory)
+
+    def clear(self) -> None:
+        with self._condition:
+            self._entries.clear()
+            self._condition.notify_all()
+
+
+# all wallets share this pool
+blockchain_pool = BlockchainPool()
@@ -0,0 +1,209 @@
+#
+# Bitcoin Safe
+# Copyright (C) 2024 Andreas Griffin
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of version 3 of the GNU General Public License as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see https://www.gnu.org/licenses/gpl-3.0.html
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS
+# BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN
+# ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+# CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+import logging
+import random
+from math import ceil, inf
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .psbt_util import estimate_tx_weight
+
+logger = logging.getLogger(__name__)
+
+# the fee rate at which the selected inputs could otherwise be spent in the future
+LONG_TERM_FEE_RATE = 10.0
+
+
+def output_weight(script_length: int) -> int:
+    # value (8 bytes) + script length (1 byte) + script
+    return 4 * (8 + 1 + script_length)
+
+
+class CoinSelector:
+    """Selects inputs out of a pool of utxo values.
+
+    The values are kept in a numpy array, such that the selection scales to
+    pools with 10k's of utxos. The candidates are:
+
+    - branch and bound: searches a changeless selection whose effective value
+      (value minus the fee of spending the input) lies in
+      [target, target + cost_of_change]
+    - single random draw: random utxos until the target is reached
+    - largest first
+
+    Out of these, the selection with the lowest waste is chosen. The waste
+    is the fee of the inputs compared to spending them at
+    long_term_fee_rate, plus either the excess (changeless) or the
+    cost_of_change.
+    """
+
+    max_tries = 100_000
+
+    def __init__(
+        self,
+        values: Sequence[int],
+        input_mn_tuple: Tuple[int, int],
+        recipient_weight: int,
+        change_weight: int,
+        fee_rate: float,
+        long_term_fee_rate: float = LONG_TERM_FEE_RATE,
+    ) -> None:
+        """
+        Args:
+            values (Sequence[int]): The values of the utxos (in Satoshis)
+            input_mn_tuple (Tuple[int, int]): (m, n) of the wallet, determining the input weight
+            recipient_weight (int): Total weight of the recipient outputs
+            change_weight (int): Weight of a change output
+            fee_rate (float): in Sat/vB
+            long_term_fee_rate (float, optional): in Sat/vB
+        """
+        self.values = np.asarray(values, dtype=np.int64)
+        self.fee_rate = fee_rate
+
+        empty_tx_weight = estimate_tx_weight([], num_outputs=0)
+        input_weight = estimate_tx_weight([input_mn_tuple], num_outputs=0) - empty_tx_weight
+        # the input and output counts are 1 byte each (not included in estimate_tx_weight)
+        self.base_fee = ceil(fee_rate * (empty_tx_weight + recipient_weight + 2 * 4) / 4)
+        self.input_fee = ceil(fee_rate * input_weight / 4)
+        self.input_waste = self.input_fee - ceil(long_term_fee_rate * input_weight / 4)
+        self.change_fee = ceil(fee_rate * change_weight / 4)
+        self.cost_of_change = self.change_fee + ceil(long_term_fee_rate * input_weight / 4)
+
+        self.effective_values = self.values - self.input_fee
+
+    def waste(self, indices: np.ndarray, target: int, has_change: bool) -> float:
+        waste = len(indices) * self.input_waste
+        if has_change:
+            return waste + self.cost_of_change
+        return waste + int(self.effective_values[indices].sum()) - target
+
+    def _accumulate(self, order: np.ndarray, target: int) -> Optional[np.ndarray]:
+        "Selects utxos in the given order, until target is reached"
+        cumsum = np.cumsum(self.effective_values[order])
+        i = int(np.searchsorted(cumsum, target))
+        if i >= len(order):
+            return None
+        return order[: i + 1]
+
+    def branch_and_bound(self, candidates: np.ndarray, target: int) -> Optional[np.ndarray]:
+        """Depth first search (largest values first) for a selection with
+        effective value in [target, target + cost_of_change].
+
+        Follows the algorithm of Bitcoin Core.
+        """
+        order = candidates[np.argsort(-self.effective_values[candidates], kind="stable")]
+        pool = self.effective_values[order].tolist()
+        upper = target + self.cost_of_change
+
+        curr_available = sum(pool)
+        if curr_available < target:
+            return None
+        curr_value = 0
+        curr_waste = 0
+        selection: List[int] = []
+        best_selection: Optional[List[int]] = None
+        best_waste = inf
+
+        i = 0
+        for _ in range(self.max_tries):
+            backtrack = False
+            if (
+                curr_value + curr_available < target
+                or curr_value > upper
+                or (curr_waste > best_waste and self.input_waste > 0)
+            ):
+                backtrack = True
+            elif curr_value >= target:
+                excess = curr_value - target
+                if curr_waste + excess <= best_waste:
+                    best_selection = list(selection)
+                    best_waste = curr_waste + excess
+                backtrack = True
+
+            if backtrack:
+                if not selection:
+                    break
+                # add the omitted utxos back, before trying the omission branch of the last included utxo
+                i -= 1
+                while i > selection[-1]:
+                    curr_available += pool[i]
+                    i -= 1
+                curr_value -= pool[i]
+                curr_waste -= self.input_waste
+                selection.pop()
+            else:
+                curr_available -= pool[i]
+                # skip equivalent branches: the previous utxo has the same value and was excluded
+                if not selection or i - 1 == selection[-1] or pool[i] != pool[i - 1]:
+                    selection.append(i)
+                    curr_value += pool[i]
+                    curr_waste += self.input_waste
+            i += 1
+
+        if best_selection is None:
+            return None
+        return order[best_selection]
+
+    def single_random_draw(self, candidates: np.ndarray, target: int) -> Optional[np.ndarray]:
+        order = list(candidates)
+        random.shuffle(order)
+        return self._accumulate(np.array(order, dtype=np.int64), target)
+
+    def largest_first(self, candidates: np.ndarray, target: int) -> Optional[np.ndarray]:
+        order = candidates[np.argsort(-self.effective_values[candidates], kind="stable")]
+        return self._accumulate(order, target)
+
+    def select(self, amount: int) -> np.ndarray:
+        """Returns the indices of the selected utxos.
+
+        If the utxos are insufficient, all utxos are returned.
+        """
+        target = amount + self.base_fee
+        # utxos that cost more to spend than they are worth are never selected here
+        candidates = np.flatnonzero(self.effective_values > 0)
+
+        best: Optional[np.ndarray] = None
+        best_waste = inf
+        for name, selection, has_change in [
+            ("branch_and_bound", self.branch_and_bound(candidates, target), False),
+            ("single_random_draw", self.single_random_draw(candidates, target + self.change_fee), True),
+            ("largest_first", self.largest_first(candidates, target + self.change_fee), True),
+        ]:
+            if selection is None:
+                continue
+            waste = self.waste(selection, target, has_change=has_change)
+            logger.debug(f"{name} selected {len(selection)} utxos with waste {waste}")
+            if waste < best_waste:
+                best, best_waste = selection, waste
+
+        if best is None:
+            return np.arange(len(self.values))
+        return best
@@ -83,6 +83,8 @@ class UserConfig(BaseSaveableClass):
             network: UniqueDeque(maxlen=RECENT_WALLET_MAXLEN) for network in bdk.Network
         }
         self.language_code: Optional[str] = None
+        # keep the chain data of (unencrypted) wallets on disk, see Wallet._chain_state_db_file
+        self.persist_chain_state = True
 
     def clean_recently_open_wallet(self):
         this_deque = self.recently_open_wallets[self.network]
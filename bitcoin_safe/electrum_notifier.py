@@ -0,0 +1,279 @@
+#
+# Bitcoin Safe
+# Copyright (C) 2024 Andreas Griffin
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of version 3 of the GNU General Public License as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see https://www.gnu.org/licenses/gpl-3.0.html
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS
+# BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN
+# ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+# CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+import hashlib
+import json
+import logging
+import socket
+import ssl
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Iterable, List, Optional, Set, Tuple
+
+import bdkpython as bdk
+from PyQt6.QtCore import QObject, pyqtSignal
+
+from bitcoin_safe.gui.qt.util import get_host_and_port
+from bitcoin_safe.network_config import NetworkConfig
+from bitcoin_safe.typestubs import TypedPyQtSignal
+
+logger = logging.getLogger(__name__)
+
+
+def address_to_scripthash(address: str, network: bdk.Network) -> str:
+    "The electrum scripthash: sha256 of the scriptPubKey, in reversed byte order"
+    script = bytes(bdk.Address(address, network).script_pubkey().to_bytes())
+    return hashlib.sha256(script).digest()[::-1].hex()
+
+
+class ElectrumNotifier(QObject):
+    """Listens for new blocks and changes of the wallet addresses on an Electrum server.
+
+    Uses blockchain.headers.subscribe and blockchain.scripthash.subscribe
+    on a dedicated connection (in a background thread), such that wallets
+    only have to sync if something happened.
+    signal_active_changed tells whether the notifications are working. If
+    not (e.g. the server is not reachable), the wallets should fall back
+    to polling.  The connection is retried with exponential backoff.
+    """
+
+    signal_new_block: TypedPyQtSignal[int] = pyqtSignal(int)  # type: ignore  # height
+    signal_wallet_changed: TypedPyQtSignal[str] = pyqtSignal(str)  # type: ignore  # wallet_id
+    signal_active_changed: TypedPyQtSignal[bool] = pyqtSignal(bool)  # type: ignore
+
+    def __init__(
+        self,
+        network_config: NetworkConfig,
+        timeout: float | None = None,
+        ping_interval: float = 60,
+        max_retry_delay: float = 5 * 60,
+        parent: QObject | None = None,
+    ) -> None:
+        super().__init__(parent)
+        self.network = network_config.network
+        self.host, self.port = get_host_and_port(network_config.electrum_url)
+        self.use_ssl = network_config.electrum_use_ssl
+        self.timeout = timeout if timeout else network_config.get_timeout()
+        self.ping_interval = ping_interval
+        self.max_retry_delay = max_retry_delay
+        self.is_active = False
+
+        # the lock protects everything that is accessed by the main thread and the listening thread
+        self._lock = threading.Lock()
+        self._address_to_scripthash: Dict[str, str] = {}
+        self._wallet_scripthashes: Dict[str, Set[str]] = {}
+        self._scripthash_wallet_ids: Dict[str, Set[str]] = {}
+        self._statuses: Dict[str, Optional[str]] = {}
+        self._outgoing: Deque[Tuple[str, List[Any]]] = deque()
+
+        # only accessed by the listening thread
+        self._requests: Dict[int, Tuple[str, List[Any]]] = {}
+        self._next_id = 0
+        self._height: Optional[int] = None
+
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._sock: Optional[socket.socket] = None
+
+    def start(self) -> None:
+        if self._thread or not self.host or not self.port:
+            return
+        self._thread = threading.Thread(target=self._run, name=self.__class__.__name__, daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=self.timeout)
+        self._thread = None
+
+    def _scripthash(self, address: str) -> str:
+        scripthash = self._address_to_scripthash.get(address)
+        if scripthash is None:
+            scripthash = self._address_to_scripthash[address] = address_to_scripthash(address, self.network)
+        return scripthash
+
+    def watch_addresses(self, wallet_id: str, addresses: Iterable[str]) -> None:
+        "Sets the addresses of wallet_id.  Only new scripthashes are sent to the server."
+        scripthashes = {self._scripthash(address) for address in addresses}
+        with self._lock:
+            for scripthash in self._wallet_scripthashes.get(wallet_id, set()) - scripthashes:
+                self._remove_wallet_from_scripthash(wallet_id, scripthash)
+            for scripthash in scripthashes - self._wallet_scripthashes.get(wallet_id, set()):
+                if scripthash not in self._scripthash_wallet_ids:
+                    self._outgoing.append(("blockchain.scripthash.subscribe", [scripthash]))
+                self._scripthash_wallet_ids.setdefault(scripthash, set()).add(wallet_id)
+            self._wallet_scripthashes[wallet_id] = scripthashes
+
+    def unwatch_wallet(self, wallet_id: str) -> None:
+        with self._lock:
+            for scripthash in self._wallet_scripthashes.pop(wallet_id, set()):
+                self._remove_wallet_from_scripthash(wallet_id, scripthash)
+
+    def _remove_wallet_from_scripthash(self, wallet_id: str, scripthash: str) -> None:
+        wallet_ids = self._scripthash_wallet_ids.get(scripthash, set())
+        wallet_ids.discard(wallet_id)
+        if not wallet_ids:
+            # the electrum protocol 1.4 has no unsubscribe. Notifications for it are ignored
+            self._scripthash_wallet_ids.pop(scripthash, None)
+            self._statuses.pop(scripthash, None)
+
+    def _set_active(self, is_active: bool) -> None:
+        if self.is_active == is_active:
+            return
+        self.is_active = is_active
+        logger.info(f"Electrum push notifications active = {is_active}")
+        self.signal_active_changed.emit(is_active)
+
+    def _run(self) -> None:
+        retry_delay = 1.0
+        while not self._stop.is_set():
+            try:
+                self._listen()
+            except Exception as e:
+                logger.info(f"Electrum notification connection to {self.host}:{self.port} failed: {e}")
+            finally:
+                if self._sock:
+                    self._sock.close()
+                    self._sock = None
+            if self.is_active:
+                retry_delay = 1.0
+            self._set_active(False)
+            if self._stop.wait(retry_delay):
+                break
+            retry_delay = min(retry_delay * 2, self.max_retry_delay)
+
+    def _open_socket(self) -> socket.socket:
+        assert self.host and self.port
+        sock = socket.create_connection((self.host, self.port), timeout=self.timeout)
+        if self.use_ssl:
+            context = ssl.create_default_context()
+            context.minimum_version = ssl.TLSVersion.TLSv1_2
+            sock = context.wrap_socket(sock, server_hostname=self.host)
+        # short timeout, such that outgoing messages and stop() are handled quickly
+        sock.settimeout(0.5)
+        return sock
+
+    def _listen(self) -> None:
+        self._sock = sock = self._open_socket()
+        self._requests.clear()
+        with self._lock:
+            # (re)subscribe everything
+            self._outgoing = deque(
+                [("server.version", ["Bitcoin Safe", "1.4"]), ("blockchain.headers.subscribe", [])]
+                + [
+                    ("blockchain.scripthash.subscribe", [scripthash])
+                    for scripthash in self._scripthash_wallet_ids
+                ]
+            )
+
+        buffer = b""
+        last_sent = time.monotonic()
+        while not self._stop.is_set():
+            if self._flush(sock):
+                last_sent = time.monotonic()
+            elif time.monotonic() - last_sent > self.ping_interval:
+                with self._lock:
+                    self._outgoing.append(("server.ping", []))
+                continue
+
+            try:
+                data = sock.recv(65536)
+            except (socket.timeout, ssl.SSLWantReadError):
+                continue
+            if not data:
+                raise ConnectionError("Connection closed by the server")
+            buffer += data
+            *lines, buffer = buffer.split(b"\n")
+            for line in lines:
+                if line.strip():
+                    self._handle_message(json.loads(line))
+
+    def _flush(self, sock: socket.socket) -> bool:
+        with self._lock:
+            outgoing = list(self._outgoing)
+            self._outgoing.clear()
+        if not outgoing:
+            return False
+        lines = []
+        for method, params in outgoing:
+            self._next_id += 1
+            self._requests[self._next_id] = (method, params)
+            lines.append(
+                json.dumps({"jsonrpc": "2.0", "id": self._next_id, "method": method, "params": params})
+            )
+        sock.sendall(("\n".join(lines) + "\n").encode())
+        return True
+
+    def _handle_message(self, message: Dict[str, Any]) -> None:
+        if "method" in message:
+            # a notification
+            params = message.get("params", [])
+            if message["method"] == "blockchain.headers.subscribe" and params:
+                self._on_header(params[0])
+            elif message["method"] == "blockchain.scripthash.subscribe" and len(params) >= 2:
+                self._on_status(params[0], params[1])
+            return
+
+        request = self._requests.pop(message.get("id"), None)  # type: ignore
+        if not request:
+            return
+        method, params = request
+        if message.get("error"):
+            if method == "blockchain.headers.subscribe":
+                raise ConnectionError(f"{method} failed: {message['error']}")
+            logger.warning(f"{method} failed: {message['error']}")
+            return
+        if method == "blockchain.headers.subscribe":
+            self._on_header(message.get("result"))
+            self._set_active(True)
+        elif method == "blockchain.scripthash.subscribe":
+            self._on_status(params[0], message.get("result"))
+
+    def _on_header(self, header: Any) -> None:
+        if not isinstance(header, dict) or "height" not in header:
+            return
+        height = int(header["height"])
+        # the first header only sets the reference
+        is_new = self._height is not None and height > self._height
+        self._height = max(height, self._height or 0)
+        if is_new:
+            self.signal_new_block.emit(height)
+
+    def _on_status(self, scripthash: str, status: Optional[str]) -> None:
+        with self._lock:
+            if scripthash not in self._scripthash_wallet_ids:
+                return
+            # the first status only sets the reference
+            changed = scripthash in self._statuses and self._statuses[scripthash] != status
+            self._statuses[scripthash] = status
+            wallet_ids = list(self._scripthash_wallet_ids[scripthash]) if changed else []
+        for wallet_id in wallet_ids:
+            self.signal_wallet_changed.emit(wallet_id)
@@ -0,0 +1,133 @@
+#
+# Bitcoin Safe
+# Copyright (C) 2024 Andreas Griffin
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of version 3 of the GNU General Public License as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see https://www.gnu.org/licenses/gpl-3.0.html
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS
+# BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN
+# ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+# CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+import logging
+import threading
+from typing import Dict, List, Optional, Sequence
+
+import bdkpython as bdk
+import numpy as np
+
+from .util import calculate_ema
+
+logger = logging.getLogger(__name__)
+
+
+class FeeStats:
+    """Columnar fee data of the wallet transactions (sorted from old to new).
+
+    update() re-reads the fields of the transactions (which are plain python
+    attributes and can be modified in place), but the vsize (which is an ffi
+    call) is remembered per txid.  Wallet.clear_cache() clears the stats.
+    """
+
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self._vsizes: Dict[str, int] = {}
+
+        # nan if the fee is unknown
+        self.fee = np.empty(0, dtype=np.float64)
+        self.vsize = np.empty(0, dtype=np.int64)
+        # 0 if unconfirmed
+        self.height = np.empty(0, dtype=np.int64)
+        self.timestamp = np.empty(0, dtype=np.int64)
+        self.sent = np.empty(0, dtype=np.int64)
+        self.received = np.empty(0, dtype=np.int64)
+
+    def clear(self) -> None:
+        with self.lock:
+            self._vsizes = {}
+            self._set_columns([])
+
+    def __len__(self) -> int:
+        with self.lock:
+            return len(self.fee)
+
+    def _get_vsize(self, tx: bdk.TransactionDetails) -> int:
+        vsize = self._vsizes.get(tx.txid)
+        if vsize is None:
+            vsize = self._vsizes[tx.txid] = tx.transaction.vsize()
+        return vsize
+
+    def _set_columns(self, txs: Sequence[bdk.TransactionDetails]) -> None:
+        self.fee = np.array([np.nan if tx.fee is None else tx.fee for tx in txs], dtype=np.float64)
+        self.vsize = np.array([self._get_vsize(tx) for tx in txs], dtype=np.int64)
+        self.height = np.array(
+            [tx.confirmation_time.height if tx.confirmation_time else 0 for tx in txs], dtype=np.int64
+        )
+        self.timestamp = np.array(
+            [tx.confirmation_time.timestamp if tx.confirmation_time else 0 for tx in txs], dtype=np.int64
+        )
+        self.sent = np.array([tx.sent for tx in txs], dtype=np.int64)
+        self.received = np.array([tx.received for tx in txs], dtype=np.int64)
+
+    def update(self, txs: List[bdk.TransactionDetails]) -> None:
+        "txs must be sorted from old to new"
+        with self.lock:
+            self._set_columns(txs)
+            if len(self._vsizes) > len(txs):
+                # forget the removed txs
+                txids = {tx.txid for tx in txs}
+                self._vsizes = {txid: vsize for txid, vsize in self._vsizes.items() if txid in txids}
+
+    def _fee_rates(self) -> np.ndarray:
+        return self.fee / np.maximum(self.vsize, 1)
+
+    def fee_rates(self) -> np.ndarray:
+        "Sat/vB for each transaction, nan if the fee is unknown"
+        with self.lock:
+            return self._fee_rates()
+
+    def ema_fee_rate(
+        self, n: int = 10, weight_sent: float = 10, weight_incoming: float = 1
+    ) -> Optional[float]:
+        """Exponential Moving Average (EMA) of the fee rate of all transactions
+        with a known fee.
+
+        The outgoing transactions are weighted heavier than the incoming
+        transactions, because Exchanges typically overpay fees.
+        """
+        with self.lock:
+            fee_rates = self._fee_rates()
+            known = ~np.isnan(fee_rates)
+            if not known.any():
+                return None
+            weights = np.where(self.sent[known] > 0, weight_sent, weight_incoming)
+            return calculate_ema(fee_rates[known], n=n, weights=weights)
+
+    def percentile_fee_rate(self, q: float, only_sent: bool = False) -> Optional[float]:
+        "The q-th percentile (0..100) of the fee rates of the transactions with a known fee"
+        with self.lock:
+            fee_rates = self._fee_rates()
+            mask = ~np.isnan(fee_rates)
+            if only_sent:
+                mask &= self.sent > 0
+            if not mask.any():
+                return None
+            return float(np.percentile(fee_rates[mask], q))
@@ -235,6 +235,13 @@ class AddressList(MyTreeView):
     }
 
     hidden_columns = [Columns.INDEX]
+    lazy_columns = {
+        Columns.CATEGORY,
+        Columns.LABEL,
+        Columns.COIN_BALANCE,
+        Columns.FIAT_BALANCE,
+        Columns.NUM_TXS,
+    }
 
     stretch_column = Columns.LABEL
     key_column = Columns.ADDRESS
@@ -374,16 +381,9 @@ class AddressList(MyTreeView):
         self.update_content()
 
     def on_update_fx_rates(self):
-        addresses_with_balance = []
-
-        model = self.sourceModel()
-        for row in range(model.rowCount()):
-            address = model.data(model.index(row, self.Columns.ADDRESS))
-            balance = model.data(
-                model.index(row, self.Columns.COIN_BALANCE), role=MyItemDataRole.ROLE_CLIPBOARD_DATA
-            )
-            if balance:
-                addresses_with_balance.append(address)
+        addresses_with_balance = [
+            address for address in self.sourceModel().keys() if self.wallet.get_addr_balance(address).total
+        ]
 
         update_filter = UpdateFilter(addresses=addresses_with_balance, reason=UpdateFilterReason.NewFxRates)
         self.update_with_filter(update_filter)
@@ -395,28 +395,25 @@ class AddressList(MyTreeView):
         logger.debug(f"{self.__class__.__name__}  update_with_filter {update_filter}")
 
         self._before_update_content()
-        remaining_addresses = set(update_filter.addresses)
-
         model = self.sourceModel()
+        remaining_addresses = {
+            address for address in update_filter.addresses if model.row_of_key(address) is None
+        }
+
+        if len(update_filter.categories) > 1:
+            rows = self.rows_to_refresh(update_filter, keys=model.keys())
+        elif update_filter.addresses:
+            # the categories only matter if no addresses are given
+            rows = self.rows_to_refresh(
+                UpdateFilter(addresses=update_filter.addresses, reason=update_filter.reason)
+            )
+        else:
+            rows = self.rows_to_refresh(update_filter)
+
         log_info = []
-        # Select rows with an ID in id_list
-        for row in range(model.rowCount()):
-            address = model.data(model.index(row, self.Columns.ADDRESS))
-            address_match = address in update_filter.addresses
-            category_match = model.data(model.index(row, self.Columns.CATEGORY)) in update_filter.categories
-            if (
-                (
-                    update_filter.reason == UpdateFilterReason.ChainHeightAdvanced
-                    and model.data(
-                        model.index(row, self.key_column), role=MyItemDataRole.ROLE_FREQUENT_UPDATEFLAG
-                    )
-                )
-                or address_match
-                or (not update_filter.addresses and category_match or len(update_filter.categories) > 1)
-            ):
-                log_info.append((row, address))
-                self.refresh_row(address, row)
-                remaining_addresses = remaining_addresses - set([address])
+        for address, row in rows.items():
+            log_info.append((row, address))
+            self.refresh_row(address, row)
 
         # get_maximum_index
         # address_infos_min = max([self.wallet.get_address_info_min( address) for address in remaining_addresses ])
@@ -481,7 +478,11 @@ class AddressList(MyTreeView):
             return
         labels = [""] * len(self.Columns)
         labels[self.Columns.ADDRESS] = address
+        # the default sort column is filled eagerly, such that sorting doesn't refresh every row
+        labels[self.Columns.COIN_BALANCE] = str(Satoshis(balance, self.wallet.network))
         item = [QStandardItem(e) for e in labels]
+        item[self.key_column].setData(address, MyItemDataRole.ROLE_KEY)
+        item[self.Columns.COIN_BALANCE].setData(balance, MyItemDataRole.ROLE_SORT_ORDER)
         item[self.Columns.ADDRESS].setData(address, MyItemDataRole.ROLE_CLIPBOARD_DATA)
         # align text and set fonts
         # for i, item in enumerate(item):
@@ -502,7 +503,6 @@ class AddressList(MyTreeView):
                 item[self.Columns.TYPE].setText(self.tr("receiving"))
                 item[self.Columns.TYPE].setData(self.tr("receiving"), MyItemDataRole.ROLE_CLIPBOARD_DATA)
                 item[self.Columns.TYPE].setBackground(ColorScheme.GREEN.as_color(True))
-            item[self.key_column].setData(address, MyItemDataRole.ROLE_KEY)
             item[self.Columns.TYPE].setData(
                 (address_info_min.address_path()[0], -address_info_min.address_path()[1]),
                 MyItemDataRole.ROLE_SORT_ORDER,
@@ -510,10 +510,7 @@ class AddressList(MyTreeView):
             item[self.Columns.TYPE].setToolTip(
                 f"""{address_info_min.address_path()[1]}. {self.tr("change address") if address_info_min.address_path()[0] else   self.tr('receiving address')}"""
             )
-        # add item
-        count = self._source_model.rowCount()
-        self._source_model.insertRow(count, item)
-        self.refresh_row(address, count)
+        self.append_row(item)
 
     def refresh_row(self, key: str, row: int) -> None:
         assert row is not None
@@ -545,6 +542,10 @@ class AddressList(MyTreeView):
             if dollar_amount is not None
             else ""
         )
+        self._source_model.set_row_index(
+            key, addresses=[address], categories=[category], frequent=needs_frequent_flag(status=min_status)
+        )
+
         _item = [self._source_model.item(row, col) for col in self.Columns]
         item = [entry for entry in _item if entry]
         if needs_frequent_flag(status=min_status):
@@ -0,0 +1,159 @@
+#
+# Bitcoin Safe
+# Copyright (C) 2024 Andreas Griffin
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of version 3 of the GNU General Public License as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see https://www.gnu.org/licenses/gpl-3.0.html
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS
+# BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN
+# ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+# CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+import logging
+import threading
+import time
+from typing import Any, Callable, Optional
+
+from PyQt6.QtCore import QObject, QTimer, pyqtSignal
+
+from bitcoin_safe.execute_config import ENABLE_THREADING
+from bitcoin_safe.gui.qt.util import custom_exception_handler
+from bitcoin_safe.threading_manager import TaskThread, ThreadingManager
+from bitcoin_safe.typestubs import TypedPyQtSignal
+
+logger = logging.getLogger(__name__)
+
+
+class BackgroundSaver(QObject, ThreadingManager):
+    """Saves in a background thread.
+
+    - request_save() debounces: a burst of requests leads to 1 save,
+      debounce_ms after the last request.
+    - The snapshot is taken in the main thread (it must be cheap and not
+      change afterwards). write(snapshot) runs in a background thread.
+    - A snapshot is never overwritten by an older one.
+    - save_now() saves in the main thread, e.g. before closing.
+    """
+
+    # seconds from the snapshot until the write finished
+    signal_saved: TypedPyQtSignal[float] = pyqtSignal(float)  # type: ignore
+
+    def __init__(
+        self,
+        get_snapshot: Callable[[], Optional[Any]],
+        write: Callable[[Any], None],
+        debounce_ms: int = 2000,
+        threading_parent: ThreadingManager | None = None,
+        enable_threading: bool = ENABLE_THREADING,
+        parent: QObject | None = None,
+    ) -> None:
+        super().__init__(parent=parent, threading_parent=threading_parent)
+        self.get_snapshot = get_snapshot
+        self.write = write
+        self.enable_threading = enable_threading
+        self.last_save_duration: Optional[float] = None
+
+        self._write_lock = threading.Lock()
+        self._sequence = 0
+        self._written_sequence = 0
+        self._running = False
+        self._save_again = False
+
+        self.timer_debounce = QTimer(self)
+        self.timer_debounce.setSingleShot(True)
+        self.timer_debounce.setInterval(debounce_ms)
+        self.timer_debounce.timeout.connect(self.save_in_background)
+
+    def has_pending_save(self) -> bool:
+        return self.timer_debounce.isActive() or self._save_again
+
+    def request_save(self) -> None:
+        self.timer_debounce.start()
+
+    def _take_snapshot(self) -> Optional[tuple[int, float, Any]]:
+        snapshot = self.get_snapshot()
+        if snapshot is None:
+            return None
+        self._sequence += 1
+        return self._sequence, time.monotonic(), snapshot
+
+    def _write(self, sequence: int, start_time: float, snapshot: Any) -> Optional[float]:
+        "Returns the duration, or None if a newer snapshot was written already"
+        with self._write_lock:
+            if sequence <= self._written_sequence:
+                return None
+            self.write(snapshot)
+            self._written_sequence = sequence
+        return time.monotonic() - start_time
+
+    def _on_saved(self, duration: Optional[float]) -> None:
+        if duration is None:
+            return
+        self.last_save_duration = duration
+        logger.info(f"Saved in {duration:.3f}s")
+        self.signal_saved.emit(duration)
+
+    def save_in_background(self) -> None:
+        self.timer_debounce.stop()
+        if self._running:
+            # the snapshot of the running save might be outdated
+            self._save_again = True
+            return
+        self._save_again = False
+
+        snapshot = self._take_snapshot()
+        if snapshot is None:
+            return
+
+        def do() -> Optional[float]:
+            return self._write(*snapshot)
+
+        def on_done(result) -> None:
+            self._running = False
+            if self._save_again:
+                self.save_in_background()
+
+        def on_error(packed_error_info) -> None:
+            self._running = False
+            custom_exception_handler(*packed_error_info)
+            if self._save_again:
+                self.save_in_background()
+
+        self._running = True
+        self.append_thread(
+            TaskThread(enable_threading=self.enable_threading).add_and_start(
+                do, self._on_saved, on_done, on_error
+            )
+        )
+
+    def save_now(self) -> None:
+        "Saves the current state in the main thread. Waits for a running background save."
+        self.timer_debounce.stop()
+        self._save_again = False
+        snapshot = self._take_snapshot()
+        if snapshot is None:
+            return
+        self._on_saved(self._write(*snapshot))
+
+    def close(self) -> None:
+        if self.has_pending_save():
+            self.save_now()
+        self.end_threading_manager()
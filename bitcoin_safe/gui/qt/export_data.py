@@ -30,7 +30,7 @@
 import logging
 from datetime import datetime
 from pathlib import Path
-from typing import Any, Callable, Dict, List, Optional, Union
+from typing import Any, Callable, Dict, Hashable, List, Optional, Union
 
 from bitcoin_nostr_chat.bitcoin_dm import BitcoinDM, ChatLabel
 from bitcoin_nostr_chat.ui.ui import short_key
@@ -46,8 +46,10 @@ from bitcoin_safe.i18n import translate
 from bitcoin_safe.threading_manager import TaskThread, ThreadingManager
 from bitcoin_safe.tx import short_tx_id, transaction_to_dict
 from bitcoin_safe.typestubs import TypedPyQtSignal
+from bitcoin_safe.util import hash_string
 from bitcoin_safe.wallet import filename_clean
 
+from .qr_render_cache import qr_render_cache
 from .sync_tab import SyncTab
 
 logger = logging.getLogger(__name__)
@@ -56,10 +58,9 @@ import json
 import os
 
 import bdkpython as bdk
-from bitcoin_qr_tools.qr_generator import QRGenerator
 from nostr_sdk import PublicKey
 from PyQt6.QtCore import Qt, pyqtSignal
-from PyQt6.QtGui import QAction, QIcon
+from PyQt6.QtGui import QAction, QHideEvent, QIcon, QShowEvent
 from PyQt6.QtWidgets import (
     QBoxLayout,
     QComboBox,
@@ -588,6 +589,7 @@ class ExportDataSimple(HorizontalImportExportGroups, ThreadingManager):
         self.serialized = None
         self.qr_types = QrExportTypes.as_list()
         self.wallet_id = wallet_name
+        self.qr_cache_key: Optional[Hashable] = None
         self.set_data(data)
 
         # qr
@@ -729,8 +731,9 @@ class ExportDataSimple(HorizontalImportExportGroups, ThreadingManager):
     def clear_qr(self) -> None:
         self.qr_label.set_images([])
 
-    def generate_qr_fragments(self, data: Data) -> List[str]:
-        qr_export_type = self.combo_qr_type.getCurrentExportType()
+    def generate_qr_fragments(self, data: Data, qr_export_type: Optional[QrExportType] = None) -> List[str]:
+        if qr_export_type is None:
+            qr_export_type = self.combo_qr_type.getCurrentExportType()
         if not qr_export_type:
             return []
 
@@ -758,11 +761,49 @@ class ExportDataSimple(HorizontalImportExportGroups, ThreadingManager):
         else:
             return UnifiedEncoder.generate_fragments_for_qr(data=data, qr_export_type=qr_export_type)
 
+    def get_qr_cache_key(self, data: Data, qr_export_type: QrExportType) -> Hashable:
+        # the descriptor export formats include the wallet_id
+        return (
+            hash_string(f"{data.data_type.name}:{self.wallet_id}:{data.data_as_string()}"),
+            qr_export_type.name,
+        )
+
+    def showEvent(self, e: QShowEvent | None) -> None:
+        super().showEvent(e)
+        qr_render_cache.set_active(self, self.qr_cache_key)
+
+    def hideEvent(self, e: QHideEvent | None) -> None:
+        super().hideEvent(e)
+        # allows evicting the rendered images of hidden tabs
+        qr_render_cache.set_active(self, None)
+
     def lazy_load_qr(self, data: Data) -> None:
+        qr_export_type = self.combo_qr_type.getCurrentExportType()
+        if not qr_export_type:
+            return
+        key = self.qr_cache_key = self.get_qr_cache_key(data, qr_export_type)
+        qr_render_cache.set_active(self, key)
+
+        # e.g. switching back to a previous qr type
+        images = qr_render_cache.get_images(key)
+        if images is not None:
+            if images:
+                self.signal_set_qr_images.emit(images)
+            return
+
+        def on_first_image(image: Optional[str]) -> None:
+            # show the first fragment, while the others are rendered
+            if image is not None and qr_render_cache.is_active(self, key):
+                self.signal_set_qr_images.emit([image])
+
         def do() -> Any:
-            fragments = self.generate_qr_fragments(data=data)
-            images = [QRGenerator.create_qr_svg(fragment) for fragment in fragments]
-            return images
+            return qr_render_cache.render(
+                key,
+                generate_fragments=lambda: self.generate_qr_fragments(
+                    data=data, qr_export_type=qr_export_type
+                ),
+                on_first_image=on_first_image,
+            )
 
         def on_done(result) -> None:
             pass
@@ -771,6 +812,9 @@ class ExportDataSimple(HorizontalImportExportGroups, ThreadingManager):
             Message(packed_error_info, type=MessageType.Error)
 
         def on_success(result) -> None:
+            if self.qr_cache_key != key:
+                # the qr type or data was switched in the meantime
+                return
             if result:
                 if any([(item is None) for item in result]):
                     return self.signal_set_qr_images.emit([])
@@ -29,6 +29,7 @@
 
 import logging
 
+from bitcoin_safe.fee_stats import FeeStats
 from bitcoin_safe.fx import FX
 from bitcoin_safe.gui.qt.notification_bar import NotificationBar
 from bitcoin_safe.gui.qt.util import icon_path
@@ -104,6 +105,7 @@ class FeeGroup(QObject):
         self.allow_edit = allow_edit
         self.config = config
         self.fee_info = fee_info
+        self.fee_stats: FeeStats | None = None
 
         fee_rate = fee_rate if fee_rate else (mempool_data.get_prio_fee_rates()[TxPrio.low])
 
@@ -259,8 +261,25 @@ class FeeGroup(QObject):
         self.set_fiat_fee_label()
         self.set_fee_amount_label()
         self.update_fee_rate_warning()
+        self.update_fee_stats_tooltip()
         self.visible_mempool_buttons.refresh()
 
+    def set_fee_stats(self, fee_stats: FeeStats | None) -> None:
+        "The fee statistics of the wallet history"
+        self.fee_stats = fee_stats
+        self.update_fee_stats_tooltip()
+
+    def update_fee_stats_tooltip(self) -> None:
+        median_fee_rate = self.fee_stats.percentile_fee_rate(50, only_sent=True) if self.fee_stats else None
+        if median_fee_rate is None:
+            self.spin_fee_rate.setToolTip("")
+            return
+        self.spin_fee_rate.setToolTip(
+            self.tr("Your previous transactions paid a median fee rate of {rate}").format(
+                rate=format_fee_rate(median_fee_rate, self.config.network)
+            )
+        )
+
     def set_fiat_fee_label(self) -> None:
         self.fiat_fee_label.setHidden(self.fee_info is None)
         if self.fee_info is None:
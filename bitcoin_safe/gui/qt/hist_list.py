@@ -95,6 +95,7 @@ from ...util import (
     time_logger,
 )
 from ...wallet import (
+    DeltaCacheListTransactions,
     ToolsTxUiInfo,
     TxConfirmationStatus,
     TxStatus,
@@ -178,6 +179,8 @@ class HistList(MyTreeView):
         Columns.BALANCE: Qt.AlignmentFlag.AlignRight,
     }
 
+    lazy_columns = {Columns.STATUS, Columns.CATEGORIES, Columns.LABEL}
+
     def __init__(
         self,
         fx,
@@ -203,6 +206,7 @@ class HistList(MyTreeView):
         self.address_domain = address_domain
         self.hidden_columns = hidden_columns if hidden_columns else []
         self._tx_dict: Dict[str, Tuple[Wallet, bdk.TransactionDetails]] = {}  # txid -> wallet, tx
+        self._txid_order: List[str] = []  # txids sorted from old to new
         self.signals = signals
         self.wallet_id = wallet_id
         self.setSelectionMode(QAbstractItemView.SelectionMode.ExtendedSelection)
@@ -355,42 +359,17 @@ class HistList(MyTreeView):
     @time_logger
     def update_with_filter(self, update_filter: UpdateFilter) -> None:
         if update_filter.refresh_all:
+            if update_filter.reason == UpdateFilterReason.TransactionChange and self._tx_dict:
+                return self.reconcile_content()
             return self.update_content()
         logger.debug(f"{self.__class__.__name__} update_with_filter {update_filter}")
-
-        def categories_intersect(model: MyStandardItemModel, row) -> Set:
-            return set(model.data(model.index(row, self.Columns.CATEGORIES))).intersection(
-                set(update_filter.categories)
-            )
-
-        def tx_involves_address(txid) -> Set[str]:
-            (wallet, tx) = self._tx_dict[txid]
-            fulltxdetail = wallet.get_dict_fulltxdetail().get(txid)
-            if not fulltxdetail:
-                return set()
-            return update_filter.addresses.intersection(fulltxdetail.involved_addresses())
-
-        logger.debug(f"{self.__class__.__name__}  update_with_filter {update_filter}")
         self._before_update_content()
 
-        log_info = []
-        model = self._source_model
-        # Select rows with an ID in id_list
-        for row in range(model.rowCount()):
-            txid = model.data(model.index(row, self.Columns.TXID))
-
-            if (
-                update_filter.reason == UpdateFilterReason.ChainHeightAdvanced
-                and model.data(
-                    model.index(row, self.key_column), role=MyItemDataRole.ROLE_FREQUENT_UPDATEFLAG
-                )
-            ) or any(
-                [txid in update_filter.txids, categories_intersect(model, row), tx_involves_address(txid)]
-            ):
-                log_info.append((row, txid))
-                self.refresh_row(txid, row)
+        rows = self.rows_to_refresh(update_filter, keys=update_filter.txids)
+        for txid, row in rows.items():
+            self.refresh_row(txid, row)
 
-        logger.debug(f"Updated  {log_info}")
+        logger.debug(f"Updated  {list(rows.items())}")
 
         self._after_update_content()
 
@@ -435,17 +414,14 @@ class HistList(MyTreeView):
         labels = [""] * len(self.Columns)
         labels[self.Columns.WALLET_ID] = wallet.id
         labels[self.Columns.AMOUNT] = Satoshis(amount, wallet.network).str_as_change()
-
-        labels[self.Columns.BALANCE] = str(Satoshis(new_balance, wallet.network))
         labels[self.Columns.TXID] = tx.txid
         items = [QStandardItem(e) for e in labels]
 
-        items[self.Columns.STATUS].setData(status_sort_index, MyItemDataRole.ROLE_SORT_ORDER)
+        self._set_position(items, status_sort_index, new_balance, wallet.network)
         items[self.Columns.WALLET_ID].setData(wallet.id, MyItemDataRole.ROLE_CLIPBOARD_DATA)
         items[self.Columns.AMOUNT].setData(amount, MyItemDataRole.ROLE_CLIPBOARD_DATA)
         if amount < 0:
             items[self.Columns.AMOUNT].setData(QBrush(QColor("red")), Qt.ItemDataRole.ForegroundRole)
-        items[self.Columns.BALANCE].setData(new_balance, MyItemDataRole.ROLE_CLIPBOARD_DATA)
         items[self.Columns.TXID].setData(tx.txid, MyItemDataRole.ROLE_CLIPBOARD_DATA)
 
         # align text and set fonts
@@ -460,21 +436,21 @@ class HistList(MyTreeView):
 
         return items, amount
 
-    def update_content(self) -> None:
-        if self.maybe_defer_update():
-            return
+    def _set_position(
+        self, items: List[QStandardItem], status_sort_index: int, new_balance: int, network: bdk.Network
+    ) -> None:
+        "Sets the data that depends on the position of the tx in the sorted transaction list"
+        items[self.Columns.STATUS].setData(status_sort_index, MyItemDataRole.ROLE_SORT_ORDER)
+        items[self.Columns.BALANCE].setText(str(Satoshis(new_balance, network)))
+        items[self.Columns.BALANCE].setData(new_balance, MyItemDataRole.ROLE_CLIPBOARD_DATA)
 
-        self._before_update_content()
-        self._tx_dict = {}
+    def _get_sorted_txs(self) -> List[Tuple[Wallet, bdk.TransactionDetails]]:
+        "Returns the shown transactions, sorted from old to new"
         wallets = [
             wallet for wallet in get_wallets(self.signals) if self.wallet_id and wallet.id == self.wallet_id
         ]
 
-        self._source_model.clear()
-        self.update_headers(self.get_headers())
-
-        num_shown = 0
-        self.balance = 0
+        result: List[Tuple[Wallet, bdk.TransactionDetails]] = []
         for wallet in wallets:
 
             txid_domain: Optional[Set[str]] = None
@@ -484,19 +460,130 @@ class HistList(MyTreeView):
                     txid_domain = txid_domain.union(wallet.get_involved_txids(address))
 
             # always take sorted_delta_list_transactions().new as a start because it is correctly sorted
-            for i, tx in enumerate(wallet.sorted_delta_list_transactions()):
+            for tx in wallet.sorted_delta_list_transactions():
                 if txid_domain is not None:
                     if tx.txid not in txid_domain:
                         continue
+                result.append((wallet, tx))
+        return result
+
+    def update_content(self) -> None:
+        if self.maybe_defer_update():
+            return
+
+        self._before_update_content()
+        self._tx_dict = {}
+        self._txid_order = []
 
-                items, amount = self._init_row(wallet, tx, i, self.balance)
-                self.balance += amount
+        self._source_model.clear()
+        self.update_headers(self.get_headers())
 
-                num_shown += 1
-                # add item
-                count = self._source_model.rowCount()
-                self._source_model.insertRow(count, items)
-                self.refresh_row(tx.txid, count)
+        self.balance = 0
+        for i, (wallet, tx) in enumerate(self._get_sorted_txs()):
+            items, amount = self._init_row(wallet, tx, i, self.balance)
+            self.balance += amount
+            self._txid_order.append(tx.txid)
+            self.append_row(items)
+
+        super().update_content()
+        self._after_update_content()
+
+    @staticmethod
+    def _needs_status_refresh(
+        wallet: Wallet, old_tx: bdk.TransactionDetails, tx: bdk.TransactionDetails
+    ) -> bool:
+        old_height = old_tx.confirmation_time.height if old_tx.confirmation_time else None
+        height = tx.confirmation_time.height if tx.confirmation_time else None
+        if old_height != height:
+            return True
+        # the number of confirmations is shown for young transactions
+        return height is None or wallet.get_height() - height < 6
+
+    @time_logger
+    def reconcile_content(self) -> None:
+        """Applies only the difference between the shown and the current
+        transactions, instead of rebuilding the model like update_content.
+
+        - removed and appended transactions remove/insert only their rows
+        - the running balance is recalculated from the first changed position onward
+        - only rows whose confirmation status can have changed are refreshed
+        """
+        if self.maybe_defer_update():
+            return
+
+        self._before_update_content()
+
+        wallet_txs = self._get_sorted_txs()
+        new_order = [tx.txid for wallet, tx in wallet_txs]
+        delta = DeltaCacheListTransactions()
+        delta.old_state = [tx for wallet, tx in self._tx_dict.values()]
+        delta.new_state = [tx for wallet, tx in wallet_txs]
+        new_txids = set(new_order)
+        delta.removed = [tx for tx in delta.old_state if tx.txid not in new_txids]
+        delta.appended = [tx for tx in delta.new_state if tx.txid not in self._tx_dict]
+
+        for tx in delta.removed:
+            self.delete_item(tx.txid)
+            del self._tx_dict[tx.txid]
+
+        first_changed = 0
+        for first_changed, (old_txid, new_txid) in enumerate(zip(self._txid_order, new_order)):
+            if old_txid != new_txid:
+                break
+        else:
+            first_changed = min(len(self._txid_order), len(new_order))
+
+        model = self._source_model
+        refreshed_rows = []
+
+        def refresh_status(
+            wallet: Wallet, old_tx: bdk.TransactionDetails, tx: bdk.TransactionDetails
+        ) -> None:
+            if not self._needs_status_refresh(wallet, old_tx, tx):
+                return
+            row = model.row_of_key(tx.txid)
+            if row is not None and not model.needs_refresh(row):
+                refreshed_rows.append(row)
+                self.refresh_row(tx.txid, row)
+
+        # rows before first_changed keep their position and balance
+        for wallet, tx in wallet_txs[:first_changed]:
+            _, old_tx = self._tx_dict[tx.txid]
+            self._tx_dict[tx.txid] = (wallet, tx)
+            refresh_status(wallet, old_tx, tx)
+
+        previous_row = model.row_of_key(new_order[first_changed - 1]) if first_changed > 0 else None
+        balance = (
+            model.data(model.index(previous_row, self.Columns.BALANCE), MyItemDataRole.ROLE_CLIPBOARD_DATA)
+            if previous_row is not None
+            else 0
+        )
+        appended_txids = {tx.txid for tx in delta.appended}
+        for i, (wallet, tx) in enumerate(wallet_txs[first_changed:], start=first_changed):
+            if tx.txid in appended_txids:
+                items, amount = self._init_row(wallet, tx, i, balance)
+                self.append_row(items)
+                balance += amount
+                continue
+
+            row = model.row_of_key(tx.txid)
+            _, old_tx = self._tx_dict[tx.txid]
+            self._tx_dict[tx.txid] = (wallet, tx)
+            if row is None:
+                continue
+            amount = model.data(model.index(row, self.Columns.AMOUNT), MyItemDataRole.ROLE_CLIPBOARD_DATA)
+            balance += amount
+            _items = [model.item(row, col) for col in self.Columns]
+            self._set_position([item for item in _items if item], i, balance, wallet.network)
+            refresh_status(wallet, old_tx, tx)
+
+        self._txid_order = new_order
+        self.balance = balance
+        logger.debug(
+            f"{self.__class__.__name__} reconciled {len(delta.appended)} appended, "
+            f"{len(delta.removed)} removed, {len(new_order)-first_changed} repositioned and "
+            f"{len(refreshed_rows)} refreshed rows"
+        )
 
         super().update_content()
         self._after_update_content()
@@ -539,6 +626,14 @@ class HistList(MyTreeView):
             else status_text
         )
 
+        fulltxdetail = wallet.get_dict_fulltxdetail().get(tx.txid)
+        self._source_model.set_row_index(
+            key,
+            addresses=fulltxdetail.involved_addresses() if fulltxdetail else [],
+            categories=categories,
+            frequent=needs_frequent_flag(status=status),
+        )
+
         _item = [self._source_model.item(row, col) for col in self.Columns]
         item = [entry for entry in _item if entry]
         if needs_frequent_flag(status=status):
@@ -642,7 +737,7 @@ class HistList(MyTreeView):
             tx_details.transaction,
             FeeInfo.from_txdetails(tx_details),
             self.config.network,
-            get_wallets(self.signals),
+            self.signals.txo_registry,
         )
 
         self.signals.open_tx_like.emit(txinfos)
@@ -652,7 +747,7 @@ class HistList(MyTreeView):
             tx_details.transaction,
             FeeInfo.from_txdetails(tx_details),
             self.config.network,
-            get_wallets(self.signals),
+            self.signals.txo_registry,
         )
 
         wallet = get_wallet(self.wallet_id, self.signals)
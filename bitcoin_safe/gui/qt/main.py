@@ -79,14 +79,16 @@ from PyQt6.QtWidgets import (
 )
 
 from bitcoin_safe.gui.qt.search_tree_view import SearchWallets
+from bitcoin_safe.gui.qt.sync_scheduler import SyncPriority, SyncScheduler
 from bitcoin_safe.gui.qt.wizard import ImportXpubs, TutorialStep, Wizard
 
 from ...config import UserConfig
+from ...electrum_notifier import ElectrumNotifier
 from ...fx import FX
 from ...mempool import MempoolData
 from ...psbt_util import FeeInfo, SimplePSBT
-from ...pythonbdk_types import get_prev_outpoints
-from ...signals import Signals
+from ...pythonbdk_types import BlockchainType, get_prev_outpoints
+from ...signals import Signals, UpdateFilter
 from ...storage import Storage
 from ...tx import TxBuilderInfos, TxUiInfos, short_tx_id
 from ...wallet import ProtoWallet, ToolsTxUiInfo, Wallet
@@ -133,6 +135,14 @@ class MainWindow(QMainWindow):
         self.signals = Signals()
         self.qt_wallets: Dict[str, QTWallet] = {}
         self.threading_manager = ThreadingManager(threading_manager_name=self.__class__.__name__)
+        self.sync_scheduler = SyncScheduler(get_visible_wallet_id=self.get_visible_wallet_id, parent=self)
+        # without push notifications, the wallets poll the server regularly
+        self.electrum_notifier: Optional[ElectrumNotifier] = None
+        if self.config.network_config.server_type == BlockchainType.Electrum:
+            self.electrum_notifier = ElectrumNotifier(self.config.network_config, parent=self)
+            self.electrum_notifier.signal_new_block.connect(self.on_new_block)
+            self.electrum_notifier.signal_wallet_changed.connect(self.on_wallet_changed_on_server)
+            self.electrum_notifier.signal_active_changed.connect(self.on_push_notifications_active_changed)
 
         self.fx = FX(threading_parent=self.threading_manager)
         self.language_chooser = LanguageChooser(self, self.config, [self.signals.language_switch])
@@ -201,6 +211,7 @@ class MainWindow(QMainWindow):
             get_qt_wallets=self.get_qt_wallets,
             signal_min=self.signals,
             parent=self.tab_wallets,
+            threading_parent=self.threading_manager,
         )
         self.tab_wallets.set_top_right_widget(self.search_box)
 
@@ -577,7 +588,7 @@ class MainWindow(QMainWindow):
     def on_signal_broadcast_tx(self, transaction: bdk.Transaction) -> None:
         def f_sync_all(qt_wallets: List[QTWallet]):
             for qt_wallet in qt_wallets:
-                qt_wallet.sync()
+                qt_wallet.request_sync()
 
         qt_wallets_to_sync: List[QTWallet] = []
 
@@ -1126,7 +1137,7 @@ class MainWindow(QMainWindow):
             return None
 
         qt_wallet = self.add_qt_wallet(qt_wallet, file_path=file_path, password=password)
-        qt_wallet.sync()
+        qt_wallet.request_sync()
 
         self.add_recently_open_wallet(qt_wallet.file_path)
         return qt_wallet
@@ -1199,7 +1210,7 @@ class MainWindow(QMainWindow):
         qt_wallet.address_list_tags.add_default_categories()
         qt_wallet.uitx_creator.clear_ui()  # after the categories are updtaed, this selected the default category in the send tab
         self.save_qt_wallet(qt_wallet)
-        qt_wallet.sync()
+        qt_wallet.request_sync()
         return qt_wallet
 
     def create_qtwallet_from_ui(
@@ -1342,6 +1353,16 @@ class MainWindow(QMainWindow):
 
         # add to tabs
         self.qt_wallets[qt_wallet.wallet.id] = qt_wallet
+        qt_wallet.sync_scheduler = self.sync_scheduler
+        self.sync_scheduler.add_qt_wallet(qt_wallet)
+        if self.electrum_notifier:
+            self.watch_addresses(qt_wallet)
+            qt_wallet.signal_after_sync.connect(lambda sync_status: self.watch_addresses(qt_wallet))
+            qt_wallet.wallet_signals.updated.connect(
+                lambda update_filter: self.watch_addresses(qt_wallet, update_filter=update_filter)
+            )
+            qt_wallet.set_sync_regularly(not self.electrum_notifier.is_active)
+            self.electrum_notifier.start()
         self.tab_wallets.add_tab(
             tab=qt_wallet.tab,
             icon=read_QIcon("status_waiting.svg"),
@@ -1401,6 +1422,10 @@ class MainWindow(QMainWindow):
             return base_wallet
         return None
 
+    def get_visible_wallet_id(self) -> Optional[str]:
+        qt_wallet = self.get_qt_wallet()
+        return qt_wallet.wallet.id if qt_wallet else None
+
     def get_blockchain_of_any_wallet(self) -> Optional[bdk.Blockchain]:
         for qt_wallet in self.qt_wallets.values():
             if qt_wallet.wallet.blockchain:
@@ -1442,6 +1467,9 @@ class MainWindow(QMainWindow):
 
         if self.last_qtwallet == qt_wallet:
             self.last_qtwallet = None
+        self.sync_scheduler.remove_qt_wallet(qt_wallet.wallet.id)
+        if self.electrum_notifier:
+            self.electrum_notifier.unwatch_wallet(qt_wallet.wallet.id)
         qt_wallet.close()
         QTWallet.remove_lockfile(wallet_file_path=Path(qt_wallet.file_path))
         del self.qt_wallets[qt_wallet.wallet.id]
@@ -1496,6 +1524,28 @@ class MainWindow(QMainWindow):
         # other events
         self.event_wallet_tab_closed()
 
+    def watch_addresses(self, qt_wallet: QTWallet, update_filter: UpdateFilter | None = None) -> None:
+        if not self.electrum_notifier or qt_wallet.wallet.id not in self.qt_wallets:
+            return
+        if update_filter and not (update_filter.addresses or update_filter.refresh_all):
+            return
+        self.electrum_notifier.watch_addresses(qt_wallet.wallet.id, qt_wallet.wallet.get_addresses())
+
+    def on_new_block(self, height: int) -> None:
+        logger.info(f"New block {height}")
+        for qt_wallet in self.qt_wallets.values():
+            qt_wallet.request_sync(SyncPriority.regular)
+
+    def on_wallet_changed_on_server(self, wallet_id: str) -> None:
+        qt_wallet = self.qt_wallets.get(wallet_id)
+        if qt_wallet:
+            logger.info(f"The server notified a change of wallet {wallet_id}")
+            qt_wallet.request_sync(SyncPriority.regular)
+
+    def on_push_notifications_active_changed(self, is_active: bool) -> None:
+        for qt_wallet in self.qt_wallets.values():
+            qt_wallet.set_sync_regularly(not is_active)
+
     def manual_sync(self) -> None:
         self.sync(reason="Manual sync")
 
@@ -1503,7 +1553,7 @@ class MainWindow(QMainWindow):
         logger.info(f"{self.__class__.__name__}.sync {reason=}")
         qt_wallet = self.get_qt_wallet()
         if qt_wallet:
-            qt_wallet.sync()
+            qt_wallet.request_sync()
 
     def closeEvent(self, event: Optional[QCloseEvent]) -> None:
         self.config.last_wallet_files[str(self.config.network)] = [
@@ -1514,6 +1564,9 @@ class MainWindow(QMainWindow):
         self.config.save()
         self.save_all_wallets()
 
+        self.sync_scheduler.close()
+        if self.electrum_notifier:
+            self.electrum_notifier.stop()
         self.threading_manager.end_threading_manager()
 
         self.remove_all_qt_wallet()
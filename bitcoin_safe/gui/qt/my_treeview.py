@@ -56,7 +56,7 @@ import logging
 from bitcoin_safe.gui.qt.dialog_import import file_to_str
 from bitcoin_safe.gui.qt.html_delegate import HTMLDelegate
 from bitcoin_safe.gui.qt.wrappers import Menu
-from bitcoin_safe.signals import Signals
+from bitcoin_safe.signals import Signals, UpdateFilter, UpdateFilterReason
 from bitcoin_safe.util import str_to_qbytearray
 from bitcoin_safe.wallet import TxStatus
 
@@ -73,8 +73,21 @@ import json
 import os
 import os.path
 import tempfile
+from collections import defaultdict
 from decimal import Decimal
-from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Type, Union
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+    Type,
+    Union,
+)
 
 from bitcoin_qr_tools.data import Data
 from PyQt6 import QtCore
@@ -147,6 +160,7 @@ class MyItemDataRole(enum.IntEnum):
     ROLE_SORT_ORDER = Qt.ItemDataRole.UserRole + 1000
     ROLE_KEY = Qt.ItemDataRole.UserRole + 1001
     ROLE_FREQUENT_UPDATEFLAG = Qt.ItemDataRole.UserRole + 1002
+    ROLE_NEEDS_REFRESH = Qt.ItemDataRole.UserRole + 1003
 
 
 class MyMenu(Menu):
@@ -176,6 +190,97 @@ class MyStandardItemModel(QStandardItemModel):
         if drag_keys_to_file_paths:
             self.drag_keys_to_file_paths = drag_keys_to_file_paths
 
+        # indexes to find rows without scanning the model, see row_of_key and set_row_index
+        self._key_to_row: Dict[Any, int] = {}  # key:row
+        self._key_to_row_is_valid = True
+        self.address_to_keys: Dict[str, Set[Any]] = defaultdict(set)
+        self.category_to_keys: Dict[str, Set[Any]] = defaultdict(set)
+        self.frequent_keys: Set[Any] = set()
+        self._indexed_references: Dict[Any, Tuple[Set[str], Set[str]]] = {}  # key:(addresses, categories)
+
+        self.rowsInserted.connect(self._on_rows_inserted)
+        self.rowsRemoved.connect(self._invalidate_key_to_row)
+        self.rowsMoved.connect(self._invalidate_key_to_row)
+        self.layoutChanged.connect(self._invalidate_key_to_row)
+        self.modelReset.connect(self._on_model_reset)
+
+    def _key_of_row(self, row: int) -> Any:
+        if not isinstance(self.mytreeview, MyTreeView):
+            return None
+        key_item = super().item(row, self.mytreeview.key_column)
+        return key_item.data(MyItemDataRole.ROLE_KEY) if key_item else None
+
+    def _on_rows_inserted(self, parent: QModelIndex, first: int, last: int) -> None:
+        if not self._key_to_row_is_valid:
+            return
+        if last != self.rowCount() - 1:
+            # rows were inserted in the middle and all following rows shifted
+            self._invalidate_key_to_row()
+            return
+        for row in range(first, last + 1):
+            self._key_to_row[self._key_of_row(row)] = row
+
+    def _invalidate_key_to_row(self, *args) -> None:
+        self._key_to_row_is_valid = False
+
+    def _on_model_reset(self) -> None:
+        self._key_to_row = {}
+        self._key_to_row_is_valid = True
+        self.address_to_keys.clear()
+        self.category_to_keys.clear()
+        self.frequent_keys.clear()
+        self._indexed_references.clear()
+
+    def row_of_key(self, key: Any) -> Optional[int]:
+        if not self._key_to_row_is_valid:
+            self._key_to_row = {self._key_of_row(row): row for row in range(self.rowCount())}
+            self._key_to_row_is_valid = True
+        return self._key_to_row.get(key)
+
+    def keys(self) -> Iterable[Any]:
+        self.row_of_key(None)  # rebuilds the index if necessary
+        return self._key_to_row.keys()
+
+    def set_row_index(
+        self,
+        key: Any,
+        addresses: Iterable[str] = (),
+        categories: Iterable[Optional[str]] = (),
+        frequent=False,
+    ) -> None:
+        """Stores which addresses and categories are shown in the row of key,
+        such that an UpdateFilter can find the affected rows directly.
+
+        This should be called by refresh_row.
+        """
+        old_addresses, old_categories = self._indexed_references.pop(key, (set(), set()))
+        for address in old_addresses:
+            self._discard(self.address_to_keys, address, key)
+        for category in old_categories:
+            self._discard(self.category_to_keys, category, key)
+
+        new_addresses = set(addresses)
+        new_categories = {category for category in categories if category}
+        for address in new_addresses:
+            self.address_to_keys[address].add(key)
+        for category in new_categories:
+            self.category_to_keys[category].add(key)
+        self._indexed_references[key] = (new_addresses, new_categories)
+
+        if frequent:
+            self.frequent_keys.add(key)
+        else:
+            self.frequent_keys.discard(key)
+
+    @staticmethod
+    def _discard(d: Dict[str, Set[Any]], value: str, key: Any) -> None:
+        keys = d.get(value)
+        if keys is None:
+            return
+        keys.discard(key)
+        if not keys:
+            del d[value]
+
     def csv_drag_keys_to_file_paths(
         self, drag_keys: Iterable[str], save_directory: Optional[str] = None
     ) -> List[str]:
@@ -183,6 +288,43 @@ class MyStandardItemModel(QStandardItemModel):
         file_path = os.path.join(save_directory, f"export.csv") if save_directory else None
         return [self.mytreeview.csv_drag_keys_to_file_path(drag_keys=drag_keys, file_path=file_path)]
 
+    def needs_refresh(self, row: int) -> bool:
+        "The row was not accessed yet, see ensure_row_refreshed"
+        if not isinstance(self.mytreeview, MyTreeView):
+            return False
+        key_item = super().item(row, self.mytreeview.key_column)
+        return bool(key_item and key_item.data(MyItemDataRole.ROLE_NEEDS_REFRESH))
+
+    def ensure_row_refreshed(self, row: int) -> None:
+        """Rows can be inserted without the columns that refresh_row fills
+        (see MyTreeView.append_row).
+
+        These are filled when the row is accessed the first time,
+        usually when it is scrolled into view.
+        """
+        if not isinstance(self.mytreeview, MyTreeView):
+            return
+        key_item = super().item(row, self.mytreeview.key_column)
+        if not key_item or not key_item.data(MyItemDataRole.ROLE_NEEDS_REFRESH):
+            return
+
+        # the row is currently being accessed, so no dataChanged signals are necessary
+        signals_were_blocked = self.blockSignals(True)
+        try:
+            key_item.setData(None, MyItemDataRole.ROLE_NEEDS_REFRESH)
+            self.mytreeview.refresh_row(key_item.data(MyItemDataRole.ROLE_KEY), row)
+        finally:
+            self.blockSignals(signals_were_blocked)
+
+    def data(self, index: QModelIndex, role: int = Qt.ItemDataRole.DisplayRole) -> Any:
+        if (
+            isinstance(self.mytreeview, MyTreeView)
+            and index.column() in self.mytreeview.lazy_columns
+            and role != MyItemDataRole.ROLE_FREQUENT_UPDATEFLAG
+        ):
+            self.ensure_row_refreshed(index.row())
+        return super().data(index, role)
+
     def flags(self, index: QtCore.QModelIndex) -> QtCore.Qt.ItemFlag:
         if index.column() == self.mytreeview.key_column:  # only enable dragging for column 1
             return super().flags(index) | Qt.ItemFlag.ItemIsDragEnabled
@@ -247,6 +389,12 @@ class MySortModel(QSortFilterProxyModel):
 
         data1 = item1.data(self._sort_role)
         data2 = item2.data(self._sort_role)
+        if data1 is None or data2 is None:
+            # the sort data might not be filled yet, see MyStandardItemModel.ensure_row_refreshed
+            self.sourceModel().ensure_row_refreshed(source_left.row())
+            self.sourceModel().ensure_row_refreshed(source_right.row())
+            data1 = item1.data(self._sort_role)
+            data2 = item2.data(self._sort_role)
         if data1 is not None and data2 is not None:
             return data1 < data2
         v1 = item1.text()
@@ -335,6 +483,9 @@ class MyTreeView(QTreeView):
     filter_columns: Iterable[int]
     column_alignments: Dict[int, Qt.AlignmentFlag] = {}
     hidden_columns: List[int] = []
+    # columns that are filled by refresh_row.  Rows added with append_row
+    # fill them only when they are accessed the first time
+    lazy_columns: Set[int] = set()
 
     key_column = 0
 
@@ -566,9 +717,27 @@ class MyTreeView(QTreeView):
     def item_from_index(self, idx: QModelIndex) -> Optional[QStandardItem]:
         model = self.model()
         if isinstance(model, QSortFilterProxyModel):
-            return self.sourceModel().itemFromIndex(model.mapToSource(idx))
+            idx = model.mapToSource(idx)
+        self.sourceModel().ensure_row_refreshed(idx.row())
+        return self.sourceModel().itemFromIndex(idx)
+
+    def append_row(self, items: List[QStandardItem]) -> int:
+        """Appends the items to the source model.
+
+        The lazy_columns are filled by refresh_row, when the row is
+        accessed the first time. This way only the visible rows are
+        formatted.
+
+        Returns the row number.
+        """
+        row = self._source_model.rowCount()
+        if self.lazy_columns:
+            items[self.key_column].setData(True, MyItemDataRole.ROLE_NEEDS_REFRESH)
+            self._source_model.insertRow(row, items)
         else:
-            return self.sourceModel().itemFromIndex(idx)
+            self._source_model.insertRow(row, items)
+            self.refresh_row(items[self.key_column].data(MyItemDataRole.ROLE_KEY), row)
+        return row
 
     def set_current_idx(self, set_current: QPersistentModelIndex) -> None:
         if not set_current or not set_current.isValid():
@@ -858,10 +1027,11 @@ class MyTreeView(QTreeView):
     ) -> str:
         row_numbers: List[int] = []
         if drag_keys and not export_all:
-            for row_number in range(0, self._source_model.rowCount()):
-                item = self._source_model.item(row_number, self.key_column)
-                if item and item.data(MyItemDataRole.ROLE_KEY) in drag_keys:
+            for drag_key in drag_keys:
+                row_number = self._source_model.row_of_key(drag_key)
+                if row_number is not None:
                     row_numbers.append(row_number)
+            row_numbers.sort()
 
         # Fetch the serialized data using the drag_keys
         csv_string = self.as_csv_string(row_numbers=row_numbers, export_all=export_all)
@@ -898,12 +1068,33 @@ class MyTreeView(QTreeView):
         self._pending_update = defer
         return defer
 
-    def find_row_by_key(self, key: str) -> Optional[int]:
-        for row in range(0, self._source_model.rowCount()):
-            item = self._source_model.item(row, self.key_column)
-            if item and item.data(MyItemDataRole.ROLE_KEY) == key:
-                return row
-        return None
+    def find_row_by_key(self, key: Any) -> Optional[int]:
+        return self._source_model.row_of_key(key)
+
+    def rows_to_refresh(self, update_filter: UpdateFilter, keys: Iterable[Any] = ()) -> Dict[Any, int]:
+        """Returns {key: row} of the keys and the rows that show the addresses
+        or categories of update_filter (see MyStandardItemModel.set_row_index).
+
+        Rows that were not accessed yet are skipped, because they are
+        refreshed when they are accessed.
+        """
+        model = self._source_model
+        keys = set(keys)
+        for address in update_filter.addresses:
+            keys.update(model.address_to_keys.get(address, set()))
+        for category in update_filter.categories:
+            if category:
+                keys.update(model.category_to_keys.get(category, set()))
+        if update_filter.reason == UpdateFilterReason.ChainHeightAdvanced:
+            keys.update(model.frequent_keys)
+
+        result = {}
+        for key in keys:
+            row = model.row_of_key(key)
+            if row is None or model.needs_refresh(row):
+                continue
+            result[key] = row
+        return result
 
     def refresh_all(self) -> None:
         if self.maybe_defer_update():
@@ -1012,11 +1203,10 @@ class MyTreeView(QTreeView):
         if scrollbar:
             scrollbar.setValue(self._scroll_position)  # Restore the scroll position
 
-        # Iterate through all rows in the model to find items with matching IDs
-        for row in range(self._source_model.rowCount()):
-            index = self._source_model.index(row, self.key_column)
-            id = index.data(MyItemDataRole.ROLE_KEY)
-            if id in self.selected_ids:
+        for id in self.selected_ids:
+            row = self._source_model.row_of_key(id)
+            if row is not None:
+                index = self._source_model.index(row, self.key_column)
                 # Map the source index to the proxy model
                 proxy_index = self.proxy.mapFromSource(index)
                 # Select the item
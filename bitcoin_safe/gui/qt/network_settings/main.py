@@ -77,6 +77,7 @@ from PyQt6.QtWidgets import (
     QHBoxLayout,
     QLabel,
     QPushButton,
+    QSpinBox,
     QStackedWidget,
     QVBoxLayout,
     QWidget,
@@ -284,6 +285,10 @@ class NetworkSettingsUI(QDialog):
         self.electrumServerLayout.addRow(self.electrum_url_edit_url_label, self.electrum_url_edit)
         self.electrum_use_ssl_checkbox_label = QLabel()
         self.electrumServerLayout.addRow(self.electrum_use_ssl_checkbox_label, self.electrum_use_ssl_checkbox)
+        self.electrum_retry_spinbox = QSpinBox()
+        self.electrum_retry_spinbox.setRange(0, 10)
+        self.electrum_retry_spinbox_label = QLabel()
+        self.electrumServerLayout.addRow(self.electrum_retry_spinbox_label, self.electrum_retry_spinbox)
 
         self.electrum_description = QLabel()
         self.electrum_description.setWordWrap(True)
@@ -306,6 +311,13 @@ class NetworkSettingsUI(QDialog):
 
         self.esplora_url_edit_label = QLabel()
         self.esploraServerLayout.addRow(self.esplora_url_edit_label, self.esplora_url_edit)
+        # 0 = automatic
+        self.esplora_concurrency_spinbox = QSpinBox()
+        self.esplora_concurrency_spinbox.setRange(0, 64)
+        self.esplora_concurrency_spinbox_label = QLabel()
+        self.esploraServerLayout.addRow(
+            self.esplora_concurrency_spinbox_label, self.esplora_concurrency_spinbox
+        )
 
         self.esplora_description = QLabel()
         self.esplora_description.setWordWrap(True)
@@ -348,6 +360,14 @@ class NetworkSettingsUI(QDialog):
 
         self.stackedWidget.addWidget(self.rpcTab)
 
+        self.timeout_layout = QFormLayout()
+        # 0 = automatic
+        self.timeout_spinbox = QSpinBox()
+        self.timeout_spinbox.setRange(0, 300)
+        self.timeout_spinbox_label = QLabel()
+        self.timeout_layout.addRow(self.timeout_spinbox_label, self.timeout_spinbox)
+        self.groupbox_connection_layout.addLayout(self.timeout_layout)
+
         self.groupbox_blockexplorer = QGroupBox()
         self.groupbox_blockexplorer_layout = QHBoxLayout(self.groupbox_blockexplorer)
         button_mempool = QPushButton(self)
@@ -396,6 +416,12 @@ class NetworkSettingsUI(QDialog):
         self.esplora_url_edit_label.setText(self.tr("URL:"))
         self.electrum_url_edit_url_label.setText(self.tr("URL:"))
         self.electrum_use_ssl_checkbox_label.setText(self.tr("SSL:"))
+        self.electrum_retry_spinbox_label.setText(self.tr("Retries:"))
+        self.esplora_concurrency_spinbox_label.setText(self.tr("Parallel requests:"))
+        self.esplora_concurrency_spinbox.setSpecialValueText(self.tr("Automatic"))
+        self.timeout_spinbox_label.setText(self.tr("Timeout:"))
+        self.timeout_spinbox.setSpecialValueText(self.tr("Automatic"))
+        self.timeout_spinbox.setSuffix(self.tr(" s"))
         self.compactblockfilters_port_edit_label.setText(self.tr("Port:"))
         self.cbf_server_typeComboBox_label.setText(self.tr("Mode:"))
         self.compactblockfilters_ip_address_edit_label.setText(self.tr("IP Address:"))
@@ -651,6 +677,30 @@ class NetworkSettingsUI(QDialog):
     def esplora_url(self, url: str):
         self.esplora_url_edit.setText(url if url else "")
 
+    @property
+    def esplora_concurrency(self) -> Optional[int]:
+        return self.esplora_concurrency_spinbox.value() or None
+
+    @esplora_concurrency.setter
+    def esplora_concurrency(self, value: Optional[int]):
+        self.esplora_concurrency_spinbox.setValue(value if value else 0)
+
+    @property
+    def timeout(self) -> Optional[int]:
+        return self.timeout_spinbox.value() or None
+
+    @timeout.setter
+    def timeout(self, value: Optional[int]):
+        self.timeout_spinbox.setValue(value if value else 0)
+
+    @property
+    def electrum_retry(self) -> int:
+        return self.electrum_retry_spinbox.value()
+
+    @electrum_retry.setter
+    def electrum_retry(self, value: int):
+        self.electrum_retry_spinbox.setValue(value)
+
     @property
     def rpc_ip(self) -> str:
         return self.rpc_ip_address_edit.text()
@@ -0,0 +1,177 @@
+#
+# Bitcoin Safe
+# Copyright (C) 2024 Andreas Griffin
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of version 3 of the GNU General Public License as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see https://www.gnu.org/licenses/gpl-3.0.html
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS
+# BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN
+# ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+# CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+import logging
+import os
+import threading
+import weakref
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Hashable, List, Optional
+
+from bitcoin_qr_tools.qr_generator import QRGenerator
+
+logger = logging.getLogger(__name__)
+
+
+class QrRenderEntry:
+    def __init__(self, fragments: List[str]) -> None:
+        self.fragments = fragments
+        # None until rendered (or evicted)
+        self.images: List[Optional[str]] = [None] * len(fragments)
+
+    def is_rendered(self) -> bool:
+        return all(image is not None for image in self.images)
+
+    def image_size(self) -> int:
+        return sum(len(image) for image in self.images if image is not None)
+
+    def drop_images(self) -> None:
+        self.images = [None] * len(self.fragments)
+
+
+class QrRenderCache:
+    """LRU cache of the QR fragments and rendered SVGs, keyed by (data hash,
+    export type).
+
+    Switching back to a previously shown QR type (or reopening the same
+    psbt) then doesn't encode and render hundreds of fragments again.
+
+    The fragments are small and kept for all max_entries entries. The SVGs
+    are large, so if they exceed max_image_size, the SVGs of entries that
+    are not shown by any widget (owner) are evicted first.
+    """
+
+    def __init__(self, max_entries: int = 32, max_image_size: int = 32 * 2**20, max_workers: int = 0) -> None:
+        self.max_entries = max_entries
+        self.max_image_size = max_image_size
+        self.lock = threading.Lock()
+        self._entries: "OrderedDict[Hashable, QrRenderEntry]" = OrderedDict()
+        # owner -> the key that the owner currently shows
+        self._active: "weakref.WeakKeyDictionary[Any, Hashable]" = weakref.WeakKeyDictionary()
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers or min(4, os.cpu_count() or 1), thread_name_prefix="qr_render"
+        )
+
+    def set_active(self, owner: Any, key: Optional[Hashable]) -> None:
+        with self.lock:
+            if key is None:
+                self._active.pop(owner, None)
+            else:
+                self._active[owner] = key
+
+    def is_active(self, owner: Any, key: Hashable) -> bool:
+        with self.lock:
+            return self._active.get(owner) == key
+
+    def get_images(self, key: Hashable) -> Optional[List[str]]:
+        "Returns the rendered images, if all are cached"
+        with self.lock:
+            entry = self._entries.get(key)
+            if not entry or not entry.is_rendered():
+                return None
+            self._entries.move_to_end(key)
+            return [image for image in entry.images if image is not None]
+
+    def _get_or_create_entry(
+        self, key: Hashable, generate_fragments: Callable[[], List[str]]
+    ) -> QrRenderEntry:
+        with self.lock:
+            entry = self._entries.get(key)
+            if entry:
+                self._entries.move_to_end(key)
+                return entry
+
+        # outside of the lock, since this can be slow
+        fragments = generate_fragments()
+        with self.lock:
+            entry = self._entries.setdefault(key, QrRenderEntry(fragments))
+            self._entries.move_to_end(key)
+            self._evict()
+            return entry
+
+    def _render(self, entry: QrRenderEntry, index: int) -> Optional[str]:
+        image = entry.images[index]
+        if image is None:
+            image = QRGenerator.create_qr_svg(entry.fragments[index])
+            entry.images[index] = image
+        return image
+
+    def render(
+        self,
+        key: Hashable,
+        generate_fragments: Callable[[], List[str]],
+        on_first_image: Callable[[Optional[str]], None] | None = None,
+    ) -> List[Optional[str]]:
+        """Returns the rendered images of all fragments (blocking).
+
+        The first image is rendered first and passed to on_first_image, such
+        that it can be shown, while the rest is rendered in the worker pool.
+        """
+        entry = self._get_or_create_entry(key, generate_fragments)
+        if not entry.fragments:
+            return []
+
+        first_image = self._render(entry, 0)
+        if on_first_image and len(entry.fragments) > 1:
+            on_first_image(first_image)
+
+        images = [first_image] + list(
+            self._executor.map(lambda i: self._render(entry, i), range(1, len(entry.fragments)))
+        )
+        with self.lock:
+            self._evict()
+        return images
+
+    def _evict(self) -> None:
+        "Must be called with self.lock"
+        active_keys = set(self._active.values())
+
+        inactive_keys = [key for key in self._entries if key not in active_keys]
+        while len(self._entries) > self.max_entries and inactive_keys:
+            self._entries.pop(inactive_keys.pop(0))
+
+        image_size = sum(entry.image_size() for entry in self._entries.values())
+        for key in inactive_keys:
+            if image_size <= self.max_image_size:
+                break
+            entry = self._entries[key]
+            image_size -= entry.image_size()
+            entry.drop_images()
+
+    def image_size(self) -> int:
+        with self.lock:
+            return sum(entry.image_size() for entry in self._entries.values())
+
+    def clear(self) -> None:
+        with self.lock:
+            self._entries.clear()
+
+
+qr_render_cache = QrRenderCache()
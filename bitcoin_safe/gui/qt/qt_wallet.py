@@ -32,6 +32,7 @@ import json
 import logging
 import os
 import shutil
+import threading
 from datetime import timedelta
 from pathlib import Path
 from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple, Union
@@ -53,13 +54,15 @@ from PyQt6.QtWidgets import (
 )
 
 from bitcoin_safe.fx import FX
+from bitcoin_safe.gui.qt.background_saver import BackgroundSaver
 from bitcoin_safe.gui.qt.extended_tabwidget import ExtendedTabWidget
 from bitcoin_safe.gui.qt.label_syncer import LabelSyncer
 from bitcoin_safe.gui.qt.my_treeview import SearchableTab, TreeViewWithToolbar
 from bitcoin_safe.gui.qt.qt_wallet_base import QtWalletBase, SyncStatus
+from bitcoin_safe.gui.qt.sync_scheduler import SyncPriority, SyncScheduler
 from bitcoin_safe.gui.qt.sync_tab import SyncTab
 from bitcoin_safe.pythonbdk_types import Balance
-from bitcoin_safe.storage import BaseSaveableClass, filtered_for_init
+from bitcoin_safe.storage import BaseSaveableClass, DerivedKeyCache, filtered_for_init
 from bitcoin_safe.threading_manager import TaskThread, ThreadingManager
 from bitcoin_safe.typestubs import TypedPyQtSignal
 from bitcoin_safe.util import Satoshis
@@ -192,6 +195,17 @@ class QTWallet(QtWalletBase, BaseSaveableClass):
         "Wallet": Wallet,
         "Balance": Balance,
     }
+    # label and category edits are saved without the user having to save
+    save_in_background_reasons = [
+        UpdateFilterReason.UserInput,
+        UpdateFilterReason.UserImport,
+        UpdateFilterReason.SourceLabelSyncer,
+        UpdateFilterReason.UserReplacedAddress,
+        UpdateFilterReason.CategoryAssigned,
+        UpdateFilterReason.CategoryAdded,
+        UpdateFilterReason.CategoryRenamed,
+        UpdateFilterReason.CategoryDeleted,
+    ]
 
     signal_settext_balance_label: TypedPyQtSignal[str] = pyqtSignal(str)  # type: ignore
     signal_on_change_sync_status: TypedPyQtSignal[SyncStatus] = pyqtSignal(SyncStatus)  # type: ignore  # SyncStatus
@@ -223,10 +237,18 @@ class QTWallet(QtWalletBase, BaseSaveableClass):
         self.mempool_data = mempool_data
         self.wallet = self.set_wallet(wallet)
         self.password = password
+        # the key derived from the password, such that a re-save doesn't need the key derivation
+        self.key_cache = DerivedKeyCache()
+        self._save_lock = threading.Lock()
+        self.saver = BackgroundSaver(
+            get_snapshot=self._get_save_snapshot, write=self._write_save_snapshot, threading_parent=self
+        )
         self.set_tab_widget_icon = set_tab_widget_icon
         self.fx = fx
         self._file_path = file_path
         self.sync_status: SyncStatus = SyncStatus.unknown
+        # set by the MainWindow, such that syncs of several wallets are coordinated
+        self.sync_scheduler: Optional[SyncScheduler] = None
         self.timer_sync_retry = QTimer()
         self.timer_sync_regularly = QTimer()
         self.notified_tx_ids = set(notified_tx_ids if notified_tx_ids else [])
@@ -296,6 +318,10 @@ class QTWallet(QtWalletBase, BaseSaveableClass):
         self.wallet_signals.import_bip329_labels.connect(self.import_bip329_labels)
         self.wallet_signals.import_electrum_wallet_labels.connect(self.import_electrum_wallet_labels)
         self.signal_on_change_sync_status.connect(self.update_display_balance)
+        self.wallet_signals.updated.connect(self.on_updated_save_in_background)
+        self.saver.signal_saved.connect(
+            lambda duration: logger.info(f"wallet {self.wallet.id} saved in {duration:.3f}s")
+        )
 
         self._start_sync_retry_timer()
         self._start_sync_regularly_timer()
@@ -324,11 +350,13 @@ class QTWallet(QtWalletBase, BaseSaveableClass):
         password: str | None = None,
         threading_parent: ThreadingManager | None = None,
     ) -> "QTWallet":
-        return super()._from_file(
+        key_cache = DerivedKeyCache()
+        qt_wallet: QTWallet = super()._from_file(
             filename=file_path,
             password=password,
+            key_cache=key_cache,
             class_kwargs={
-                "Wallet": {"config": config},
+                "Wallet": {"config": config, "persist_chain_state": not password},
                 "QTWallet": {
                     "config": config,
                     "signals": signals,
@@ -345,6 +373,8 @@ class QTWallet(QtWalletBase, BaseSaveableClass):
                 },
             },
         )
+        qt_wallet.key_cache = key_cache
+        return qt_wallet
 
     @classmethod
     def file_migration(cls, file_content: str):
@@ -433,6 +463,8 @@ class QTWallet(QtWalletBase, BaseSaveableClass):
         self.sync_tab.unsubscribe_all()
         self.sync_tab.nostr_sync.stop()
         self.stop_sync_timer()
+        self.saver.close()
+        self.key_cache.clear()
         self.end_threading_manager()
 
     def _start_sync_regularly_timer(self, delay_retry_sync=60) -> None:
@@ -445,11 +477,18 @@ class QTWallet(QtWalletBase, BaseSaveableClass):
                 return
 
             logger.info(f"Regular update: Sync wallet {self.wallet.id} again")
-            self.sync()
+            self.request_sync(SyncPriority.regular)
 
         self.timer_sync_regularly.timeout.connect(sync)
         self.timer_sync_regularly.start()
 
+    def set_sync_regularly(self, enabled: bool) -> None:
+        "Polling is not needed, while new blocks and transactions are pushed by the server"
+        if enabled:
+            self.timer_sync_regularly.start()
+        else:
+            self.timer_sync_regularly.stop()
+
     def _start_sync_retry_timer(self, delay_retry_sync=30) -> None:
         if self.timer_sync_retry.isActive():
             return
@@ -460,7 +499,7 @@ class QTWallet(QtWalletBase, BaseSaveableClass):
                 return
 
             logger.info(f"Retry timer: Try syncing wallet {self.wallet.id}")
-            self.sync()
+            self.request_sync(SyncPriority.retry)
 
         self.timer_sync_retry.timeout.connect(sync_if_needed)
         self.timer_sync_retry.start()
@@ -589,10 +628,12 @@ class QTWallet(QtWalletBase, BaseSaveableClass):
         if self.wizard:
             self.tutorial_index = self.wizard.current_index() if not self.wizard.isHidden() else None
 
-        self.wallet.save(
-            filename,
-            password=self.password,
-        )
+        with self._save_lock:
+            self.wallet.save(
+                filename,
+                password=self.password,
+                key_cache=self.key_cache,
+            )
         return filename
 
     def move_wallet_file(self, new_file_path) -> Optional[str]:
@@ -603,6 +644,8 @@ class QTWallet(QtWalletBase, BaseSaveableClass):
                 )
             )
             return None
+        # a background save must not write to the old path after the move
+        self.saver.save_now()
         shutil.move(self.file_path, new_file_path)
         self.remove_lockfile(Path(self.file_path))
         old_file_path = self.file_path
@@ -660,13 +703,35 @@ class QTWallet(QtWalletBase, BaseSaveableClass):
         if not os.path.isfile(self.file_path):
             self.password = PasswordCreation().get_password()
 
-        super().save(
-            self.file_path,
-            password=self.password,
-        )
-        logger.info(f"wallet {self.wallet.id} saved")
+        if self.wallet.set_password_protected(bool(self.password)):
+            # the chain state was moved into memory
+            self.request_sync()
+
+        self.saver.save_now()
         return self.file_path
 
+    def save_in_background(self) -> None:
+        "Debounced save, that doesn't block the UI. Only possible if the wallet was saved before."
+        if not self._file_path or not os.path.isfile(self.file_path):
+            return
+        self.saver.request_save()
+
+    def on_updated_save_in_background(self, update_filter: UpdateFilter) -> None:
+        if update_filter.reason in self.save_in_background_reasons:
+            self.save_in_background()
+
+    def _get_save_snapshot(self) -> Optional[Tuple[str, Optional[str], Dict[str, Any]]]:
+        "Is called in the main thread, since the dump reads the UI state"
+        if not self._file_path:
+            return None
+        return self.file_path, self.password, self.snapshot()
+
+    def _write_save_snapshot(self, save_snapshot: Tuple[str, Optional[str], Dict[str, Any]]) -> None:
+        file_path, password, snapshot = save_snapshot
+        # the key_cache is not thread safe
+        with self._save_lock:
+            self.save_snapshot(snapshot, file_path, password=password, key_cache=self.key_cache)
+
     def change_password(self) -> Optional[str]:
         if self.password:
             ui_password_question = PasswordQuestion(label_text="Your current password:")
@@ -777,10 +842,11 @@ class QTWallet(QtWalletBase, BaseSaveableClass):
     ) -> None:
         # before the wallet UI updates, we have to refresh the wallet caches to make the UI update faster
         logger.debug("refresh_caches_and_ui_lists")
-        if clear_cache:
-            self.wallet.clear_cache()
 
         def do() -> Any:
+            if clear_cache:
+                # only invalidates the cache entries depending on the changed transactions
+                self.wallet.refresh_caches()
             self.wallet.fill_commonly_used_caches()
 
         def on_done(result) -> None:
@@ -1120,6 +1186,13 @@ class QTWallet(QtWalletBase, BaseSaveableClass):
         self.signal_on_change_sync_status.emit(new)
         QApplication.processEvents()
 
+    def request_sync(self, priority: SyncPriority = SyncPriority.user) -> None:
+        "Syncs via the sync_scheduler if there is one, otherwise immediately"
+        if self.sync_scheduler:
+            self.sync_scheduler.request_sync(self.wallet.id, priority=priority)
+        else:
+            self.sync()
+
     def sync(self) -> None:
         if self.sync_status == SyncStatus.syncing:
             logger.info(f"Syncing already in progress")
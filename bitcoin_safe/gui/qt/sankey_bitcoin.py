@@ -183,11 +183,7 @@ class SankeyBitcoin(SankeyWidget):
                 colors[flow_index] = color
 
         wallets = get_wallets(self.signals)
-        outpoint_dict = {
-            outpoint_str: (python_utxo, wallet)
-            for wallet in wallets
-            for outpoint_str, python_utxo in wallet.get_all_txos_dict().items()
-        }
+        self.signals.txo_registry.sync()
 
         # input
         in_flows: List[int | None] = []
@@ -195,9 +191,10 @@ class SankeyBitcoin(SankeyWidget):
         for vout, outpoint in enumerate(prev_outpoints):
             outpoint_str = str(outpoint)
             flow_index = FlowIndex(flow_type=FlowType.InFlow, i=vout)
+            registry_entry = self.signals.txo_registry.get(outpoint_str, sync=False)
 
-            if outpoint_str in outpoint_dict:
-                python_utxo, wallet = outpoint_dict[outpoint_str]
+            if registry_entry:
+                python_utxo, _ = registry_entry
                 address = python_utxo.address
                 value = python_utxo.txout.value
                 in_flows.append(value)
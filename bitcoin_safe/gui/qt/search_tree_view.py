@@ -31,14 +31,16 @@ import logging
 
 from bitcoin_safe.html_utils import html_f
 from bitcoin_safe.i18n import translate
-from bitcoin_safe.signals import SignalsMin
+from bitcoin_safe.search_index import SearchHit, SearchKind, WalletSearchIndex
+from bitcoin_safe.signals import Signals, UpdateFilter
+from bitcoin_safe.threading_manager import TaskThread, ThreadingManager
 
 logger = logging.getLogger(__name__)
 
 import sys
-from typing import Callable, List, Optional
+from typing import Any, Callable, Dict, List, Optional, Tuple
 
-from PyQt6.QtCore import QEvent, QModelIndex, QObject, QPoint, Qt
+from PyQt6.QtCore import QEvent, QModelIndex, QObject, QPoint, Qt, QTimer
 from PyQt6.QtGui import (
     QKeyEvent,
     QPainter,
@@ -65,6 +67,7 @@ from PyQt6.QtWidgets import (
 from bitcoin_safe.gui.qt.my_treeview import MyTreeView, SearchableTab
 from bitcoin_safe.gui.qt.qt_wallet import QTWallet
 from bitcoin_safe.gui.qt.ui_tx import UITx_Creator
+from bitcoin_safe.gui.qt.util import custom_exception_handler
 
 
 class SearchHTMLDelegate(QStyledItemDelegate):
@@ -275,8 +278,9 @@ class SearchTreeView(QWidget):
         on_click: Optional[Callable] = None,
         result_width=None,
         result_height=300,
+        **kwargs,
     ) -> None:
-        super().__init__(parent)
+        super().__init__(parent, **kwargs)
         self.on_click = on_click
         self.do_search = do_search
         self.result_width = result_width
@@ -316,7 +320,9 @@ class SearchTreeView(QWidget):
         self.search_field.setPlaceholderText(translate("search_treeview", "Type to search..."))
 
     def on_search(self, text: str) -> None:
-        search_results = self.do_search(text)
+        self.show_results(text, self.do_search(text))
+
+    def show_results(self, text: str, search_results: ResultItem) -> None:
         self.tree_view.set_data(search_results)
         self.tree_view.update()  # Update the view to redraw with highlights
         self.tree_view.setVisible(bool(search_results))
@@ -352,14 +358,17 @@ class SearchTreeView(QWidget):
         return super().eventFilter(obj, event)
 
 
-class SearchWallets(SearchTreeView):
+class SearchWallets(SearchTreeView, ThreadingManager):
     def __init__(
         self,
         get_qt_wallets: Callable[[], List[QTWallet]],
-        signal_min: SignalsMin,
+        signal_min: Signals,
         parent=None,
         result_height=300,
         result_width=500,
+        threading_parent: ThreadingManager | None = None,
+        max_results=200,
+        debounce_ms=150,
     ) -> None:
         super().__init__(
             self.do_search,
@@ -368,11 +377,34 @@ class SearchWallets(SearchTreeView):
             on_click=self.search_result_on_click,
             result_height=result_height,
             result_width=result_width,
+            threading_parent=threading_parent,
         )
         self.signal_min = signal_min
+        self.max_results = max_results
 
         self.get_qt_wallets = get_qt_wallets
+        # wallet_id -> index
+        self.search_indexes: Dict[str, WalletSearchIndex] = {}
+        # every new search text increases the generation, which cancels the running search
+        self._search_generation = 0
+        self._search_text = ""
+        self._search_timer = QTimer(self)
+        self._search_timer.setSingleShot(True)
+        self._search_timer.setInterval(debounce_ms)
+        self._search_timer.timeout.connect(self.start_search)
+
         self.signal_min.language_switch.connect(self.updateUi)
+        self.signal_min.any_wallet_updated.connect(self.on_wallet_updated)
+
+    def on_wallet_updated(self, update_filter: UpdateFilter) -> None:
+        for search_index in self.search_indexes.values():
+            search_index.mark_dirty(update_filter)
+
+    def get_search_index(self, qt_wallet: QTWallet) -> WalletSearchIndex:
+        search_index = self.search_indexes.get(qt_wallet.wallet.id)
+        if not search_index:
+            search_index = self.search_indexes[qt_wallet.wallet.id] = WalletSearchIndex()
+        return search_index
 
     def search_result_on_click(self, result_item: ResultItem) -> None:
         # call the parent action first
@@ -401,93 +433,109 @@ class SearchWallets(SearchTreeView):
                 if isinstance(wallet_tabs, QTabWidget):
                     wallet_tabs.setCurrentWidget(result_item.obj.tab)
 
-    def do_search(self, search_text: str) -> ResultItem:
+    def on_search(self, text: str) -> None:
+        "Debounces the keystrokes and runs the search in a background thread"
+        self._search_text = text
+        self._search_generation += 1
+        if not text.strip():
+            self._search_timer.stop()
+            self.show_results(text, ResultItem(""))
+            return
+        self._search_timer.start()
+
+    def _search_wallets(
+        self,
+        search_text: str,
+        qt_wallets: List[QTWallet],
+        is_cancelled: Callable[[], bool] = lambda: False,
+    ) -> List[Tuple[QTWallet, List[SearchHit]]]:
+        results: List[Tuple[QTWallet, List[SearchHit]]] = []
+        remaining = self.max_results
+        for qt_wallet in qt_wallets:
+            if remaining <= 0 or is_cancelled():
+                break
+            search_index = self.get_search_index(qt_wallet)
+            search_index.sync(qt_wallet.wallet)
+            hits = search_index.search(search_text, max_results=remaining, is_cancelled=is_cancelled)
+            remaining -= len(hits)
+            results.append((qt_wallet, hits))
+        return results
+
+    def start_search(self) -> None:
+        text = self._search_text
+        search_text = text.strip()
+        generation = self._search_generation
+        qt_wallets = self.get_qt_wallets()
+        # forget the indexes of closed wallets
+        wallet_ids = [qt_wallet.wallet.id for qt_wallet in qt_wallets]
+        for wallet_id in list(self.search_indexes.keys()):
+            if wallet_id not in wallet_ids:
+                del self.search_indexes[wallet_id]
+        for qt_wallet in qt_wallets:
+            self.get_search_index(qt_wallet)
+
+        def is_cancelled() -> bool:
+            return generation != self._search_generation
+
+        def do() -> Any:
+            return self._search_wallets(search_text, qt_wallets, is_cancelled=is_cancelled)
+
+        def on_done(result) -> None:
+            pass
+
+        def on_success(results: List[Tuple[QTWallet, List[SearchHit]]]) -> None:
+            if is_cancelled():
+                return
+            self.show_results(text, self._result_tree(search_text, results))
+
+        def on_error(packed_error_info) -> None:
+            custom_exception_handler(*packed_error_info)
+
+        self.append_thread(TaskThread().add_and_start(do, on_success, on_done, on_error))
+
+    def _result_tree(self, search_text: str, results: List[Tuple[QTWallet, List[SearchHit]]]) -> ResultItem:
         def format_result_text(matching_string: str) -> str:
             return matching_string.replace(
                 search_text, f"<span style='background-color: #ADD8E6;'>{search_text}</span>"
             )
 
-        search_text = search_text.strip()
         root = ResultItem("")
-        for qt_wallet in self.get_qt_wallets():
-            wallet_item = ResultItem(html_f(qt_wallet.wallet.id, bf=True), obj=qt_wallet)
-
-            wallet_addresses = ResultItem(html_f(self.tr("Addresses"), bf=True), obj=qt_wallet.addresses_tab)
-            for address in qt_wallet.wallet.get_addresses():
-                if search_text in address:
-                    ResultItem(
-                        format_result_text(address),
-                        parent=wallet_addresses,
-                        obj=qt_wallet.address_list,
-                        obj_key=address,
-                    )
-                    # connect also the higher parents, so the results appear at all
-                    wallet_addresses.set_parent(wallet_item)
-                    wallet_item.set_parent(root)
-                label = qt_wallet.wallet.get_label_for_address(address, autofill_from_txs=False)
-                if label and (search_text.lower() in label.lower()):
-                    ResultItem(
-                        format_result_text(label),
-                        parent=wallet_addresses,
-                        obj=qt_wallet.address_list,
-                        obj_key=address,
-                    )
-                    # connect also the higher parents, so the results appear at all
-                    wallet_addresses.set_parent(wallet_item)
-                    wallet_item.set_parent(root)
-
-            wallet_tx_ids = ResultItem(html_f(self.tr("Transactions"), bf=True), obj=qt_wallet.history_tab)
-            for txid, fulltxdetail in qt_wallet.wallet.get_dict_fulltxdetail().items():
-                if search_text in txid:
-                    ResultItem(
-                        format_result_text(txid),
-                        parent=wallet_tx_ids,
-                        obj=qt_wallet.history_list,
-                        obj_key=txid,
-                    )
-                    # connect also the higher parents, so the results appear at all
-                    wallet_tx_ids.set_parent(wallet_item)
-                    wallet_item.set_parent(root)
-                label = qt_wallet.wallet.get_label_for_txid(txid, autofill_from_addresses=False)
-                if label and (search_text.lower() in label.lower()):
-                    ResultItem(
-                        format_result_text(label),
-                        parent=wallet_tx_ids,
-                        obj=qt_wallet.history_list,
-                        obj_key=txid,
-                    )
-                    # connect also the higher parents, so the results appear at all
-                    wallet_tx_ids.set_parent(wallet_item)
-                    wallet_item.set_parent(root)
-
-            wallet_utxos = ResultItem(html_f(self.tr("UTXOs"), bf=True), obj=qt_wallet.uitx_creator)
-            wallet_txos = ResultItem(html_f(self.tr("Spent Outputs"), bf=True), obj=qt_wallet.history_tab)
-            for pythonutxo in qt_wallet.wallet.get_all_txos_dict().values():
-                outpoint_str = str(pythonutxo.outpoint)
-                if search_text in outpoint_str:
-                    if pythonutxo.is_spent_by_txid:
-                        ResultItem(
-                            format_result_text(outpoint_str),
-                            parent=wallet_txos,
-                            obj=qt_wallet.history_list,
-                            obj_key=pythonutxo.is_spent_by_txid,
-                        )
-                        # connect also the higher parents, so the results appear at all
-                        wallet_txos.set_parent(wallet_item)
-                        wallet_item.set_parent(root)
-                    else:
-                        ResultItem(
-                            format_result_text(outpoint_str),
-                            parent=wallet_utxos,
-                            obj=qt_wallet.uitx_creator.utxo_list,
-                            obj_key=outpoint_str,
-                        )
-                        # connect also the higher parents, so the results appear at all
-                        wallet_utxos.set_parent(wallet_item)
-                        wallet_item.set_parent(root)
+        for qt_wallet, hits in results:
+            if not hits:
+                continue
+            wallet_item = ResultItem(html_f(qt_wallet.wallet.id, bf=True), parent=root, obj=qt_wallet)
+
+            # SearchKind -> (header, header obj, result obj)
+            targets: Dict[SearchKind, Tuple[str, Any, Any]] = {
+                SearchKind.Address: (self.tr("Addresses"), qt_wallet.addresses_tab, qt_wallet.address_list),
+                SearchKind.AddressLabel: (
+                    self.tr("Addresses"),
+                    qt_wallet.addresses_tab,
+                    qt_wallet.address_list,
+                ),
+                SearchKind.Txid: (self.tr("Transactions"), qt_wallet.history_tab, qt_wallet.history_list),
+                SearchKind.TxLabel: (self.tr("Transactions"), qt_wallet.history_tab, qt_wallet.history_list),
+                SearchKind.Utxo: (self.tr("UTXOs"), qt_wallet.uitx_creator, qt_wallet.uitx_creator.utxo_list),
+                SearchKind.SpentTxo: (
+                    self.tr("Spent Outputs"),
+                    qt_wallet.history_tab,
+                    qt_wallet.history_list,
+                ),
+            }
+            headers: Dict[str, ResultItem] = {}
+            for hit in hits:
+                header, header_obj, obj = targets[hit.kind]
+                if header not in headers:
+                    headers[header] = ResultItem(html_f(header, bf=True), parent=wallet_item, obj=header_obj)
+                ResultItem(format_result_text(hit.text), parent=headers[header], obj=obj, obj_key=hit.key)
 
         return root
 
+    def do_search(self, search_text: str) -> ResultItem:
+        "Synchronous search, without debouncing"
+        search_text = search_text.strip()
+        return self._result_tree(search_text, self._search_wallets(search_text, self.get_qt_wallets()))
+
 
 if __name__ == "__main__":
 
@@ -0,0 +1,229 @@
+#
+# Bitcoin Safe
+# Copyright (C) 2024 Andreas Griffin
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of version 3 of the GNU General Public License as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see https://www.gnu.org/licenses/gpl-3.0.html
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS
+# BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN
+# ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+# CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+import enum
+import logging
+import time
+from typing import TYPE_CHECKING, Callable, Dict, Optional
+
+from PyQt6.QtCore import QObject, QTimer
+
+from bitcoin_safe.gui.qt.qt_wallet_base import SyncStatus
+from bitcoin_safe.network_config import NetworkConfig
+from bitcoin_safe.pythonbdk_types import BlockchainType
+
+if TYPE_CHECKING:
+    from bitcoin_safe.gui.qt.qt_wallet import QTWallet
+
+logger = logging.getLogger(__name__)
+
+
+class SyncPriority(enum.IntEnum):
+    retry = 0  # retry after a failed sync
+    regular = 1  # periodic refresh
+    user = 2  # user action, broadcast, newly opened wallet
+
+
+def get_server_key(network_config: NetworkConfig) -> str:
+    "Identifies the server that a sync will connect to"
+    if network_config.server_type == BlockchainType.Electrum:
+        return f"electrum:{network_config.electrum_url}"
+    if network_config.server_type == BlockchainType.Esplora:
+        return f"esplora:{network_config.esplora_url}"
+    if network_config.server_type == BlockchainType.RPC:
+        return f"rpc:{network_config.rpc_ip}:{network_config.rpc_port}"
+    return f"cbf:{network_config.compactblockfilters_ip}:{network_config.compactblockfilters_port}"
+
+
+class SyncScheduler(QObject):
+    """Decides which wallets sync when.
+
+    - At most max_workers wallets sync at the same time, and at most
+      max_per_server of them against the same server.
+    - Repeated requests for the same wallet are coalesced into 1 pending
+      sync (or 1 follow-up sync, if the wallet is syncing right now).
+    - Higher priority first, and the visible wallet first among equal priorities.
+    - After a failed sync, the wallet is retried with exponential backoff.
+      A request with SyncPriority.user skips the backoff.
+    """
+
+    def __init__(
+        self,
+        get_visible_wallet_id: Callable[[], Optional[str]],
+        max_workers: int = 3,
+        max_per_server: int = 2,
+        backoff_base: float = 30,
+        backoff_max: float = 15 * 60,
+        parent: QObject | None = None,
+    ) -> None:
+        super().__init__(parent)
+        self.get_visible_wallet_id = get_visible_wallet_id
+        self.max_workers = max_workers
+        self.max_per_server = max_per_server
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+
+        self.qt_wallets: Dict[str, "QTWallet"] = {}
+        # wallet_id -> (priority, sequence number)
+        self.pending: Dict[str, tuple[SyncPriority, int]] = {}
+        # wallet_id -> server key
+        self.running: Dict[str, str] = {}
+        self._resync_after: Dict[str, SyncPriority] = {}
+        self._failures: Dict[str, int] = {}
+        self._not_before: Dict[str, float] = {}
+        self._sequence = 0
+        self._scheduling = False
+        self._reschedule = False
+
+        self.timer_backoff = QTimer(self)
+        self.timer_backoff.setSingleShot(True)
+        self.timer_backoff.timeout.connect(self.schedule)
+
+    def add_qt_wallet(self, qt_wallet: "QTWallet") -> None:
+        wallet_id = qt_wallet.wallet.id
+        self.qt_wallets[wallet_id] = qt_wallet
+        qt_wallet.signal_on_change_sync_status.connect(
+            lambda sync_status: self.on_sync_status_changed(wallet_id, sync_status)
+        )
+
+    def remove_qt_wallet(self, wallet_id: str) -> None:
+        self.qt_wallets.pop(wallet_id, None)
+        self.pending.pop(wallet_id, None)
+        self.running.pop(wallet_id, None)
+        self._resync_after.pop(wallet_id, None)
+        self._failures.pop(wallet_id, None)
+        self._not_before.pop(wallet_id, None)
+        self.schedule()
+
+    def request_sync(self, wallet_id: str, priority: SyncPriority = SyncPriority.regular) -> None:
+        if wallet_id not in self.qt_wallets:
+            return
+        if priority >= SyncPriority.user:
+            self._not_before.pop(wallet_id, None)
+
+        if wallet_id in self.running:
+            self._resync_after[wallet_id] = max(priority, self._resync_after.get(wallet_id, priority))
+            return
+
+        if wallet_id in self.pending:
+            old_priority, sequence = self.pending[wallet_id]
+            self.pending[wallet_id] = (max(priority, old_priority), sequence)
+        else:
+            self._sequence += 1
+            self.pending[wallet_id] = (priority, self._sequence)
+        self.schedule()
+
+    def _sort_key(self, wallet_id: str, visible_wallet_id: Optional[str]):
+        priority, sequence = self.pending[wallet_id]
+        return (-priority, wallet_id != visible_wallet_id, sequence)
+
+    def _backoff_delay(self, wallet_id: str) -> float:
+        failures = self._failures.get(wallet_id, 0)
+        if not failures:
+            return 0
+        return min(self.backoff_base * 2 ** (failures - 1), self.backoff_max)
+
+    def schedule(self) -> None:
+        # qt_wallet.sync() processes events, which can call schedule() again
+        if self._scheduling:
+            self._reschedule = True
+            return
+        self._scheduling = True
+        try:
+            self._reschedule = True
+            while self._reschedule:
+                self._reschedule = False
+                self._schedule()
+        finally:
+            self._scheduling = False
+
+    def _schedule(self) -> None:
+        now = time.monotonic()
+        visible_wallet_id = self.get_visible_wallet_id()
+        next_wakeup: Optional[float] = None
+
+        for wallet_id in sorted(self.pending, key=lambda w: self._sort_key(w, visible_wallet_id)):
+            if len(self.running) >= self.max_workers:
+                break
+            if wallet_id not in self.pending:
+                # was started by a nested schedule()
+                continue
+            not_before = self._not_before.get(wallet_id, 0)
+            if not_before > now:
+                next_wakeup = min(next_wakeup, not_before) if next_wakeup else not_before
+                continue
+            server_key = get_server_key(self.qt_wallets[wallet_id].config.network_config)
+            if list(self.running.values()).count(server_key) >= self.max_per_server:
+                continue
+            self._start(wallet_id, server_key)
+
+        if next_wakeup is not None:
+            self.timer_backoff.start(int(max(next_wakeup - now, 0) * 1000) + 1)
+
+    def _start(self, wallet_id: str, server_key: str) -> None:
+        qt_wallet = self.qt_wallets[wallet_id]
+        self.pending.pop(wallet_id)
+        self.running[wallet_id] = server_key
+        if qt_wallet.sync_status == SyncStatus.syncing:
+            # started outside of the scheduler. Wait for it to finish
+            return
+        logger.info(f"{self.__class__.__name__}: Start syncing {wallet_id}")
+        qt_wallet.sync()
+
+    def on_sync_status_changed(self, wallet_id: str, sync_status: SyncStatus) -> None:
+        if wallet_id not in self.qt_wallets:
+            return
+        if sync_status == SyncStatus.syncing:
+            if wallet_id not in self.running:
+                # started outside of the scheduler. It still counts towards the limits
+                self.pending.pop(wallet_id, None)
+                self.running[wallet_id] = get_server_key(self.qt_wallets[wallet_id].config.network_config)
+            return
+        if sync_status not in [SyncStatus.synced, SyncStatus.error]:
+            return
+
+        self.running.pop(wallet_id, None)
+        if sync_status == SyncStatus.error:
+            self._failures[wallet_id] = self._failures.get(wallet_id, 0) + 1
+            delay = self._backoff_delay(wallet_id)
+            self._not_before[wallet_id] = time.monotonic() + delay
+            logger.info(f"{self.__class__.__name__}: Sync of {wallet_id} failed. Retry in {delay}s")
+            self.request_sync(wallet_id, priority=self._resync_after.pop(wallet_id, SyncPriority.retry))
+        else:
+            self._failures.pop(wallet_id, None)
+            self._not_before.pop(wallet_id, None)
+            resync_priority = self._resync_after.pop(wallet_id, None)
+            if resync_priority is not None:
+                self.request_sync(wallet_id, priority=resync_priority)
+        self.schedule()
+
+    def close(self) -> None:
+        self.timer_backoff.stop()
+        self.pending.clear()
+        self._resync_after.clear()
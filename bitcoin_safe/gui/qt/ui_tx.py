@@ -513,7 +513,7 @@ class UITx_Viewer(UITx_Base, ThreadingManager, UITx_ViewerTab):
     def edit(self) -> None:
 
         txinfos = ToolsTxUiInfo.from_tx(
-            self.extract_tx(), self.fee_info, self.network, get_wallets(self.signals)
+            self.extract_tx(), self.fee_info, self.network, self.signals.txo_registry
         )
 
         self.signals.open_tx_like.emit(txinfos)
@@ -593,9 +593,14 @@ class UITx_Viewer(UITx_Base, ThreadingManager, UITx_ViewerTab):
 
     def _set_blockchain(self):
         for wallet in get_wallets(self.signals):
-            if wallet.blockchain:
-                self.blockchain = wallet.blockchain
-                logger.error(f"Using {self.blockchain} from wallet {wallet.id}")
+            try:
+                # the pool hands out a health-checked connection, that the wallets share
+                self.blockchain = wallet.init_blockchain()
+            except Exception as e:
+                logger.error(f"Could not get a blockchain connection from wallet {wallet.id}: {e}")
+                continue
+            logger.info(f"Using {self.blockchain} from wallet {wallet.id}")
+            return
 
     def broadcast(self) -> None:
         if not self.data.data_type == DataType.Tx:
@@ -605,8 +610,7 @@ class UITx_Viewer(UITx_Base, ThreadingManager, UITx_ViewerTab):
             return
         tx = self.data.data
 
-        if not self.blockchain:
-            self._set_blockchain()
+        self._set_blockchain()
 
         logger.debug(f"broadcasting {serialized_to_hex( self.data.data.serialize())}")
         success = self._broadcast(tx)
@@ -623,20 +627,17 @@ class UITx_Viewer(UITx_Base, ThreadingManager, UITx_ViewerTab):
             return None
 
         # collect all wallets that have input utxos
-        inputs: List[bdk.TxIn] = self.extract_tx().input()
-
-        outpoint_dict = {
-            outpoint_str: (python_utxo, wallet)
-            for wallet in get_wallets(self.signals)
-            for outpoint_str, python_utxo in wallet.get_all_txos_dict().items()
-        }
+        wallets = self.signals.get_wallets()
+        self.signals.txo_registry.sync()
 
         # fill fingerprints, if not available
-        for this_input, simple_input in zip(inputs, simple_psbt.inputs):
-            outpoint_str = str(this_input.previous_output)
-            if outpoint_str not in outpoint_dict:
+        for simple_input in simple_psbt.inputs:
+            result = self.signals.txo_registry.get(
+                OutPoint.from_bdk(simple_input.txin.previous_output), sync=False
+            )
+            if not result or result[1] not in wallets:
                 continue
-            python_utxo, wallet = outpoint_dict[outpoint_str]
+            wallet = wallets[result[1]]
 
             simple_input.wallet_id = wallet.id
             simple_input.m_of_n = wallet.get_mn_tuple()
@@ -869,12 +870,11 @@ class UITx_Viewer(UITx_Base, ThreadingManager, UITx_ViewerTab):
                 return FeeInfo(fee_amount=txdetails.fee, vsize=tx.vsize(), is_estimated=False)
 
         #  try via utxos
-        pythonutxo_dict: Dict[str, PythonUtxo] = {}  # outpoint_str:PythonUTXO
-        for wallet_ in wallets:
-            pythonutxo_dict.update(wallet_.get_all_txos_dict(include_not_mine=True))
+        prev_outpoints = get_prev_outpoints(tx)
+        pythonutxo_dict = self.signals.txo_registry.get_python_txos(prev_outpoints, include_not_mine=True)
 
         total_input_value = 0
-        for outpoint in get_prev_outpoints(tx):
+        for outpoint in prev_outpoints:
             python_txo = pythonutxo_dict.get(str(outpoint))
             if not python_txo:
                 # ALL inputs must be known with value! Otherwise no fee can be calculated
@@ -942,16 +942,17 @@ class UITx_Viewer(UITx_Base, ThreadingManager, UITx_ViewerTab):
         self.set_category_warning_bar(
             tx.input(), recipient_addresses=[recipient.address for recipient in self.recipients.recipients]
         )
-        self.set_sankey(tx, fee_info=fee_info, txo_dict=self._get_python_txos())
+        self.set_sankey(tx, fee_info=fee_info, txo_dict=self._get_python_txos(tx))
         self.label_line_edit.updateUi()
         self.label_line_edit.autofill_label_and_category()
         self.container_label.setHidden(False)
 
-    def _get_python_txos(self):
-        txo_dict: Dict[str, PythonUtxo] = {}  # outpoint_str:PythonUTXO
-        for wallet_ in get_wallets(self.signals):
-            txo_dict.update(wallet_.get_all_txos_dict(include_not_mine=True))
-        return txo_dict
+    def _get_python_txos(self, tx: bdk.Transaction) -> Dict[str, PythonUtxo]:
+        "Returns {outpoint_str: PythonUTXO} of the inputs and outputs of tx"
+        outpoints = get_prev_outpoints(tx) + [
+            OutPoint(txid=tx.txid(), vout=vout) for vout in range(len(tx.output()))
+        ]
+        return self.signals.txo_registry.get_python_txos(outpoints, include_not_mine=True)
 
     def get_synctabs(self):
         return {
@@ -1084,7 +1085,7 @@ class UITx_Viewer(UITx_Base, ThreadingManager, UITx_ViewerTab):
         )
 
         txo_dict = SimplePSBT.from_psbt(psbt).outpoints_as_python_utxo_dict(self.network)
-        txo_dict.update(self._get_python_txos())
+        txo_dict.update(self._get_python_txos(psbt.extract_tx()))
         self.set_sankey(psbt.extract_tx(), fee_info=fee_info, txo_dict=txo_dict)
         self.container_label.setHidden(True)
 
@@ -1345,6 +1346,7 @@ class UITx_Creator(UITx_Base, SearchableTab):
         )
 
     def reset_fee_rate(self) -> None:
+        self.fee_group.set_fee_stats(self.wallet.get_fee_stats())
         self.fee_group.set_fee_rate(self.mempool_data.get_prio_fee_rates()[TxPrio.low])
 
     def clear_ui(self) -> None:
@@ -1573,7 +1575,7 @@ class UITx_Creator(UITx_Base, SearchableTab):
 
         if use_this_tab == self.tab_inputs_utxos:
             ToolsTxUiInfo.fill_txo_dict_from_outpoints(
-                infos, self.utxo_list.get_selected_outpoints(), wallets
+                infos, self.utxo_list.get_selected_outpoints(), self.signals.txo_registry
             )
             infos.spend_all_utxos = True
 
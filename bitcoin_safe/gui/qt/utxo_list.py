@@ -71,7 +71,7 @@ from PyQt6.QtGui import QStandardItem
 from PyQt6.QtWidgets import QAbstractItemView, QHeaderView, QWidget
 
 from ...i18n import translate
-from ...signals import Signals, UpdateFilter, UpdateFilterReason
+from ...signals import Signals, UpdateFilter
 from ...util import Satoshis, block_explorer_URL, clean_list, time_logger
 from ...wallet import TxStatus, Wallet, get_wallets
 from .category_list import CategoryEditor
@@ -134,6 +134,7 @@ class UTXOList(MyTreeView):
         Columns.AMOUNT: Qt.AlignmentFlag.AlignRight | Qt.AlignmentFlag.AlignVCenter,
         Columns.PARENTS: Qt.AlignmentFlag.AlignCenter | Qt.AlignmentFlag.AlignVCenter,
     }
+    lazy_columns = {Columns.STATUS, Columns.WALLET_ID, Columns.ADDRESS, Columns.CATEGORY, Columns.LABEL}
 
     column_widths: Dict[MyTreeView.BaseColumnsEnum, int] = {
         Columns.STATUS: 15,
@@ -319,22 +320,11 @@ class UTXOList(MyTreeView):
 
         self._before_update_content()
 
-        log_info = []
-        model = self._source_model
-        # Select rows with an ID in id_list
-        for row in range(model.rowCount()):
-            outpoint: OutPoint = model.data(model.index(row, self.key_column))
+        rows = self.rows_to_refresh(update_filter, keys=update_filter.outpoints)
+        for outpoint, row in rows.items():
+            self.refresh_row(outpoint, row)
 
-            if (
-                update_filter.reason == UpdateFilterReason.ChainHeightAdvanced
-                and model.data(
-                    model.index(row, self.key_column), role=MyItemDataRole.ROLE_FREQUENT_UPDATEFLAG
-                )
-            ) or any([outpoint in update_filter.outpoints]):
-                log_info.append((row, str(outpoint)))
-                self.refresh_row(outpoint, row)
-
-        logger.debug(f"Updated  {log_info}")
+        logger.debug(f"Updated  {[(row, str(outpoint)) for outpoint, row in rows.items()]}")
 
         self._after_update_content()
 
@@ -348,18 +338,23 @@ class UTXOList(MyTreeView):
         self._before_update_content()
 
         # build dicts to look up the outpoints later (fast)
+        outpoints = [OutPoint.from_bdk(outpoint) for outpoint in self.get_outpoints()]
+        wallets = self.signals.get_wallets()
+        self.signals.txo_registry.sync()
 
         self._wallet_dict = {}  # outpoint_str:Wallet
         self._pythonutxo_dict = {}  # outpoint_str:PythonUTXO
-        for wallet_ in get_wallets(self.signals):
-            txos_dict = wallet_.get_all_txos_dict(include_not_mine=True)
-            self._pythonutxo_dict.update(txos_dict)
-            self._wallet_dict.update({outpoint_str: wallet_ for outpoint_str in txos_dict.keys()})
+        for outpoint in outpoints:
+            registry_entry = self.signals.txo_registry.get(outpoint, include_not_mine=True, sync=False)
+            if not registry_entry or registry_entry[1] not in wallets:
+                continue
+            python_utxo, wallet_id = registry_entry
+            self._pythonutxo_dict[str(outpoint)] = python_utxo
+            self._wallet_dict[str(outpoint)] = wallets[wallet_id]
 
         self._source_model.clear()
         self.update_headers(self.get_headers())
-        for i, outpoint in enumerate(self.get_outpoints()):
-            outpoint = OutPoint.from_bdk(outpoint)
+        for i, outpoint in enumerate(outpoints):
             wallet, python_utxo, address, satoshis = self.get_wallet_address_satoshis(outpoint)
 
             labels = [""] * len(self.Columns)
@@ -384,10 +379,7 @@ class UTXOList(MyTreeView):
                 satoshis.value if satoshis else str_format(satoshis), MyItemDataRole.ROLE_CLIPBOARD_DATA
             )
 
-            # add item
-            count = self._source_model.rowCount()
-            self._source_model.insertRow(count, items)
-            self.refresh_row(outpoint, count)
+            self.append_row(items)
 
         if isinstance(header := self.header(), QHeaderView):
             header.setSectionResizeMode(self.Columns.ADDRESS, QHeaderView.ResizeMode.Interactive)
@@ -410,6 +402,12 @@ class UTXOList(MyTreeView):
         _items = [self._source_model.item(row, col) for col in self.Columns]
         items = [entry for entry in _items if entry]
 
+        self._source_model.set_row_index(
+            key,
+            addresses=[address] if address else [],
+            categories=[wallet.labels.get_category(address)] if wallet and address else [],
+            frequent=needs_frequent_flag(status=status),
+        )
         if needs_frequent_flag(status=status):
             # unconfirmed txos might be confirmed, and need to be updated more often
             items[self.key_column].setData(True, role=MyItemDataRole.ROLE_FREQUENT_UPDATEFLAG)
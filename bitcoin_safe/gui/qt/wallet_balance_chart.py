@@ -31,11 +31,13 @@ import datetime
 import logging
 import random
 import sys
+from typing import List, Optional, Tuple
 
+import bdkpython as bdk
 import numpy as np
 from PyQt6.QtCharts import QChart, QChartView, QDateTimeAxis, QLineSeries, QValueAxis
-from PyQt6.QtCore import QDateTime, QMargins, Qt, QTimer
-from PyQt6.QtGui import QPalette
+from PyQt6.QtCore import QDateTime, QMargins, QPointF, Qt, QTimer
+from PyQt6.QtGui import QPalette, QResizeEvent
 from PyQt6.QtWidgets import (
     QApplication,
     QGraphicsLayout,
@@ -51,6 +53,34 @@ from bitcoin_safe.wallet import Wallet
 logger = logging.getLogger(__name__)
 
 
+def downsample_min_max(data: np.ndarray, n_buckets: int) -> np.ndarray:
+    """Reduces the (timestamp, value) rows of data to at most 4 rows per
+    time bucket: the first, the last, the minimum and the maximum.
+
+    The extrema are preserved, such that a chart with n_buckets pixels
+    looks the same as with all rows.
+    """
+    if n_buckets <= 0 or len(data) <= 4 * n_buckets:
+        return data
+
+    timestamps = data[:, 0]
+    values = data[:, 1]
+    t_min, t_max = np.min(timestamps), np.max(timestamps)
+    if t_max > t_min:
+        buckets = ((timestamps - t_min) / (t_max - t_min) * (n_buckets - 1)).astype(np.int64)
+    else:
+        buckets = np.arange(len(data), dtype=np.int64) * n_buckets // len(data)
+    # the rows are ordered by time, but for slightly unordered timestamps the buckets must stay contiguous
+    buckets = np.maximum.accumulate(buckets)
+
+    starts = np.flatnonzero(np.diff(buckets, prepend=-1))
+    ends = np.append(starts[1:], len(data)) - 1
+    # within each bucket sorted by value
+    order = np.lexsort((values, buckets))
+    keep = np.unique(np.concatenate([starts, ends, order[starts], order[ends]]))
+    return data[keep]
+
+
 class BalanceChart(QWidget):
     def __init__(self, y_axis_text="Balance", parent: QWidget | None = None) -> None:
         super().__init__(parent)
@@ -95,6 +125,22 @@ class BalanceChart(QWidget):
         # Set layout
         self.setLayout(layout)
 
+        # the data is downsampled to the chart width, so a resize needs a redraw
+        self._last_update_chart_args: Optional[Tuple[np.ndarray, bool]] = None
+        self._resize_timer = QTimer(self)
+        self._resize_timer.setSingleShot(True)
+        self._resize_timer.setInterval(200)
+        self._resize_timer.timeout.connect(self._redraw)
+
+    def resizeEvent(self, a0: QResizeEvent | None) -> None:
+        super().resizeEvent(a0)
+        if self._last_update_chart_args is not None:
+            self._resize_timer.start()
+
+    def _redraw(self) -> None:
+        if self._last_update_chart_args is not None:
+            self.update_chart(*self._last_update_chart_args)
+
     def set_value_axis_label_format(self, max_value) -> None:
         if max_value != 0:
             # Determine the number of digits before the decimal
@@ -114,7 +160,8 @@ class BalanceChart(QWidget):
     def update_chart(self, balance_data, project_until_now=True) -> None:
         if len(balance_data) == 0:
             return
-        balance_data = np.array(balance_data).copy()
+        balance_data = np.array(balance_data, dtype=float).reshape(-1, 2)
+        self._last_update_chart_args = (balance_data, project_until_now)
 
         self.datetime_axis.setTitleText(self.tr("Date"))
         self.datetime_axis.setTickCount(6)
@@ -125,15 +172,13 @@ class BalanceChart(QWidget):
         self.chart.removeAllSeries()
 
         # Variables to store the min/max values for the axes
-        min_balance = 0
-        max_balance = 0
-        min_timestamp = float("inf")
-        max_timestamp = float("-inf")
-        for timestamp, balance in balance_data:
-            max_balance = max(max_balance, balance)
-            min_balance = min(min_balance, balance)
-            max_timestamp = max(max_timestamp, timestamp)
-            min_timestamp = min(min_timestamp, timestamp)
+        min_balance = min(0, np.min(balance_data[:, 1]))
+        max_balance = max(0, np.max(balance_data[:, 1]))
+        min_timestamp = np.min(balance_data[:, 0])
+        max_timestamp = np.max(balance_data[:, 0])
+
+        # there is no point in drawing more data points than pixels
+        balance_data = downsample_min_max(balance_data, n_buckets=self.chart_view.width())
 
         #  add the 0 balance as first data point
         balance_data = np.vstack(
@@ -160,20 +205,16 @@ class BalanceChart(QWidget):
         # Create Line series
         series = QLineSeries()
 
-        for i, (timestamp, balance) in enumerate(balance_data[:-1]):
-            next_timestamp, _ = balance_data[i + 1]
-            series.append(
-                QDateTime.fromSecsSinceEpoch(int(timestamp)).toMSecsSinceEpoch(),
-                balance,
-            )
-            series.append(
-                QDateTime.fromSecsSinceEpoch(int(next_timestamp)).toMSecsSinceEpoch(),
-                balance,
-            )
-
-        # Add the last data point
-        timestamp, balance = balance_data[-1]
-        series.append(QDateTime.fromSecsSinceEpoch(int(timestamp)).toMSecsSinceEpoch(), balance)
+        # a step line: every balance is held until the next timestamp
+        msecs = balance_data[:, 0].astype(np.int64) * 1000
+        balances = balance_data[:, 1]
+        x = np.empty(2 * len(balance_data) - 1, dtype=np.int64)
+        y = np.empty(2 * len(balance_data) - 1)
+        x[0::2] = msecs
+        x[1::2] = msecs[1:]
+        y[0::2] = balances
+        y[1::2] = balances[:-1]
+        series.replace([QPointF(float(x_i), float(y_i)) for x_i, y_i in zip(x, y)])
 
         self.datetime_axis.setRange(
             QDateTime.fromSecsSinceEpoch(int(min_timestamp)),
@@ -236,6 +277,13 @@ class WalletBalanceChart(BalanceChart):
         self.wallet = wallet
         self.wallet_signals = wallet_signals
 
+        # the cumulative balance timeline, patched from the tx delta
+        self._sorted_txs: Optional[List[bdk.TransactionDetails]] = None
+        self._txids: List[str] = []
+        self._tx_rows: List[Tuple[Optional[int], int]] = []  # (confirmation timestamp, delta)
+        self._timestamps = np.empty(0)  # nan for unconfirmed txs
+        self._balances = np.empty(0, dtype=np.int64)
+
         self.updateUi()
 
         # signals
@@ -261,20 +309,56 @@ class WalletBalanceChart(BalanceChart):
 
         logger.debug(f"{self.__class__.__name__} update_with_filter {update_filter}")
 
-        # Calculate balance
-        balance = 0
-        balance_data = []
-        for transaction_details in self.wallet.sorted_delta_list_transactions():
-            balance += transaction_details.received - transaction_details.sent
-            time = (
-                transaction_details.confirmation_time.timestamp
-                if transaction_details.confirmation_time
-                else datetime.datetime.now().timestamp()
-            )
-            balance_data.append((time, balance / 1e8))
+        self.update_balance_timeline()
+        if not len(self._balances):
+            return
 
+        timestamps = np.where(
+            np.isnan(self._timestamps), datetime.datetime.now().timestamp(), self._timestamps
+        )
         # Update BalanceChart
-        self.update_chart(balance_data)
+        self.update_chart(np.column_stack([timestamps, self._balances / 1e8]))
+
+    def update_balance_timeline(self) -> None:
+        """Patches the cached cumulative balances.
+
+        Only the balances from the first changed transaction onward are
+        recomputed.
+        """
+        sorted_txs = self.wallet.sorted_delta_list_transactions()
+        if sorted_txs is self._sorted_txs:
+            return
+        self._sorted_txs = sorted_txs
+
+        txids = [tx.txid for tx in sorted_txs]
+        tx_rows = [
+            (tx.confirmation_time.timestamp if tx.confirmation_time else None, tx.received - tx.sent)
+            for tx in sorted_txs
+        ]
+        first_changed = min(len(self._txids), len(txids))
+        for i, (old_txid, txid, old_row, row) in enumerate(zip(self._txids, txids, self._tx_rows, tx_rows)):
+            if old_txid != txid or old_row != row:
+                first_changed = i
+                break
+
+        new_rows = tx_rows[first_changed:]
+        start_balance = self._balances[first_changed - 1] if first_changed else 0
+        self._timestamps = np.concatenate(
+            [
+                self._timestamps[:first_changed],
+                np.array(
+                    [np.nan if timestamp is None else timestamp for timestamp, _ in new_rows], dtype=float
+                ),
+            ]
+        )
+        self._balances = np.concatenate(
+            [
+                self._balances[:first_changed],
+                start_balance + np.cumsum(np.array([delta for _, delta in new_rows], dtype=np.int64)),
+            ]
+        )
+        self._txids = txids
+        self._tx_rows = tx_rows
 
 
 class TransactionSimulator(QMainWindow):
@@ -936,7 +936,7 @@ class ReceiveTest(BaseTab):
 
             self.check_button.set_enable_signal(self.refs.qtwalletbase.signal_after_sync)
             one_time_signal_connection(self.refs.qtwalletbase.signal_after_sync, on_sync_done)
-            self.refs.qt_wallet.sync()
+            self.refs.qt_wallet.request_sync()
 
         self.check_button.clicked.connect(start_sync)
 
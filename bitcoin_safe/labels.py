@@ -39,6 +39,7 @@ from bitcoin_safe.util import (
 logger = logging.getLogger(__name__)
 import copy
 import json
+import threading
 from typing import Any, Dict, List, Literal, Union
 
 from bitcoin_qr_tools.data import Data, DataType
@@ -175,22 +176,80 @@ class Label(SaveAllClass):
 
 
 class Labels(BaseSaveableClass):
-    VERSION = "0.1.0"
+    """The labels are saved column-wise (label_columns), which json can (de)serialize
+    without a python call per label.  The Label objects are only created when
+    the data is first accessed.
+    """
+
+    VERSION = "0.2.0"
     known_classes = {**BaseSaveableClass.known_classes, "Label": Label}
+    column_keys = [key.name for key in Key]
 
     def __init__(
         self,
         data: Dict[str, Label] | None = None,
         categories: Optional[List[str]] = None,
         default_category: str = "default",
+        label_columns: Dict[str, List[Any]] | None = None,
     ) -> None:
         super().__init__()
 
         # "tb1q6xhxcrzmjwf6ce5jlj08gyrmu4eq3zwpv0ss3f":{ "type": "addr", "ref": "tb1q6xhxcrzmjwf6ce5jlj08gyrmu4eq3zwpv0ss3f", "label": "Address" }
-        self.data: Dict[str, Label] = data if data else {}
+        # either data or label_columns (which is converted into data lazily)
+        self._label_columns = label_columns if label_columns and not data else None
+        self._data: Optional[Dict[str, Label]] = None if self._label_columns else (data if data else {})
+        self._data_lock = threading.Lock()
         self.categories: List[str] = categories if categories else []
         self.default_category = default_category
 
+    @property
+    def data(self) -> Dict[str, Label]:
+        if self._data is None:
+            with self._data_lock:
+                if self._data is None and self._label_columns is not None:
+                    self._data = self._labels_from_columns(self._label_columns)
+                    self._label_columns = None
+        assert self._data is not None
+        return self._data
+
+    @classmethod
+    def _labels_from_columns(cls, label_columns: Dict[str, List[Any]]) -> Dict[str, Label]:
+        refs = label_columns["ref"]
+        # columns with only None values are not saved
+        columns = [label_columns.get(key) or [None] * len(refs) for key in cls.column_keys]
+        label_types = {label_type.name: label_type for label_type in LabelType}
+
+        data: Dict[str, Label] = {}
+        for type, ref, label, origin, spendable, category, timestamp in zip(*columns):
+            data[ref] = Label(
+                type=label_types[type],
+                ref=ref,
+                timestamp=timestamp,
+                label=label,
+                origin=origin,
+                spendable=spendable,
+                category=category,
+            )
+        return data
+
+    def _labels_to_columns(self) -> Dict[str, List[Any]]:
+        if self._data is None and self._label_columns is not None:
+            # never accessed, so unchanged
+            return self._label_columns
+
+        items = list(self.data.values())
+        label_columns: Dict[str, List[Any]] = {
+            "type": [item.type.name for item in items],
+            "ref": [item.ref for item in items],
+        }
+        for key in self.column_keys:
+            if key in label_columns:
+                continue
+            column = [getattr(item, key) for item in items]
+            if any(value is not None for value in column):
+                label_columns[key] = column
+        return label_columns
+
     def add_category(self, value: str) -> None:
         if value not in self.categories:
             self.categories.append(value)
@@ -291,7 +350,7 @@ class Labels(BaseSaveableClass):
     def dump(self) -> Dict:
         d = super().dump()
 
-        d["data"] = self.data
+        d["label_columns"] = self._labels_to_columns()
         d["default_category"] = self.default_category
 
         keys = ["categories"]
@@ -332,6 +391,7 @@ class Labels(BaseSaveableClass):
                 dct["data"] = {
                     k: Label(**v, timestamp=datetime.now().timestamp()) for k, v in dct["data"].items()
                 }
+        # from 0.2.0 on the labels are in label_columns. "data" is still loaded from older files
 
         # now the VERSION is newest, so it can be deleted from the dict
         if "VERSION" in dct:
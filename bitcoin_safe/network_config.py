@@ -34,7 +34,8 @@ from packaging import version
 
 logger = logging.getLogger(__name__)
 
-from typing import Any, Dict
+from typing import Any, Dict, Optional
+from urllib.parse import urlparse
 
 import bdkpython as bdk
 
@@ -48,6 +49,14 @@ MIN_RELAY_FEE = 1
 FEE_RATIO_HIGH_WARNING = 0.05  # warn user if fee/amount for on-chain tx is higher than this
 
 
+def get_host(url: str) -> str:
+    return urlparse(url if "://" in url else f"tcp://{url}").hostname or ""
+
+
+def is_local_host(host: str) -> bool:
+    return host in ["localhost", "127.0.0.1", "::1"] or host.endswith(".local")
+
+
 def get_mempool_url(network: bdk.Network) -> Dict[str, str]:
     d = {
         bdk.Network.BITCOIN: {
@@ -301,6 +310,26 @@ class NetworkConfig(BaseSaveableClass):
 
         self.mempool_url: str = get_mempool_url(network)["default"]
 
+        # None = auto-tuned, see get_esplora_concurrency and get_timeout
+        self.esplora_concurrency: Optional[int] = None
+        self.timeout: Optional[int] = None
+        self.electrum_retry: int = 2
+
+    def get_esplora_concurrency(self) -> int:
+        "Number of parallel requests to the esplora server"
+        if self.esplora_concurrency:
+            return self.esplora_concurrency
+        # public servers rate limit, a local server can handle many parallel requests
+        return 16 if is_local_host(get_host(self.esplora_url)) else 4
+
+    def get_timeout(self) -> int:
+        "Timeout in seconds for requests to the electrum and esplora server"
+        if self.timeout:
+            return self.timeout
+        url = self.esplora_url if self.server_type == BlockchainType.Esplora else self.electrum_url
+        # tor has a high latency
+        return 30 if get_host(url).endswith(".onion") else 10
+
     def dump(self) -> Dict[str, Any]:
         d = super().dump()
         d.update(self.__dict__)
@@ -32,10 +32,13 @@ import logging
 logger = logging.getLogger(__name__)
 
 
-import json
+import base64
+import hashlib
+import struct
 from dataclasses import dataclass
+from functools import lru_cache
 from math import ceil
-from typing import Any, Dict, List, Tuple
+from typing import Any, Dict, List, NamedTuple, Tuple
 
 import bdkpython as bdk
 
@@ -213,7 +216,7 @@ class FeeInfo:
         # Estimate the size of the transaction
         # This part requires the transaction size estimation logic, which might need information about inputs and outputs
         # For simplicity, let's assume you have a function estimate_tx_size(psbt_data) that can estimate the size
-        vsize = weight_to_vsize(estimate_tx_weight(input_mn_tuples, len(psbt.extract_tx().output())))
+        vsize = weight_to_vsize(estimate_tx_weight(input_mn_tuples, len(simple_psbt.outputs)))
 
         return FeeInfo(psbt.fee_amount(), vsize, is_estimated=True)
 
@@ -408,6 +411,202 @@ class SimpleOutput:
         return TxOut(value=self.value, script_pubkey=hex_to_script(self.script_pubkey))
 
 
+class _ByteReader:
+    def __init__(self, data: bytes) -> None:
+        self.data = data
+        self.pos = 0
+
+    def at_end(self) -> bool:
+        return self.pos >= len(self.data)
+
+    def read(self, n: int) -> bytes:
+        if self.pos + n > len(self.data):
+            raise ValueError("Unexpected end of PSBT data")
+        result = self.data[self.pos : self.pos + n]
+        self.pos += n
+        return result
+
+    def read_uint(self, fmt: str) -> int:
+        return struct.unpack(fmt, self.read(struct.calcsize(fmt)))[0]
+
+    def read_compact_size(self) -> int:
+        n = self.read(1)[0]
+        if n == 0xFD:
+            return self.read_uint("<H")
+        if n == 0xFE:
+            return self.read_uint("<I")
+        if n == 0xFF:
+            return self.read_uint("<Q")
+        return n
+
+    def read_var_bytes(self) -> bytes:
+        return self.read(self.read_compact_size())
+
+
+def _read_txout(reader: _ByteReader) -> Dict[str, Any]:
+    value = reader.read_uint("<Q")
+    return {"value": value, "script_pubkey": reader.read_var_bytes().hex()}
+
+
+def _read_witness(reader: _ByteReader) -> List[str]:
+    return [reader.read_var_bytes().hex() for _ in range(reader.read_compact_size())]
+
+
+def _parse_tx(data: bytes) -> Dict[str, Any]:
+    "Returns the transaction in the same structure as psbt.json_serialize()"
+    reader = _ByteReader(data)
+    version = reader.read_uint("<i")
+    n_inputs = reader.read_compact_size()
+    has_witness = n_inputs == 0
+    if has_witness:
+        # segwit marker 0x00 and flag 0x01
+        reader.read(1)
+        n_inputs = reader.read_compact_size()
+
+    inputs = []
+    for _ in range(n_inputs):
+        txid = reader.read(32)[::-1].hex()
+        vout = reader.read_uint("<I")
+        script_sig = reader.read_var_bytes().hex()
+        sequence = reader.read_uint("<I")
+        inputs.append(
+            {
+                "previous_output": f"{txid}:{vout}",
+                "script_sig": script_sig,
+                "sequence": sequence,
+                "witness": [],
+            }
+        )
+    outputs = [_read_txout(reader) for _ in range(reader.read_compact_size())]
+    if has_witness:
+        for inp in inputs:
+            inp["witness"] = _read_witness(reader)
+    lock_time = reader.read_uint("<I")
+    return {"version": version, "lock_time": lock_time, "input": inputs, "output": outputs}
+
+
+def _format_key_origin(value: bytes) -> Tuple[str, str]:
+    "Returns (fingerprint, derivation_path)"
+    fingerprint = value[:4].hex()
+    steps = struct.unpack(f"<{(len(value) - 4) // 4}I", value[4:])
+    path = "".join(f"/{step & 0x7FFFFFFF}'" if step & 0x80000000 else f"/{step}" for step in steps)
+    return fingerprint, f"m{path}"
+
+
+def _read_map(reader: _ByteReader) -> List[Tuple[bytes, bytes]]:
+    "Returns the [(key, value)] of a PSBT map"
+    entries = []
+    while True:
+        key = reader.read_var_bytes()
+        if not key:
+            return entries
+        entries.append((key, reader.read_var_bytes()))
+
+
+def _decode_psbt_input(entries: List[Tuple[bytes, bytes]]) -> Dict[str, Any]:
+    input_data: Dict[str, Any] = {"partial_sigs": {}, "bip32_derivation": []}
+    preimage_fields = {
+        0x0A: "ripemd160_preimages",
+        0x0B: "sha256_preimages",
+        0x0C: "hash160_preimages",
+        0x0D: "hash256_preimages",
+    }
+    for key, value in entries:
+        key_type, key_data = key[0], key[1:]
+        if key_type == 0x00:
+            input_data["non_witness_utxo"] = _parse_tx(value)
+        elif key_type == 0x01:
+            input_data["witness_utxo"] = _read_txout(_ByteReader(value))
+        elif key_type == 0x02:
+            # the last byte of the signature is the sighash type
+            input_data["partial_sigs"][key_data.hex()] = {"sig": value[:-1].hex()}
+        elif key_type == 0x03:
+            input_data["sighash_type"] = struct.unpack("<I", value)[0]
+        elif key_type == 0x04:
+            input_data["redeem_script"] = value.hex()
+        elif key_type == 0x05:
+            input_data["witness_script"] = value.hex()
+        elif key_type == 0x06:
+            input_data["bip32_derivation"].append([key_data.hex(), list(_format_key_origin(value))])
+        elif key_type == 0x07:
+            input_data["final_script_sig"] = value.hex()
+        elif key_type == 0x08:
+            input_data["final_script_witness"] = _read_witness(_ByteReader(value))
+        elif key_type in preimage_fields:
+            input_data.setdefault(preimage_fields[key_type], {})[key_data.hex()] = value.hex()
+        elif key_type == 0x13:
+            input_data["tap_key_sig"] = value.hex()
+        elif key_type == 0x17:
+            input_data["tap_internal_key"] = value.hex()
+        elif key_type == 0x18:
+            input_data["tap_merkle_root"] = value.hex()
+    return input_data
+
+
+def _decode_psbt_output(entries: List[Tuple[bytes, bytes]]) -> Dict[str, Any]:
+    output_data: Dict[str, Any] = {"bip32_derivation": []}
+    for key, value in entries:
+        key_type, key_data = key[0], key[1:]
+        if key_type == 0x00:
+            output_data["redeem_script"] = value.hex()
+        elif key_type == 0x01:
+            output_data["witness_script"] = value.hex()
+        elif key_type == 0x02:
+            output_data["bip32_derivation"].append([key_data.hex(), list(_format_key_origin(value))])
+        elif key_type == 0x05:
+            output_data["tap_internal_key"] = value.hex()
+    return output_data
+
+
+class DecodedPSBT(NamedTuple):
+    txid: str
+    unsigned_tx: Dict[str, Any]
+    txins: List[bdk.TxIn]
+    # inputs and outputs have the same structure as in psbt.json_serialize()
+    inputs: List[Dict[str, Any]]
+    outputs: List[Dict[str, Any]]
+
+
+@lru_cache(maxsize=16)
+def decode_psbt(psbt_base64: str) -> DecodedPSBT:
+    """Decodes the BIP174 serialization directly.
+
+    This avoids the json round trip of psbt.json_serialize(), which
+    is slow for psbts with many inputs.  Do not mutate the result, since it
+    is cached.
+    """
+    reader = _ByteReader(base64.b64decode(psbt_base64))
+    if reader.read(5) != b"psbt\xff":
+        raise ValueError("Invalid PSBT magic bytes")
+
+    raw_unsigned_tx = None
+    for key, value in _read_map(reader):
+        if key == b"\x00":
+            raw_unsigned_tx = value
+    if raw_unsigned_tx is None:
+        raise ValueError("The PSBT contains no unsigned transaction")
+    unsigned_tx = _parse_tx(raw_unsigned_tx)
+
+    inputs = [_decode_psbt_input(_read_map(reader)) for _ in unsigned_tx["input"]]
+    outputs = [_decode_psbt_output(_read_map(reader)) for _ in unsigned_tx["output"]]
+
+    txins = []
+    for inp in unsigned_tx["input"]:
+        txid, vout = inp["previous_output"].split(":")
+        txins.append(
+            bdk.TxIn(
+                previous_output=bdk.OutPoint(txid=txid, vout=int(vout)),
+                script_sig=bdk.Script(list(bytes.fromhex(inp["script_sig"]))),
+                sequence=inp["sequence"],
+                witness=[],
+            )
+        )
+
+    # the unsigned tx has no witness, so its hash is the txid
+    txid = hashlib.sha256(hashlib.sha256(raw_unsigned_tx).digest()).digest()[::-1].hex()
+    return DecodedPSBT(txid=txid, unsigned_tx=unsigned_tx, txins=txins, inputs=inputs, outputs=outputs)
+
+
 @dataclass
 class SimplePSBT:
     txid: str
@@ -416,15 +615,21 @@ class SimplePSBT:
 
     @classmethod
     def from_psbt(cls, psbt: bdk.PartiallySignedTransaction) -> "SimplePSBT":
-        instance = cls(txid=psbt.txid())
-        psbt_json = json.loads(psbt.json_serialize())
+        return cls.from_psbt_base64(psbt.serialize())
+
+    @classmethod
+    def from_psbt_base64(cls, psbt_base64: str) -> "SimplePSBT":
+        # the decoding is cached, but a new SimplePSBT is returned every time,
+        # because the caller may enrich the inputs (wallet_id, labels)
+        decoded = decode_psbt(psbt_base64)
+        instance = cls(txid=decoded.txid)
         instance.inputs = [
             SimpleInput.from_input(input_data, txin)
-            for input_data, txin in zip(psbt_json.get("inputs", []), psbt.extract_tx().input())
+            for input_data, txin in zip(decoded.inputs, decoded.txins)
         ]
 
-        outputs = psbt_json.get("outputs", [])
-        unsigned_tx_outputs = psbt_json.get("unsigned_tx", {}).get("output", [])
+        outputs = decoded.outputs
+        unsigned_tx_outputs = decoded.unsigned_tx.get("output", [])
         assert len(outputs) == len(unsigned_tx_outputs)
         instance.outputs = [
             SimpleOutput.from_output(output_data, unsigned_tx_output)
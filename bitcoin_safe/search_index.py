@@ -0,0 +1,262 @@
+#
+# Bitcoin Safe
+# Copyright (C) 2024 Andreas Griffin
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of version 3 of the GNU General Public License as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see https://www.gnu.org/licenses/gpl-3.0.html
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS
+# BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN
+# ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+# CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+import enum
+import logging
+import threading
+from bisect import bisect_right
+from typing import TYPE_CHECKING, Any, Callable, Collection, Dict, List, NamedTuple, Optional, Set, Tuple
+
+from .signals import UpdateFilter, UpdateFilterReason
+
+if TYPE_CHECKING:
+    from .wallet import Wallet
+
+logger = logging.getLogger(__name__)
+
+
+class SearchKind(enum.Enum):
+    Address = enum.auto()
+    AddressLabel = enum.auto()
+    Txid = enum.auto()
+    TxLabel = enum.auto()
+    Utxo = enum.auto()
+    SpentTxo = enum.auto()
+
+
+class SearchHit(NamedTuple):
+    kind: SearchKind
+    text: str  # the matching string
+    key: str  # the key of the row that should be selected
+
+
+class _Haystack:
+    """All strings of one SearchKind, joined into a single string.
+
+    A query is then a sequence of str.find calls (which run in C), instead
+    of a python loop over every entry.
+    """
+
+    separator = "\x00"
+
+    def __init__(self, case_sensitive: bool) -> None:
+        self.case_sensitive = case_sensitive
+        # ref -> (text, key)
+        self.entries: Dict[str, Tuple[str, str]] = {}
+        # the searched (e.g. lowercased) texts, which can differ in length from the original texts
+        self._texts: List[str] = []
+        self._display_texts: List[str] = []
+        self._keys: List[str] = []
+        self._starts: List[int] = []
+        self._joined = ""
+        self._dirty = False
+
+    def set(self, ref: str, text: str, key: str) -> None:
+        if self.entries.get(ref) == (text, key):
+            return
+        self.entries[ref] = (text, key)
+        self._dirty = True
+
+    def discard(self, ref: str) -> None:
+        if self.entries.pop(ref, None) is not None:
+            self._dirty = True
+
+    def _build(self) -> None:
+        self._texts = []
+        self._display_texts = []
+        self._keys = []
+        self._starts = []
+        pos = 0
+        for text, key in self.entries.values():
+            # lower() can change the length (e.g. "İ"), so the positions are based on the lowercased text
+            searched_text = text if self.case_sensitive else text.lower()
+            self._texts.append(searched_text)
+            self._display_texts.append(text)
+            self._keys.append(key)
+            self._starts.append(pos)
+            pos += len(searched_text) + len(self.separator)
+        self._joined = self.separator.join(self._texts)
+        self._dirty = False
+
+    def search(self, query: str, max_results: int, is_cancelled: Callable[[], bool]) -> List[Tuple[str, str]]:
+        if self._dirty:
+            self._build()
+        if not self.case_sensitive:
+            query = query.lower()
+
+        results: List[Tuple[str, str]] = []
+        pos = self._joined.find(query)
+        while pos >= 0 and len(results) < max_results and not is_cancelled():
+            i = bisect_right(self._starts, pos) - 1
+            if pos + len(query) <= self._starts[i] + len(self._texts[i]):
+                results.append((self._display_texts[i], self._keys[i]))
+            # at most 1 hit per entry
+            if i + 1 >= len(self._starts):
+                break
+            pos = self._joined.find(query, self._starts[i + 1])
+        return results
+
+
+class WalletSearchIndex:
+    """Searchable strings (addresses, txids, outpoints, labels) of one wallet.
+
+    sync() only re-indexes what changed since the last sync:
+    The addresses and txos are compared by the identity of the (cached)
+    wallet collections, the txids by the content of the index (the
+    FullTxDetailIndex is updated in place) and the labels are updated from
+    the UpdateFilters passed to mark_dirty().  sync() and search() may run
+    outside of the main thread.
+    """
+
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self._haystacks: Dict[SearchKind, _Haystack] = {
+            kind: _Haystack(case_sensitive=kind not in [SearchKind.AddressLabel, SearchKind.TxLabel])
+            for kind in SearchKind
+        }
+        self._synced: Dict[str, Any] = {}
+
+        self._pending_lock = threading.Lock()
+        # None means all labels need to be re-indexed
+        self._pending_label_refs: Optional[Set[str]] = None
+
+    def mark_dirty(self, update_filter: UpdateFilter) -> None:
+        "Remember which labels have to be re-indexed at the next sync"
+        if update_filter.reason in [UpdateFilterReason.ChainHeightAdvanced, UpdateFilterReason.NewFxRates]:
+            return
+        with self._pending_lock:
+            if self._pending_label_refs is None:
+                return
+            if update_filter.refresh_all:
+                self._pending_label_refs = None
+                return
+            self._pending_label_refs.update(update_filter.addresses)
+            self._pending_label_refs.update(update_filter.txids)
+
+    def _pop_pending_label_refs(self) -> Optional[Set[str]]:
+        with self._pending_lock:
+            refs = self._pending_label_refs
+            self._pending_label_refs = set()
+        return refs
+
+    def _is_synced(self, name: str, obj: Any) -> bool:
+        # the wallet caches return the identical object until they are invalidated
+        if self._synced.get(name) is obj:
+            return True
+        self._synced[name] = obj
+        return False
+
+    def _sync_refs(self, kind: SearchKind, refs: Collection[str]) -> Tuple[Set[str], Set[str]]:
+        "Returns (added, removed)"
+        haystack = self._haystacks[kind]
+        # keep the order of the wallet
+        added = {ref: None for ref in refs if ref not in haystack.entries}
+        removed = haystack.entries.keys() - set(refs)
+        for ref in removed:
+            haystack.discard(ref)
+        for ref in added:
+            haystack.set(ref, ref, ref)
+        return set(added), removed
+
+    def _sync_label(self, wallet: "Wallet", ref: str) -> None:
+        label = wallet.labels.get_label(ref)
+        for kind, owner in [
+            (SearchKind.AddressLabel, SearchKind.Address),
+            (SearchKind.TxLabel, SearchKind.Txid),
+        ]:
+            haystack = self._haystacks[kind]
+            if label and ref in self._haystacks[owner].entries:
+                haystack.set(ref, label, ref)
+            else:
+                haystack.discard(ref)
+
+    def sync(self, wallet: "Wallet") -> None:
+        with self.lock:
+            label_refs = self._pop_pending_label_refs()
+
+            receiving_addresses = wallet.get_receiving_addresses()
+            change_addresses = wallet.get_change_addresses()
+            receiving_synced = self._is_synced("receiving_addresses", receiving_addresses)
+            change_synced = self._is_synced("change_addresses", change_addresses)
+            if not (receiving_synced and change_synced):
+                added, removed = self._sync_refs(SearchKind.Address, receiving_addresses + change_addresses)
+                if label_refs is not None:
+                    label_refs |= added | removed
+
+            # brings the fulltxdetail_index up to date
+            wallet.get_dict_fulltxdetail()
+            # the dict is changed in place, possibly from another thread
+            with wallet.fulltxdetail_index.lock:
+                txids = list(wallet.fulltxdetail_index.dict_fulltxdetail.keys())
+            added, removed = self._sync_refs(SearchKind.Txid, txids)
+            if label_refs is not None:
+                label_refs |= added | removed
+
+            txos = wallet.get_all_txos_dict()
+            if not self._is_synced("txos", txos):
+                utxos = self._haystacks[SearchKind.Utxo]
+                spent_txos = self._haystacks[SearchKind.SpentTxo]
+                for outpoint_str in (utxos.entries.keys() | spent_txos.entries.keys()) - txos.keys():
+                    utxos.discard(outpoint_str)
+                    spent_txos.discard(outpoint_str)
+                for outpoint_str, python_utxo in txos.items():
+                    if python_utxo.is_spent_by_txid:
+                        utxos.discard(outpoint_str)
+                        spent_txos.set(outpoint_str, outpoint_str, python_utxo.is_spent_by_txid)
+                    else:
+                        spent_txos.discard(outpoint_str)
+                        utxos.set(outpoint_str, outpoint_str, outpoint_str)
+
+            if label_refs is None:
+                label_refs = (
+                    self._haystacks[SearchKind.Address].entries.keys()
+                    | self._haystacks[SearchKind.Txid].entries.keys()
+                    | self._haystacks[SearchKind.AddressLabel].entries.keys()
+                    | self._haystacks[SearchKind.TxLabel].entries.keys()
+                )
+            for ref in label_refs:
+                self._sync_label(wallet, ref)
+
+    def search(
+        self, search_text: str, max_results: int, is_cancelled: Callable[[], bool] = lambda: False
+    ) -> List[SearchHit]:
+        hits: List[SearchHit] = []
+        if not search_text:
+            return hits
+        with self.lock:
+            for kind, haystack in self._haystacks.items():
+                if len(hits) >= max_results or is_cancelled():
+                    break
+                hits += [
+                    SearchHit(kind=kind, text=text, key=key)
+                    for text, key in haystack.search(
+                        search_text, max_results=max_results - len(hits), is_cancelled=is_cancelled
+                    )
+                ]
+        return hits
@@ -51,6 +51,8 @@ from bitcoin_nostr_chat.signals_min import SignalsMin as NostrSignalsMin
 from PyQt6.QtCore import pyqtSignal
 
 from bitcoin_safe.pythonbdk_types import Balance, OutPoint
+from bitcoin_safe.txo_registry import TxoRegistry
+from bitcoin_safe.util import CacheDependency
 
 from .typestubs import TypedPyQtSignal, TypedPyQtSignalNo
 
@@ -95,6 +97,48 @@ class UpdateFilter:
         self.refresh_all = refresh_all
         self.reason = reason
 
+    # these reasons only change labels/categories, not the chain data
+    label_reasons = {
+        UpdateFilterReason.UserInput,
+        UpdateFilterReason.UserImport,
+        UpdateFilterReason.SourceLabelSyncer,
+        UpdateFilterReason.UserReplacedAddress,
+        UpdateFilterReason.CategoryAssigned,
+        UpdateFilterReason.CategoryAdded,
+        UpdateFilterReason.CategoryRenamed,
+        UpdateFilterReason.CategoryDeleted,
+        UpdateFilterReason.GetUnusedCategoryAddress,
+        UpdateFilterReason.TxCreator,
+        UpdateFilterReason.NewFxRates,
+    }
+
+    def cache_dependencies(self) -> Dict[CacheDependency, Optional[Set[str]]]:
+        """Which cache entries (see instance_lru_cache) are invalidated by this
+        update.
+
+        None means all keys of this kind.
+        """
+        if self.reason == UpdateFilterReason.NewFxRates:
+            return {}
+        if self.reason == UpdateFilterReason.ChainHeightAdvanced:
+            return {CacheDependency.ChainHeight: None}
+        if self.reason in self.label_reasons:
+            if self.refresh_all:
+                return {CacheDependency.Labels: None}
+            return {
+                CacheDependency.Labels: self.addresses
+                | self.txids
+                | {str(outpoint) for outpoint in self.outpoints}
+                | {category for category in self.categories if category}
+            }
+        if self.refresh_all:
+            return {kind: None for kind in CacheDependency}
+        return {
+            CacheDependency.Txids: self.txids,
+            CacheDependency.Addresses: self.addresses,
+            CacheDependency.Outpoints: {str(outpoint) for outpoint in self.outpoints},
+        }
+
     def __key__(self) -> Tuple:
         return tuple(self.__dict__.items())
 
@@ -254,5 +298,7 @@ class Signals(SignalsMin):
         self.get_qt_wallets = SignalFunction["QTWallet"](name="get_qt_wallets")  # type: ignore
         self.get_network = SingularSignalFunction[bdk.Network](name="get_network")
         self.get_mempool_url = SingularSignalFunction[str](name="get_mempool_url")
+        # outpoint -> (PythonUtxo, wallet id) of all open wallets
+        self.txo_registry = TxoRegistry(get_wallets=self.get_wallets)
 
         self.wallet_signals: DefaultDict[str, WalletSignals] = defaultdict(WalletSignals)
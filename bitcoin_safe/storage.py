@@ -36,19 +36,28 @@ logger = logging.getLogger(__name__)
 
 
 import enum
+import hashlib
+import hmac
+import io
+import itertools
 import json
 import os
+import time
 
 # from https://stackoverflow.com/questions/2490334/simple-way-to-encode-a-string-according-to-a-password
 import secrets
+import tempfile
 from base64 import urlsafe_b64decode as b64d
 from base64 import urlsafe_b64encode as b64e
-from typing import Callable, Dict, Iterable, Type
+from typing import BinaryIO, Callable, Dict, Iterable, Iterator, List, Tuple, Type
 
 import bdkpython as bdk
-from cryptography.fernet import Fernet
+from cryptography.exceptions import InvalidSignature
+from cryptography.fernet import InvalidToken
 from cryptography.hazmat.backends import default_backend
-from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives import hashes, padding
+from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
+from cryptography.hazmat.primitives.hmac import HMAC
 from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
 from packaging import version
 
@@ -65,7 +74,83 @@ def filtered_for_init(d: Dict, cls: Type) -> Dict:
     return filtered_dict(d, varnames(cls.__init__))
 
 
+class DerivedKeyCache:
+    """Keeps the key, that was derived from the password, in memory.
+
+    Re-saving a file with the same password then only needs the symmetric
+    encryption, instead of the (deliberately slow) key derivation.
+    clear() overwrites the key in memory.
+    """
+
+    def __init__(self) -> None:
+        self.salt = b""
+        self.iterations = 0
+        self._password_digest = b""
+        self._key = bytearray()
+
+    def _digest(self, password: str) -> bytes:
+        return hashlib.sha256(self.salt + password.encode()).digest()
+
+    def get(self, password: str, salt: bytes | None = None, iterations: int | None = None) -> bytes | None:
+        if not self._key:
+            return None
+        if (salt is not None and salt != self.salt) or (
+            iterations is not None and iterations != self.iterations
+        ):
+            return None
+        if not hmac.compare_digest(self._digest(password), self._password_digest):
+            return None
+        return bytes(self._key)
+
+    def set(self, password: str, salt: bytes, iterations: int, key: bytes) -> None:
+        self.clear()
+        self.salt = salt
+        self.iterations = iterations
+        self._password_digest = self._digest(password)
+        self._key = bytearray(key)
+
+    def clear(self) -> None:
+        for i in range(len(self._key)):
+            self._key[i] = 0
+        self._key = bytearray()
+        self._password_digest = b""
+
+
+class _Base64Writer:
+    "Writes the urlsafe base64 encoding of all written data, identical to b64e(all data)"
+
+    def __init__(self, file: BinaryIO) -> None:
+        self.file = file
+        self._pending = b""
+
+    def write(self, data: bytes) -> None:
+        data = self._pending + data
+        n = len(data) - len(data) % 3
+        self.file.write(b64e(data[:n]))
+        self._pending = data[n:]
+
+    def close(self) -> None:
+        self.file.write(b64e(self._pending))
+        self._pending = b""
+
+
 class Encrypt:
+    """Password based encryption.
+
+    The file content is b64e(salt + iterations + fernet token), where the
+    fernet token is not base64 encoded a 2. time.  The token is written and
+    read chunk-wise (a Fernet token in the format of the cryptography
+    library), such that large files are not held in memory several times.
+    """
+
+    salt_length = 16
+    fernet_version = b"\x80"
+    # the fernet header: version, timestamp, iv
+    header_length = 1 + 8 + 16
+    hmac_length = 32
+    # a multiple of 3 (base64 groups) and of 16 (AES blocks)
+    chunk_size = 3 * 2**20
+
     def _derive_key(self, password: bytes, salt: bytes, iterations: int) -> bytes:
         """Derive a secret key from a given password and salt."""
         kdf = PBKDF2HMAC(
@@ -77,58 +162,193 @@ class Encrypt:
         )
         return b64e(kdf.derive(password))
 
-    def password_encrypt(self, message: bytes, password: str, iterations: int = 100_000) -> bytes:
-        salt = secrets.token_bytes(16)
-        key = self._derive_key(password.encode(), salt, iterations)
-        return b64e(
-            b"%b%b%b"
-            % (
-                salt,
-                iterations.to_bytes(4, "big"),
-                b64d(Fernet(key).encrypt(message)),
-            )
-        )
-
-    def password_decrypt(self, token: bytes, password: str) -> bytes:
-        decoded = b64d(token)
-        salt, iter, token = decoded[:16], decoded[16:20], b64e(decoded[20:])
-        iterations = int.from_bytes(iter, "big")
+    def _get_key(
+        self, password: str, salt: bytes | None, iterations: int, key_cache: DerivedKeyCache | None
+    ) -> Tuple[bytes, bytes]:
+        "Returns (salt, key) and uses the cached key if possible"
+        if key_cache is not None:
+            key = key_cache.get(password, salt=salt, iterations=iterations)
+            if key:
+                return key_cache.salt, key
+        salt = salt if salt is not None else secrets.token_bytes(self.salt_length)
+        key = b64d(self._derive_key(password.encode(), salt, iterations))
+        if key_cache is not None:
+            key_cache.set(password, salt=salt, iterations=iterations, key=key)
+        return salt, key
+
+    def password_encrypt(
+        self,
+        message: bytes,
+        password: str,
+        iterations: int = 100_000,
+        key_cache: DerivedKeyCache | None = None,
+    ) -> bytes:
+        buffer = io.BytesIO()
+        self.encrypt_to_file(message, buffer, password, iterations=iterations, key_cache=key_cache)
+        return buffer.getvalue()
+
+    def password_decrypt(
+        self, token: bytes, password: str, key_cache: DerivedKeyCache | None = None
+    ) -> bytes:
+        return self.decrypt_from_file(io.BytesIO(token), password, key_cache=key_cache)
+
+    def encrypt_to_file(
+        self,
+        message: bytes,
+        file: BinaryIO,
+        password: str,
+        iterations: int = 100_000,
+        key_cache: DerivedKeyCache | None = None,
+    ) -> None:
+        salt, key = self._get_key(password, salt=None, iterations=iterations, key_cache=key_cache)
+        signing_key, encryption_key = key[:16], key[16:]
+
+        iv = secrets.token_bytes(16)
+        header = self.fernet_version + int(time.time()).to_bytes(8, "big") + iv
+        signature = HMAC(signing_key, hashes.SHA256())
+        signature.update(header)
+        padder = padding.PKCS7(algorithms.AES.block_size).padder()
+        encryptor = Cipher(algorithms.AES(encryption_key), modes.CBC(iv)).encryptor()
+
+        writer = _Base64Writer(file)
+        writer.write(salt + iterations.to_bytes(4, "big") + header)
+        view = memoryview(message)
+        for start in range(0, len(view), self.chunk_size):
+            ciphertext = encryptor.update(padder.update(view[start : start + self.chunk_size]))
+            signature.update(ciphertext)
+            writer.write(ciphertext)
+        ciphertext = encryptor.update(padder.finalize()) + encryptor.finalize()
+        signature.update(ciphertext)
+        writer.write(ciphertext)
+        writer.write(signature.finalize())
+        writer.close()
+
+    def _b64decoded_chunks(self, file: BinaryIO) -> Iterator[bytes]:
+        pending = b""
+        while chunk := file.read(4 * self.chunk_size // 3):
+            data = pending + chunk.strip()
+            n = len(data) - len(data) % 4
+            yield b64d(data[:n])
+            pending = data[n:]
+        if pending:
+            yield b64d(pending)
+
+    def decrypt_from_file(
+        self, file: BinaryIO, password: str, key_cache: DerivedKeyCache | None = None
+    ) -> bytes:
+        chunks = self._b64decoded_chunks(file)
+        head = b""
+        prefix_length = self.salt_length + 4 + self.header_length
+        for chunk in chunks:
+            head += chunk
+            if len(head) >= prefix_length:
+                break
+        if (
+            len(head) < prefix_length
+            or head[self.salt_length + 4 : self.salt_length + 5] != self.fernet_version
+        ):
+            raise InvalidToken
+
+        salt = head[: self.salt_length]
+        iterations = int.from_bytes(head[self.salt_length : self.salt_length + 4], "big")
         if iterations > 1e6:
             raise Exception("Error in decrypting")
-        key = self._derive_key(password.encode(), salt, iterations)
-        return Fernet(key).decrypt(token)
+        header = head[self.salt_length + 4 : prefix_length]
+        iv = header[9:]
+        _, key = self._get_key(password, salt=salt, iterations=iterations, key_cache=key_cache)
+        signing_key, encryption_key = key[:16], key[16:]
+
+        signature = HMAC(signing_key, hashes.SHA256())
+        signature.update(header)
+        decryptor = Cipher(algorithms.AES(encryption_key), modes.CBC(iv)).decryptor()
+        unpadder = padding.PKCS7(algorithms.AES.block_size).unpadder()
+
+        # the last bytes are the signature
+        tail = head[prefix_length:]
+        plaintext: List[bytes] = []
+        for chunk in itertools.chain([b""], chunks):
+            data = tail + chunk
+            ciphertext, tail = data[: -self.hmac_length], data[-self.hmac_length :]
+            signature.update(ciphertext)
+            plaintext.append(decryptor.update(ciphertext))
+
+        # nothing is returned, before the signature is verified
+        try:
+            if len(tail) != self.hmac_length:
+                raise InvalidSignature
+            signature.verify(tail)
+            plaintext.append(decryptor.finalize())
+            return unpadder.update(b"".join(plaintext)) + unpadder.finalize()
+        except (InvalidSignature, ValueError):
+            raise InvalidToken
 
 
 class Storage:
     def __init__(self) -> None:
         self.encrypt = Encrypt()
 
-    def save(self, message: str, filename: str, password: Optional[str] = None) -> None:
-        token = self.encrypt.password_encrypt(message.encode(), password) if password else message.encode()
+    def save(
+        self,
+        message: str,
+        filename: str,
+        password: Optional[str] = None,
+        key_cache: DerivedKeyCache | None = None,
+    ) -> None:
+        """Writes into a temporary file and renames it to filename.
 
-        with open(filename, "wb") as f:
-            f.write(token)
+        A crash during the save therefore leaves either the old or the new file, never a partial file.
+        """
+        directory = os.path.dirname(os.path.abspath(filename))
+        fd, temp_filename = tempfile.mkstemp(dir=directory, prefix=f".{os.path.basename(filename)}.")
+        try:
+            with open(fd, "wb") as f:
+                if password:
+                    self.encrypt.encrypt_to_file(message.encode(), f, password, key_cache=key_cache)
+                else:
+                    f.write(message.encode())
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temp_filename, filename)
+        except BaseException:
+            if os.path.exists(temp_filename):
+                os.remove(temp_filename)
+            raise
+        self._fsync_directory(directory)
+
+    @staticmethod
+    def _fsync_directory(directory: str) -> None:
+        "Makes the rename durable. Not possible on all platforms (e.g. Windows)"
+        try:
+            fd = os.open(directory, os.O_RDONLY)
+        except OSError:
+            return
+        try:
+            os.fsync(fd)
+        except OSError:
+            pass
+        finally:
+            os.close(fd)
 
     @classmethod
     def has_password(cls, filename: str) -> bool:
         with open(filename, "rb") as f:
-            token = f.read()
+            first_byte = f.read(1)
 
-        if token.decode()[0] == "{":
+        if first_byte == b"{":
             return False
 
         return True
 
-    def load(self, filename: str, password: Optional[str] = None) -> str:
+    def load(
+        self, filename: str, password: Optional[str] = None, key_cache: DerivedKeyCache | None = None
+    ) -> str:
         with open(filename, "rb") as f:
-            token = f.read()
-
-        if not password:
-            logger.debug(f"Opening {filename} without password")
-            return token.decode()
-        else:
-            logger.debug(f"Decrypting {filename}")
-            return self.encrypt.password_decrypt(token, password).decode()
+            if not password:
+                logger.debug(f"Opening {filename} without password")
+                return f.read().decode()
+            else:
+                logger.debug(f"Decrypting {filename}")
+                return self.encrypt.decrypt_from_file(f, password, key_cache=key_cache).decode()
 
 
 class ClassSerializer:
@@ -173,6 +393,18 @@ class ClassSerializer:
 
         return deserializer
 
+    @classmethod
+    def snapshot(cls, obj):
+        "Converts obj recursively into (copied) json types, that general_serializer would produce"
+        if isinstance(obj, dict):
+            return {key: cls.snapshot(value) for key, value in obj.items()}
+        if isinstance(obj, (list, tuple)):
+            nested_types = (dict, list, tuple, enum.Enum, BaseSaveableClass)
+            return [cls.snapshot(value) if isinstance(value, nested_types) else value for value in obj]
+        if isinstance(obj, (enum.Enum, BaseSaveableClass)):
+            return cls.snapshot(cls.general_serializer(obj))
+        return obj
+
     @classmethod
     def general_serializer(cls, obj):
         if isinstance(obj, enum.Enum):
@@ -220,8 +452,35 @@ class BaseSaveableClass:
     def clone(self, class_kwargs: Dict | None = None):
         return self.from_dump(self.dump(), class_kwargs=class_kwargs)
 
-    def save(self, filename: Union[Path, str], password: Optional[str] = None):
+    def save(
+        self,
+        filename: Union[Path, str],
+        password: Optional[str] = None,
+        key_cache: DerivedKeyCache | None = None,
+    ):
         "Saves the json dumps to a file"
+        self._write_file(self.dumps(indent=None if password else 4), filename, password, key_cache)
+
+    @classmethod
+    def save_snapshot(
+        cls,
+        snapshot: Dict,
+        filename: Union[Path, str],
+        password: Optional[str] = None,
+        key_cache: DerivedKeyCache | None = None,
+    ):
+        "Saves the snapshot (see snapshot()) to a file, like save() would"
+        cls._write_file(
+            cls.dumps_snapshot(snapshot, indent=None if password else 4), filename, password, key_cache
+        )
+
+    @staticmethod
+    def _write_file(
+        message: str,
+        filename: Union[Path, str],
+        password: Optional[str],
+        key_cache: DerivedKeyCache | None,
+    ):
         directory = os.path.dirname(str(filename))
         # Create the directories
         if directory:
@@ -229,14 +488,28 @@ class BaseSaveableClass:
 
         storage = Storage()
         storage.save(
-            self.dumps(indent=None if password else 4),
+            message,
             str(filename),
             password=password,
+            key_cache=key_cache,
         )
 
     def __str__(self) -> str:
         return self.dumps()
 
+    def snapshot(self) -> Dict:
+        """Returns the dump as a copy of plain json types.
+
+        The snapshot doesn't change, when self changes, and can therefore be
+        serialized with dumps_snapshot in another thread.
+        """
+        return ClassSerializer.snapshot(self)
+
+    @staticmethod
+    def dumps_snapshot(snapshot: Dict, indent=None) -> str:
+        "Returns the same json as dumps"
+        return json.dumps(snapshot, indent=indent, sort_keys=True)
+
     def dumps(self, indent=None) -> str:
         "Returns the json representation (recursively)"
         return json.dumps(
@@ -261,13 +534,20 @@ class BaseSaveableClass:
         return BaseSaveableClass._flatten_known_classes({cls.__name__: cls})
 
     @classmethod
-    def _from_file(cls, filename: str, password: Optional[str] = None, class_kwargs: Dict | None = None):
+    def _from_file(
+        cls,
+        filename: str,
+        password: Optional[str] = None,
+        class_kwargs: Dict | None = None,
+        key_cache: DerivedKeyCache | None = None,
+    ):
         """Loads the class from a file. This offers the option of add class_kwargs args
 
         Args:
             filename (str): _description_
             password (Optional[str], optional): _description_. Defaults to None.
             class_kwargs (_type_, optional):  example:  class_kwargs= {'Wallet':{'config':config}}. Defaults to None.
+            key_cache (DerivedKeyCache, optional): Is filled with the derived key. Defaults to None.
 
         Returns:
             _type_: _description_
@@ -275,7 +555,7 @@ class BaseSaveableClass:
         class_kwargs = class_kwargs if class_kwargs else {}
         storage = Storage()
 
-        json_string = cls.file_migration(storage.load(filename, password=password))
+        json_string = cls.file_migration(storage.load(filename, password=password, key_cache=key_cache))
 
         instance = json.loads(
             json_string,
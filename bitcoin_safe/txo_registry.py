@@ -0,0 +1,135 @@
+#
+# Bitcoin Safe
+# Copyright (C) 2024 Andreas Griffin
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of version 3 of the GNU General Public License as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see https://www.gnu.org/licenses/gpl-3.0.html
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS
+# BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN
+# ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+# CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+import threading
+from typing import TYPE_CHECKING, Callable, Dict, Iterable, Optional, Tuple
+
+from bitcoin_safe.pythonbdk_types import OutPoint, PythonUtxo
+
+if TYPE_CHECKING:
+    from bitcoin_safe.wallet import Wallet
+
+
+class _WalletTxos:
+    def __init__(self, all_txos: Dict[str, PythonUtxo], my_txos: Dict[str, PythonUtxo]) -> None:
+        # the (cached) dicts of wallet.get_all_txos_dict
+        self.all_txos = all_txos
+        self.my_txos = my_txos
+
+
+class TxoRegistry:
+    """Maps outpoints to (PythonUtxo, wallet id) across all open wallets.
+
+    The wallets return the identical get_all_txos_dict objects until their
+    caches are invalidated.  sync() therefore only re-indexes the wallets
+    whose txos changed, and a lookup is a dict access instead of merging the
+    txos of every wallet.
+    """
+
+    def __init__(self, get_wallets: Callable[[], Dict[str, "Wallet"]]) -> None:
+        self.get_wallets = get_wallets
+        self.lock = threading.Lock()
+        self._wallets: Dict[str, _WalletTxos] = {}
+        # outpoint_str -> {wallet_id: is_mine}
+        self._index: Dict[str, Dict[str, bool]] = {}
+
+    def _discard(self, wallet_id: str, outpoint_strs: Iterable[str]) -> None:
+        for outpoint_str in outpoint_strs:
+            entries = self._index.get(outpoint_str)
+            if entries is None:
+                continue
+            entries.pop(wallet_id, None)
+            if not entries:
+                del self._index[outpoint_str]
+
+    def _sync_wallet(self, wallet_id: str, all_txos: Dict[str, PythonUtxo], my_txos: Dict[str, PythonUtxo]):
+        old = self._wallets.get(wallet_id)
+        if old and old.all_txos is all_txos and old.my_txos is my_txos:
+            return
+        old_all = old.all_txos.keys() if old else set()
+        old_mine = old.my_txos.keys() if old else set()
+
+        self._discard(wallet_id, old_all - all_txos.keys())
+        for outpoint_str in all_txos.keys() - old_all:
+            self._index.setdefault(outpoint_str, {})[wallet_id] = False
+        # e.g. newly revealed addresses make txos mine
+        for outpoint_str in my_txos.keys() - old_mine:
+            self._index.setdefault(outpoint_str, {})[wallet_id] = True
+        for outpoint_str in old_mine - my_txos.keys():
+            if outpoint_str in all_txos:
+                self._index[outpoint_str][wallet_id] = False
+
+        self._wallets[wallet_id] = _WalletTxos(all_txos=all_txos, my_txos=my_txos)
+
+    def sync(self) -> None:
+        wallets = self.get_wallets()
+        with self.lock:
+            for wallet_id in list(self._wallets.keys()):
+                if wallet_id not in wallets:
+                    self._discard(wallet_id, self._wallets.pop(wallet_id).all_txos.keys())
+            for wallet_id, wallet in wallets.items():
+                self._sync_wallet(
+                    wallet_id,
+                    all_txos=wallet.get_all_txos_dict(include_not_mine=True),
+                    my_txos=wallet.get_all_txos_dict(),
+                )
+
+    def get(
+        self, outpoint: OutPoint | str, include_not_mine=False, sync=True
+    ) -> Optional[Tuple[PythonUtxo, str]]:
+        """Returns (python_utxo, wallet_id).
+
+        A wallet that owns the output is preferred.
+        """
+        if sync:
+            self.sync()
+        outpoint_str = str(outpoint)
+        with self.lock:
+            entries = self._index.get(outpoint_str)
+            if not entries:
+                return None
+            for wallet_id, is_mine in entries.items():
+                if is_mine:
+                    return self._wallets[wallet_id].my_txos[outpoint_str], wallet_id
+            if include_not_mine:
+                wallet_id = next(iter(entries))
+                return self._wallets[wallet_id].all_txos[outpoint_str], wallet_id
+        return None
+
+    def get_python_txos(
+        self, outpoints: Iterable[OutPoint | str], include_not_mine=False
+    ) -> Dict[str, PythonUtxo]:
+        "Returns {outpoint_str: python_utxo} of the known outpoints"
+        self.sync()
+        txos: Dict[str, PythonUtxo] = {}
+        for outpoint in outpoints:
+            result = self.get(outpoint, include_not_mine=include_not_mine, sync=False)
+            if result:
+                txos[str(outpoint)] = result[0]
+        return txos
@@ -60,21 +60,27 @@ from bitcoin_safe.gui.qt.data_tab_widget import T2, T
 
 logger = logging.getLogger(__name__)
 import builtins
+import enum
 import logging
 import os
 import re
 import sys
+import threading
 import time
+from collections import OrderedDict, defaultdict
 from datetime import datetime, timedelta
 from pathlib import Path
 from typing import (
     Any,
     Callable,
     Dict,
+    Hashable,
     Iterable,
     List,
     Literal,
+    NamedTuple,
     Optional,
+    Sequence,
     Set,
     SupportsBytes,
     SupportsIndex,
@@ -234,11 +240,150 @@ def clear_cache(clear_always_keep=False):
             func.cache_clear()
 
 
+class CacheDependency(enum.Enum):
+    "What a cache entry of instance_lru_cache depends on"
+
+    Txids = enum.auto()
+    Addresses = enum.auto()
+    Outpoints = enum.auto()
+    Labels = enum.auto()
+    ChainHeight = enum.auto()
+
+
+class CacheInfo(NamedTuple):
+    hits: int
+    misses: int
+    evictions: int
+    invalidations: int
+    maxsize: Optional[int]
+    currsize: int
+
+
+class InstanceCache:
+    """A replacement of functools.lru_cache for a bound method.
+
+    Each entry is tagged with the CacheDependency it depends on, such
+    that entries can be invalidated selectively:
+        - a dependency in depends_on matches any changed key of this kind
+        - the key_dependency matches only if the first argument of the call is a changed key
+
+    If depends_on is empty, the cache is assumed to depend on everything.
+
+    The hit/miss/eviction/invalidation counters are not reset by cache_clear().
+    """
+
+    _kwargs_mark = object()
+
+    def __init__(
+        self,
+        func: Callable,
+        maxsize: Optional[int] = None,
+        depends_on: Iterable[CacheDependency] = (),
+        key_dependency: Optional[CacheDependency] = None,
+    ) -> None:
+        self.func = func
+        self.maxsize = maxsize
+        self.key_dependency = key_dependency
+        self.depends_on = set(depends_on)
+        if key_dependency:
+            self.depends_on.add(key_dependency)
+        self.lock = threading.RLock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self.cache_clear()
+
+    def cache_clear(self) -> None:
+        with self.lock:
+            self._entries: OrderedDict[Hashable, Any] = OrderedDict()
+            self._keyed_entries: Dict[str, Set[Hashable]] = defaultdict(set)  # str(first arg):{key}
+
+    def cache_info(self) -> CacheInfo:
+        return CacheInfo(
+            hits=self.hits,
+            misses=self.misses,
+            evictions=self.evictions,
+            invalidations=self.invalidations,
+            maxsize=self.maxsize,
+            currsize=len(self._entries),
+        )
+
+    def _make_key(self, args: Tuple, kwargs: Dict) -> Hashable:
+        if not kwargs:
+            return args
+        return args + (self._kwargs_mark,) + tuple(sorted(kwargs.items()))
+
+    def _pop(self, key: Hashable) -> None:
+        self._entries.pop(key, None)
+        if self.key_dependency and key and isinstance(key, tuple):
+            keyed = self._keyed_entries.get(str(key[0]))
+            if keyed is not None:
+                keyed.discard(key)
+                if not keyed:
+                    del self._keyed_entries[str(key[0])]
+
+    def __call__(self, *args, **kwargs) -> Any:
+        key = self._make_key(args, kwargs)
+        with self.lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+            self.misses += 1
+
+        result = self.func(*args, **kwargs)
+
+        with self.lock:
+            self._entries[key] = result
+            self._entries.move_to_end(key)
+            if self.key_dependency and args:
+                self._keyed_entries[str(args[0])].add(key)
+
+            while self.maxsize is not None and len(self._entries) > self.maxsize:
+                oldest_key = next(iter(self._entries))
+                self._pop(oldest_key)
+                self.evictions += 1
+        return result
+
+    def invalidate(self, changed: Dict[CacheDependency, Optional[Iterable[str]]]) -> int:
+        """changed maps the CacheDependency to the changed keys.  A value of None
+        means that all keys of this kind changed.
+
+        Returns the number of invalidated entries
+        """
+        changed = {kind: keys for kind, keys in changed.items() if keys is None or keys}
+        if not changed:
+            return 0
+
+        with self.lock:
+            if not self.depends_on or any(
+                kind in self.depends_on and kind != self.key_dependency for kind in changed
+            ):
+                invalidated_keys = set(self._entries.keys())
+            elif self.key_dependency in changed:
+                changed_keys = changed[self.key_dependency]
+                if changed_keys is None:
+                    invalidated_keys = set(self._entries.keys())
+                else:
+                    invalidated_keys = set()
+                    for changed_key in changed_keys:
+                        invalidated_keys.update(self._keyed_entries.get(str(changed_key), set()))
+            else:
+                return 0
+
+            for key in invalidated_keys:
+                self._pop(key)
+            self.invalidations += len(invalidated_keys)
+            return len(invalidated_keys)
+
+
 class CacheManager:
     def __init__(self) -> None:
-        self._instance_cache: Dict[Callable, Any] = {}
-        self._cached_instance_methods: List[Any] = []
-        self._cached_instance_methods_always_keep: List[Any] = []
+        self._instance_cache: Dict[Callable, InstanceCache] = {}
+        self._cached_instance_methods: List[InstanceCache] = []
+        self._cached_instance_methods_always_keep: List[InstanceCache] = []
 
     def clear_instance_cache(self, clear_always_keep=False):
         logger.debug(f"clear_instance_cache {self.__class__.__name__}")
@@ -248,6 +393,16 @@ class CacheManager:
             for cached_method in self._cached_instance_methods_always_keep:
                 cached_method.cache_clear()
 
+    def invalidate_instance_cache(self, changed: Dict[CacheDependency, Optional[Iterable[str]]]) -> None:
+        "Invalidates only the entries depending on changed, see InstanceCache.invalidate"
+        number = sum(cached_method.invalidate(changed) for cached_method in self._cached_instance_methods)
+        logger.debug(f"invalidate_instance_cache {self.__class__.__name__} invalidated {number} entries")
+
+    def instance_cache_info(self) -> Dict[str, CacheInfo]:
+        return {
+            f.__qualname__: cached_method.cache_info() for f, cached_method in self._instance_cache.items()
+        }
+
     def clear_method(self, method):
         for f, wrapped in self._instance_cache.items():
             if f.__name__ == method.__name__:
@@ -255,13 +410,30 @@ class CacheManager:
 
 
 # Custom instance cache decorator
-def instance_lru_cache(always_keep=False):
+def instance_lru_cache(
+    always_keep=False,
+    maxsize: Optional[int] = None,
+    depends_on: Iterable[CacheDependency] = (),
+    key_dependency: Optional[CacheDependency] = None,
+):
+    """Caches the method per instance (the instance must be a
+    CacheManager).
+
+    depends_on and key_dependency allow a selective invalidation, see
+    InstanceCache.
+    """
+
     def decorator(func):
         @wraps(func)
         def wrapper(self, *args, **kwargs):
             is_method_in_cache = func in self._instance_cache
             if not is_method_in_cache:
-                self._instance_cache[func] = lru_cache(maxsize=None)(func.__get__(self))
+                self._instance_cache[func] = InstanceCache(
+                    func.__get__(self),
+                    maxsize=maxsize,
+                    depends_on=depends_on,
+                    key_dependency=key_dependency,
+                )
 
                 if always_keep:
                     self._cached_instance_methods_always_keep.append(self._instance_cache[func])
@@ -874,7 +1046,9 @@ def remove_duplicates_keep_order(seq):
 
 
 def calculate_ema(
-    values: Iterable[Union[float, int]], n: int = 10, weights: List[Union[float, int]] | None = None
+    values: Iterable[Union[float, int]],
+    n: int = 10,
+    weights: Sequence[Union[float, int]] | np.ndarray | None = None,
 ) -> float:
     """
     Calculate the Exponential Moving Average (EMA) of a list of values, with an option to apply custom weights to each data point.
@@ -884,19 +1058,17 @@ def calculate_ema(
     :param weights: Optional list of weights to apply to each data point. If not provided, all points are weighted equally.
     :return: The calculated EMA as a float
     """
-    values = list(values)
+    values = np.asarray(list(values), dtype=np.float64)
 
     alpha = 2 / (n + 1)
-    adjusted_weights = weights if weights else [1] * len(values)
-    adjusted_weights = np.array(adjusted_weights) / np.max(
-        adjusted_weights
-    )  # Adjust weights to ensure alpha * w <= 1
-
-    ema = values[0]  # Initialize EMA with the first data point
-    for weight, value in zip(adjusted_weights, values):
-        weighted_alpha = min(1, alpha * weight)
-        ema = value * weighted_alpha + (ema * (1 - weighted_alpha))
-    return ema
+    adjusted_weights = np.ones(len(values)) if weights is None or len(weights) == 0 else np.asarray(weights)
+    adjusted_weights = adjusted_weights / np.max(adjusted_weights)  # Adjust weights to ensure alpha * w <= 1
+    alphas = np.minimum(1, alpha * adjusted_weights)
+
+    # The recursion ema = value * alpha + ema * (1 - alpha), starting with ema = values[0], is
+    # values[0] * prod(1 - alphas) + sum_i values[i] * alphas[i] * prod_{j > i}(1 - alphas[j])
+    decay_after = np.append(np.cumprod((1 - alphas)[::-1])[::-1][1:], 1)
+    return float(values[0] * np.prod(1 - alphas) + np.sum(values * alphas * decay_after))
 
 
 def current_project_dir() -> Path:
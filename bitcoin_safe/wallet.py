@@ -27,22 +27,24 @@
 # SOFTWARE.
 
 
-import functools
 import logging
 import os
 import random
+import weakref
 from time import time
 
 from bitcoin_safe.psbt_util import FeeInfo
 
-from .signals import Signals, UpdateFilter
+from .signals import Signals, UpdateFilter, UpdateFilterReason
+from .txo_registry import TxoRegistry
 
 logger = logging.getLogger(__name__)
 
-import json
-from collections import defaultdict
+import sqlite3
+from collections import defaultdict, deque
+from pathlib import Path
 from threading import Lock
-from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple, Union
 
 import bdkpython as bdk
 import numpy as np
@@ -51,18 +53,23 @@ from bitcoin_usb.psbt_tools import PSBTTools
 from bitcoin_usb.software_signer import derive as software_signer_derive
 from packaging import version
 
+from .address_index import address_index
+from .blockchain_pool import blockchain_pool
+from .coin_selection import CoinSelector, output_weight
 from .config import MIN_RELAY_FEE, UserConfig
 from .descriptors import AddressType, MultipathDescriptor, get_default_address_type
+from .fee_stats import FeeStats
 from .i18n import translate
 from .keystore import KeyStore
 from .labels import Labels, LabelType
 from .pythonbdk_types import *
-from .storage import BaseSaveableClass, filtered_for_init
+from .storage import BaseSaveableClass, DerivedKeyCache, filtered_for_init
 from .tx import TxBuilderInfos, TxUiInfos
 from .util import (
+    TX_HEIGHT_INF,
+    CacheDependency,
     CacheManager,
     Satoshis,
-    calculate_ema,
     clean_list,
     hash_string,
     instance_lru_cache,
@@ -313,6 +320,10 @@ class DeltaCacheListTransactions:
         self.appended: List[bdk.TransactionDetails] = []
         self.removed: List[bdk.TransactionDetails] = []
         self.new_state: List[bdk.TransactionDetails] = []
+        # the following are only filled by FullTxDetailIndex
+        self.modified: List[bdk.TransactionDetails] = []  # same txid, but different confirmation_time
+        self.affected_addresses: Set[str] = set()
+        self.affected_outpoints: Set[str] = set()
 
     def was_changed(self) -> Dict[str, List[bdk.TransactionDetails]]:
         d = {}
@@ -328,6 +339,292 @@ class TxoType(enum.Enum):
     OutputTxo = enum.auto()
 
 
+class FullTxDetailIndex:
+    """An incrementally maintained map of txid:FullTxDetail and
+    address:{txid}.
+
+    Appended and removed transactions are applied in place (including
+    un-linking the is_spent_by_txid pointers and the address:{txid}
+    entries), such that a sync that changes 3 transactions, only costs 3
+    transactions of work.
+
+    This is not an instance cache and therefore survives
+    Wallet.clear_cache().
+    """
+
+    def __init__(self, get_address_of_txout: Callable[[TxOut], str | None]) -> None:
+        self.get_address_of_txout = get_address_of_txout
+        self.lock = Lock()
+        self.clear()
+
+    def clear(self) -> None:
+        self.dict_fulltxdetail: Dict[str, FullTxDetail] = {}  # txid:FullTxDetail
+        # an address is used, if it is a key in address_to_txids
+        self.address_to_txids: Dict[str, Set[str]] = defaultdict(set)  # address:{txid}
+        # only contains addresses with unspent outputs
+        self.address_balances: Dict[str, Balance] = {}  # address:Balance
+        # this allows linking a parent tx, that arrives after the child tx
+        self.outpoint_to_spending_txid: Dict[str, str] = {}  # outpoint_str:txid
+        # filled lazily by Wallet.get_categories_for_txid
+        self.txid_to_categories: Dict[str, List[str]] = {}  # txid:[category]
+
+    def update(self, txs: List[bdk.TransactionDetails]) -> DeltaCacheListTransactions:
+        """Brings the index to the state of txs.
+
+        The delta is calculated relative to the content of the index
+        (and not relative to an access_marker), which keeps the index
+        consistent, no matter how often the caches were cleared.
+        """
+        with self.lock:
+            new_state = {tx.txid: tx for tx in txs}
+
+            delta = DeltaCacheListTransactions()
+            delta.old_state = [fulltxdetail.tx for fulltxdetail in self.dict_fulltxdetail.values()]
+            delta.new_state = txs
+            delta.removed = [
+                fulltxdetail.tx
+                for txid, fulltxdetail in self.dict_fulltxdetail.items()
+                if txid not in new_state
+            ]
+            delta.appended = [tx for tx in new_state.values() if tx.txid not in self.dict_fulltxdetail]
+
+            for tx in delta.removed:
+                self._add_affected(self.dict_fulltxdetail[tx.txid], delta)
+                self._remove(tx.txid)
+
+            # the TransactionDetails of unchanged txids can still change (e.g. confirmation_time)
+            for txid, fulltxdetail in self.dict_fulltxdetail.items():
+                new_tx = new_state[txid]
+                if self._confirmation_height(fulltxdetail.tx) != self._confirmation_height(new_tx):
+                    delta.modified.append(new_tx)
+                    self._add_affected(fulltxdetail, delta)
+                fulltxdetail.tx = new_tx
+
+            # all outputs must be present before the inputs can be linked
+            for tx in delta.appended:
+                self._add_outputs(tx)
+            for tx in delta.appended:
+                self._add_inputs(tx)
+            for tx in delta.appended:
+                self._add_affected(self.dict_fulltxdetail[tx.txid], delta)
+
+            for address in delta.affected_addresses:
+                self._update_balance(address)
+
+            for tx in delta.removed:
+                self.txid_to_categories.pop(tx.txid, None)
+            self._invalidate_categories(delta.affected_addresses)
+
+            return delta
+
+    def invalidate_categories(self, addresses: Iterable[str] | None = None) -> None:
+        "Forgets the categories of all txs that involve the addresses (None = all txs)"
+        with self.lock:
+            if addresses is None:
+                self.txid_to_categories.clear()
+                return
+            self._invalidate_categories(addresses)
+
+    def _invalidate_categories(self, addresses: Iterable[str]) -> None:
+        for address in addresses:
+            for txid in self.address_to_txids.get(address, set()):
+                self.txid_to_categories.pop(txid, None)
+
+    def _update_balance(self, address: str) -> None:
+        """Recalculates the balance from the unspent outputs of the txs of
+        this address.
+
+        A new Balance object is created, such that previously returned
+        balances are not mutated.
+        """
+        balance = Balance()
+        for txid in self.address_to_txids.get(address, set()):
+            fulltxdetail = self.dict_fulltxdetail[txid]
+            for python_utxo in fulltxdetail.outputs.values():
+                if python_utxo.address != address or python_utxo.is_spent_by_txid:
+                    continue
+                if fulltxdetail.tx.confirmation_time:
+                    balance.confirmed += python_utxo.txout.value
+                else:
+                    balance.untrusted_pending += python_utxo.txout.value
+
+        if balance.total:
+            self.address_balances[address] = balance
+        else:
+            self.address_balances.pop(address, None)
+
+    @staticmethod
+    def _confirmation_height(tx: bdk.TransactionDetails) -> int | None:
+        return tx.confirmation_time.height if tx.confirmation_time else None
+
+    @staticmethod
+    def _add_affected(fulltxdetail: FullTxDetail, delta: DeltaCacheListTransactions) -> None:
+        for outpoint_str, python_utxo in list(fulltxdetail.inputs.items()) + list(
+            fulltxdetail.outputs.items()
+        ):
+            delta.affected_outpoints.add(outpoint_str)
+            if python_utxo:
+                delta.affected_addresses.add(python_utxo.address)
+
+    def _discard_txid(self, address: str, txid: str) -> None:
+        txids = self.address_to_txids.get(address)
+        if txids is None:
+            return
+        txids.discard(txid)
+        if not txids:
+            del self.address_to_txids[address]
+
+    def _add_outputs(self, tx: bdk.TransactionDetails) -> None:
+        fulltxdetail = FullTxDetail.fill_received(tx, self.get_address_of_txout)
+        self.dict_fulltxdetail[fulltxdetail.txid] = fulltxdetail
+
+        for outpoint_str, python_utxo in fulltxdetail.outputs.items():
+            self.address_to_txids[python_utxo.address].add(fulltxdetail.txid)
+
+            # link already indexed children (if the child tx was indexed before this tx)
+            spending_txid = self.outpoint_to_spending_txid.get(outpoint_str)
+            spending_fulltxdetail = self.dict_fulltxdetail.get(spending_txid) if spending_txid else None
+            if not spending_fulltxdetail:
+                continue
+            python_utxo.is_spent_by_txid = spending_fulltxdetail.txid
+            spending_fulltxdetail.inputs[outpoint_str] = python_utxo
+            self.address_to_txids[python_utxo.address].add(spending_fulltxdetail.txid)
+
+    def _add_inputs(self, tx: bdk.TransactionDetails) -> None:
+        "this must be done AFTER _add_outputs"
+        fulltxdetail = self.dict_fulltxdetail[tx.txid]
+        fulltxdetail.fill_inputs(self.dict_fulltxdetail)
+
+        for outpoint_str, python_utxo in fulltxdetail.inputs.items():
+            self.outpoint_to_spending_txid[outpoint_str] = fulltxdetail.txid
+            if python_utxo:
+                self.address_to_txids[python_utxo.address].add(fulltxdetail.txid)
+
+    def _remove(self, txid: str) -> None:
+        fulltxdetail = self.dict_fulltxdetail.pop(txid, None)
+        if not fulltxdetail:
+            return
+
+        # un-link the parents
+        for outpoint_str, python_utxo in fulltxdetail.inputs.items():
+            if self.outpoint_to_spending_txid.get(outpoint_str) == txid:
+                del self.outpoint_to_spending_txid[outpoint_str]
+            if python_utxo and python_utxo.is_spent_by_txid == txid:
+                python_utxo.is_spent_by_txid = None
+
+        # un-link the children
+        for outpoint_str, python_utxo in fulltxdetail.outputs.items():
+            spending_txid = self.outpoint_to_spending_txid.get(outpoint_str)
+            spending_fulltxdetail = self.dict_fulltxdetail.get(spending_txid) if spending_txid else None
+            if not spending_fulltxdetail:
+                continue
+            spending_fulltxdetail.inputs[outpoint_str] = None
+            if python_utxo.address not in spending_fulltxdetail.involved_addresses():
+                self._discard_txid(python_utxo.address, spending_fulltxdetail.txid)
+
+        for address in fulltxdetail.involved_addresses():
+            self._discard_txid(address, txid)
+
+
+class TopologicalTxOrder:
+    """Orders the transactions from old to new.
+
+    The transactions are grouped by confirmation height (unconfirmed
+    last) and within a group they are sorted topologically (Kahn's
+    algorithm) over the parent->child edges in FullTxDetail.inputs, such
+    that a parent always comes before its child.  This is O(n + e).
+
+    The order of a height group is cached and only recomputed if
+    the group was touched by a delta.
+    """
+
+    def __init__(self) -> None:
+        self.lock = Lock()
+        self.clear()
+
+    def clear(self) -> None:
+        self.txid_to_height: Dict[str, int] = {}
+        self.height_to_sorted_txids: Dict[int, List[str]] = {}
+        self._sorted_txids: Optional[List[str]] = None
+
+    @staticmethod
+    def height_of(fulltxdetail: FullTxDetail) -> int:
+        confirmation_time = fulltxdetail.tx.confirmation_time
+        return confirmation_time.height if confirmation_time else TX_HEIGHT_INF
+
+    @staticmethod
+    def kahn_sort(txids: List[str], dict_fulltxdetail: Dict[str, FullTxDetail]) -> List[str]:
+        "Topological sort of txids. Unrelated txids keep their order in txids."
+        if len(txids) <= 1:
+            return txids
+
+        in_degree = {txid: 0 for txid in txids}
+        children: Dict[str, List[str]] = defaultdict(list)
+        for txid in txids:
+            # outpoint_str = "txid:vout"  (splitting is much faster than OutPoint.from_str)
+            parent_txids = {outpoint_str.split(":")[0] for outpoint_str in dict_fulltxdetail[txid].inputs}
+            for parent_txid in parent_txids:
+                if parent_txid in in_degree and parent_txid != txid:
+                    children[parent_txid].append(txid)
+                    in_degree[txid] += 1
+
+        queue = deque([txid for txid in txids if not in_degree[txid]])
+        result: List[str] = []
+        while queue:
+            txid = queue.popleft()
+            result.append(txid)
+            for child_txid in children[txid]:
+                in_degree[child_txid] -= 1
+                if not in_degree[child_txid]:
+                    queue.append(child_txid)
+
+        if len(result) < len(txids):
+            logger.error(f"The transactions contain a cycle. This should not happen.")
+            sorted_txids = set(result)
+            result += [txid for txid in txids if txid not in sorted_txids]
+        return result
+
+    def update(self, dict_fulltxdetail: Dict[str, FullTxDetail]) -> List[str]:
+        "Returns the txids sorted from old to new"
+        with self.lock:
+            dirty_heights: Set[int] = set()
+
+            for txid in [txid for txid in self.txid_to_height if txid not in dict_fulltxdetail]:
+                dirty_heights.add(self.txid_to_height.pop(txid))
+
+            for txid, fulltxdetail in dict_fulltxdetail.items():
+                height = self.height_of(fulltxdetail)
+                old_height = self.txid_to_height.get(txid)
+                if old_height == height:
+                    continue
+                if old_height is not None:
+                    dirty_heights.add(old_height)
+                dirty_heights.add(height)
+                self.txid_to_height[txid] = height
+
+            if not dirty_heights and self._sorted_txids is not None:
+                return self._sorted_txids
+
+            groups: Dict[int, List[str]] = {height: [] for height in dirty_heights}
+            for txid in dict_fulltxdetail:
+                height = self.txid_to_height[txid]
+                if height in groups:
+                    groups[height].append(txid)
+
+            for height, txids in groups.items():
+                if txids:
+                    self.height_to_sorted_txids[height] = self.kahn_sort(txids, dict_fulltxdetail)
+                else:
+                    self.height_to_sorted_txids.pop(height, None)
+
+            self._sorted_txids = [
+                txid
+                for height in sorted(self.height_to_sorted_txids)
+                for txid in self.height_to_sorted_txids[height]
+            ]
+            return self._sorted_txids
+
+
 class BdkWallet(bdk.Wallet, CacheManager):
     """This is a caching wrapper around bdk.Wallet. It should not provide any
     logic. Only wrapping existing methods and minimal new methods useful for
@@ -366,7 +663,7 @@ class BdkWallet(bdk.Wallet, CacheManager):
     ) -> str:
         return self.peek_addressinfo(index, is_change=is_change).address.as_string()
 
-    @instance_lru_cache()
+    @instance_lru_cache(depends_on=[CacheDependency.Txids, CacheDependency.Outpoints])
     @time_logger
     def list_unspent(self) -> List[bdk.LocalUtxo]:
         start_time = time()
@@ -404,7 +701,7 @@ class BdkWallet(bdk.Wallet, CacheManager):
             tx.confirmation_time.timestamp = height_to_min_timestamp[tx.confirmation_time.height]
         return txs
 
-    @instance_lru_cache()
+    @instance_lru_cache(depends_on=[CacheDependency.Txids])
     def list_transactions(self, include_raw=True) -> List[bdk.TransactionDetails]:
         start_time = time()
         res: List[bdk.TransactionDetails] = super().list_transactions(include_raw=include_raw)
@@ -498,6 +795,7 @@ class Wallet(BaseSaveableClass, CacheManager):
         refresh_wallet=False,
         default_category="default",
         auto_opportunistic_coin_select=True,
+        persist_chain_state=True,
         **kwargs,
     ) -> None:
         super().__init__()
@@ -517,16 +815,26 @@ class Wallet(BaseSaveableClass, CacheManager):
         self.write_lock = Lock()
         self.auto_opportunistic_coin_select = auto_opportunistic_coin_select
         self.labels: Labels = labels if labels else Labels(default_category=default_category)
+        # not saved in the wallet file, because it depends on the wallet file being encrypted
+        self.persist_chain_state = persist_chain_state
         # refresh dependent values
         self._tips = _tips if _tips and not refresh_wallet else [0, 0]
         self._blockchain_height = _blockchain_height if _blockchain_height and not refresh_wallet else 0
 
         if refresh_wallet and os.path.isfile(self._db_file()):
             os.remove(self._db_file())
-        self.refresh_wallet = False
         # end refresh dependent values
 
-        self.create_bdkwallet(MultipathDescriptor.from_descriptor_str(descriptor_str, self.network))
+        self.address_index = address_index
+        self._address_index_key = self.address_index.register(self.id)
+        weakref.finalize(self, self.address_index.remove, self._address_index_key)
+
+        self.create_bdkwallet(
+            MultipathDescriptor.from_descriptor_str(descriptor_str, self.network),
+            reset_chain_state=refresh_wallet,
+        )
+        self.refresh_wallet = False
+        self.blockchain_pool = blockchain_pool
         self.blockchain: Optional[bdk.Blockchain] = None
         self.clear_cache()
 
@@ -578,23 +886,74 @@ class Wallet(BaseSaveableClass, CacheManager):
                     )
 
     def clear_cache(self, clear_always_keep=False) -> None:
-        self.cache_dict_fulltxdetail: Dict[str, FullTxDetail] = {}  # txid:FullTxDetail
-        self.cache_address_to_txids: Dict[str, Set[str]] = defaultdict(set)  # address:[txid]
-
+        # self.fulltxdetail_index is updated incrementally and is therefore not cleared here
         self.clear_instance_cache(clear_always_keep=clear_always_keep)
         self.bdkwallet.clear_instance_cache(clear_always_keep=clear_always_keep)
+        self.fee_stats.clear()
 
-    @instance_lru_cache()
+    def invalidate_cache(self, update_filter: UpdateFilter) -> None:
+        "Invalidates only the cache entries that depend on the update_filter"
+        cache_dependencies = update_filter.cache_dependencies()
+        self.invalidate_instance_cache(cache_dependencies)
+
+        # the categories of the txs
+        changed_refs = cache_dependencies.get(CacheDependency.Labels, update_filter.addresses)
+        if changed_refs is None:
+            self.fulltxdetail_index.invalidate_categories()
+            return
+        self.fulltxdetail_index.invalidate_categories(changed_refs)
+        # renamed and deleted categories
+        if update_filter.categories:
+            for txid, categories in list(self.fulltxdetail_index.txid_to_categories.items()):
+                if update_filter.categories.intersection(categories):
+                    self.fulltxdetail_index.txid_to_categories.pop(txid, None)
+
+    def refresh_caches(self) -> DeltaCacheListTransactions:
+        """Reloads the transactions from bdk and invalidates only the cache
+        entries that depend on the changed transactions.
+
+        This replaces clear_cache() after a sync.
+        """
+        self.bdkwallet.clear_instance_cache()
+        delta = self.fulltxdetail_index.update(self.bdkwallet.list_transactions())
+        self.invalidate_instance_cache(
+            {
+                CacheDependency.Txids: {tx.txid for tx in delta.appended + delta.removed + delta.modified},
+                CacheDependency.Addresses: delta.affected_addresses,
+                CacheDependency.Outpoints: delta.affected_outpoints,
+                CacheDependency.ChainHeight: None,
+            }
+        )
+        return delta
+
+    @instance_lru_cache(depends_on=[CacheDependency.Addresses])
     def _get_addresses(
         self,
         is_change=False,
     ) -> List[str]:
         if (not is_change) and (not self.multipath_descriptor):
             return []
-        return [
+        addresses = [
             self.bdkwallet.peek_address(i, is_change=is_change)
             for i in range(0, self.tips[int(is_change)] + 1)
         ]
+        self.address_index.extend(
+            self._address_index_key, AddressInfoMin.is_change_to_keychain(is_change), 0, addresses
+        )
+        return addresses
+
+    def _index_lookahead(self, is_change: bool, count: int) -> None:
+        "Adds the addresses up to index count-1 to the address_index"
+        keychain = AddressInfoMin.is_change_to_keychain(is_change)
+        start = self.address_index.count(self._address_index_key, keychain)
+        if start >= count:
+            return
+        self.address_index.extend(
+            self._address_index_key,
+            keychain,
+            start,
+            [self.bdkwallet.peek_address(i, is_change=is_change) for i in range(start, count)],
+        )
 
     @instance_lru_cache(always_keep=True)
     def get_mn_tuple(self) -> Tuple[int, int]:
@@ -713,12 +1072,22 @@ class Wallet(BaseSaveableClass, CacheManager):
 
         return d
 
+    def save(
+        self,
+        filename: Union[Path, str],
+        password: Optional[str] = None,
+        key_cache: DerivedKeyCache | None = None,
+    ):
+        if password:
+            self.set_password_protected(True)
+        super().save(filename, password=password, key_cache=key_cache)
+
     @classmethod
     def from_file(cls, filename: str, config: UserConfig, password: str | None = None) -> "Wallet":
         return super()._from_file(
             filename=filename,
             password=password,
-            class_kwargs={"Wallet": {"config": config}},
+            class_kwargs={"Wallet": {"config": config, "persist_chain_state": not password}},
         )
 
     @classmethod
@@ -772,28 +1141,106 @@ class Wallet(BaseSaveableClass, CacheManager):
 
     def set_wallet_id(self, id: str) -> None:
         self.id = id
+        self.address_index.set_wallet_id(self._address_index_key, id)
 
     def _db_file(self) -> str:
         return f"{os.path.join(self.config.wallet_dir, filename_clean(self.id, file_extension='.db'))}"
 
-    def create_bdkwallet(self, multipath_descriptor: MultipathDescriptor) -> None:
-        self.multipath_descriptor = multipath_descriptor
+    def _chain_state_db_file(self) -> str:
+        """Keyed by the descriptor only, such that a changed descriptor never sees the
+        chain state of the old one, and a renamed wallet keeps (and can delete) its chain state"""
+        return os.path.join(
+            self.config.wallet_dir,
+            "chain_state",
+            f"{hash_string(self.multipath_descriptor.as_string())}.sqlite",
+        )
+
+    def _uses_chain_state_db(self) -> bool:
+        """The bdk SQLite database cannot be encrypted, so it is only used if
+        the wallet file is not encrypted.
+
+        An RPC backend syncs from a local node and keeps its own state in
+        the node wallet _get_uniquie_wallet_id().
+        """
+        return (
+            self.persist_chain_state
+            and self.config.persist_chain_state
+            and self.config.network_config.server_type != BlockchainType.RPC
+        )
+
+    def delete_chain_state_db(self) -> None:
+        db_file = self._chain_state_db_file()
+        for file_path in [db_file, f"{db_file}-journal", f"{db_file}-wal", f"{db_file}-shm"]:
+            if os.path.isfile(file_path):
+                os.remove(file_path)
+                logger.info(f"Deleted the chain state {file_path}")
+
+    def set_password_protected(self, password_protected: bool) -> bool:
+        """The chain state of a wallet, that is saved with a password, must not remain
+        unencrypted on disk. It is therefore moved into memory and the db is deleted.
+
+        Returns True if the bdk wallet was re-created and has to be synced again.
+        """
+        uses_chain_state_db = self._uses_chain_state_db()
+        self.persist_chain_state = not password_protected
+        if not (password_protected and uses_chain_state_db):
+            return False
 
-        self.bdkwallet = BdkWallet(
+        self.create_bdkwallet(self.multipath_descriptor)
+        self.clear_cache()
+        return True
+
+    def _new_bdkwallet(self, database_config: Any) -> BdkWallet:
+        return BdkWallet(
             descriptor=self.multipath_descriptor.bdk_descriptors[0],
             change_descriptor=self.multipath_descriptor.bdk_descriptors[1],
             network=self.config.network,
-            database_config=bdk.DatabaseConfig.MEMORY(),
-            # database_config=bdk.DatabaseConfig.SQLITE(
-            #     bdk.SqliteDbConfiguration(self._db_file())
-            # ),
+            database_config=database_config,
         )
 
+    @staticmethod
+    def _is_valid_sqlite_db(db_file: str) -> bool:
+        # bdk aborts the process (instead of raising) if it cannot open the db, so check beforehand
+        try:
+            with sqlite3.connect(f"file:{db_file}?mode=ro", uri=True) as connection:
+                return connection.execute("PRAGMA quick_check").fetchone() == ("ok",)
+        except sqlite3.Error:
+            return False
+
+    def _new_bdkwallet_with_chain_state_db(self) -> BdkWallet:
+        """Opens the wallet from the chain state of the last session, such that
+        a sync only has to catch up.
+
+        A db that is corrupted (e.g. by a crash) is deleted and re-synced
+        from scratch.
+        """
+        db_file = self._chain_state_db_file()
+        os.makedirs(os.path.dirname(db_file), exist_ok=True)
+        if os.path.isfile(db_file) and not self._is_valid_sqlite_db(db_file):
+            logger.warning(f"The chain state {db_file} is corrupted. Starting with a new one.")
+            self.delete_chain_state_db()
+        return self._new_bdkwallet(bdk.DatabaseConfig.SQLITE(bdk.SqliteDbConfiguration(path=db_file)))
+
+    def create_bdkwallet(self, multipath_descriptor: MultipathDescriptor, reset_chain_state=False) -> None:
+        self.multipath_descriptor = multipath_descriptor
+
+        if reset_chain_state or not (self.persist_chain_state and self.config.persist_chain_state):
+            # no stale or unencrypted chain state should remain on disk
+            self.delete_chain_state_db()
+
+        self.bdkwallet = (
+            self._new_bdkwallet_with_chain_state_db()
+            if self._uses_chain_state_db()
+            else self._new_bdkwallet(bdk.DatabaseConfig.MEMORY())
+        )
+        self.fulltxdetail_index = FullTxDetailIndex(self.bdkwallet.get_address_of_txout)
+        self.tx_order = TopologicalTxOrder()
+        self.fee_stats = FeeStats()
+
     def is_multisig(self) -> bool:
         return len(self.keystores) > 1
 
-    def init_blockchain(self) -> bdk.Blockchain:
-        logger.info(f"Creating blockchain connection for {self.config.network_config}")
+    def get_blockchain_config(self) -> bdk.BlockchainConfig:
 
         if self.config.network == bdk.Network.BITCOIN:
             start_height = 0  # segwit block 481824
@@ -814,8 +1261,8 @@ class Wallet(BaseSaveableClass, CacheManager):
                 bdk.ElectrumConfig(
                     url=full_url,
                     socks5=None,
-                    retry=2,
-                    timeout=10,
+                    retry=self.config.network_config.electrum_retry,
+                    timeout=self.config.network_config.get_timeout(),
                     stop_gap=max(self.gap, self.gap_change),
                     validate_domain=self.config.network_config.electrum_use_ssl,
                 )
@@ -825,9 +1272,9 @@ class Wallet(BaseSaveableClass, CacheManager):
                 bdk.EsploraConfig(
                     base_url=self.config.network_config.esplora_url,
                     proxy=None,
-                    concurrency=1,
+                    concurrency=self.config.network_config.get_esplora_concurrency(),
                     stop_gap=max(self.gap, self.gap_change),
-                    timeout=10,
+                    timeout=self.config.network_config.get_timeout(),
                 )
             )
         # elif self.config.network_config.server_type == BlockchainType.CompactBlockFilter:
@@ -860,22 +1307,32 @@ class Wallet(BaseSaveableClass, CacheManager):
             )
         if not blockchain_config:
             raise Exception("Could not find a blockchain_config.")
-        self.blockchain = bdk.Blockchain(config=blockchain_config)
+        return blockchain_config
+
+    def _blockchain_pool_args(self) -> Tuple[str, Callable[[], bdk.Blockchain]]:
+        "Returns (key, factory) for the blockchain_pool"
+        blockchain_config = self.get_blockchain_config()
+
+        def factory() -> bdk.Blockchain:
+            logger.info(f"Creating blockchain connection for {self.config.network_config}")
+            return bdk.Blockchain(config=blockchain_config)
+
+        return str(blockchain_config), factory
+
+    def init_blockchain(self) -> bdk.Blockchain:
+        "Returns a (shared) connection from the blockchain_pool"
+        self.blockchain = self.blockchain_pool.get(*self._blockchain_pool_args())
         return self.blockchain
 
     def _get_uniquie_wallet_id(self) -> str:
         return f"{replace_non_alphanumeric(self.id)}-{hash_string(self.multipath_descriptor.as_string())}"
 
     def sync(self, progress: Optional[bdk.Progress] | None = None) -> None:
-        if self.blockchain is None:
-            self.init_blockchain()
-
-        if self.blockchain is None:
-            return
-
         try:
             start_time = time()
-            self.bdkwallet.sync(self.blockchain, progress if progress else ProgressLogger())
+            with self.blockchain_pool.connection(*self._blockchain_pool_args()) as blockchain:
+                self.blockchain = blockchain
+                self.bdkwallet.sync(blockchain, progress if progress else ProgressLogger())
             logger.debug(f"{self.id} self.bdkwallet.sync in { time()-start_time}s")
             logger.info(f"Wallet balance is: { self.bdkwallet.get_balance().__dict__ }")
         except Exception as e:
@@ -956,9 +1413,9 @@ class Wallet(BaseSaveableClass, CacheManager):
         # you have to repeat fetching new tx when you start watching new addresses
         # And you can only start watching new addresses once you detected transactions on them.
         # Thas why this fetching has to be done in a loop
+        # Since advance_tips_by_gap also looks beyond the tip, this converges after 1-2 iterations.
         while new_addresses_were_watched:
-            if i > 0:
-                self.clear_cache()
+            # _advance_tip_if_necessary invalidates the caches depending on the new addresses
             self.get_addresses()
             self.get_height()
 
@@ -973,12 +1430,12 @@ class Wallet(BaseSaveableClass, CacheManager):
         self.get_dict_fulltxdetail()
         self.get_all_txos_dict()
 
-    @instance_lru_cache()
+    @instance_lru_cache(depends_on=[CacheDependency.Txids])
     def get_txs(self) -> Dict[str, bdk.TransactionDetails]:
         "txid:TransactionDetails"
         return {tx.txid: tx for tx in self.sorted_delta_list_transactions()}
 
-    @instance_lru_cache()
+    @instance_lru_cache(key_dependency=CacheDependency.Txids)
     def get_tx(self, txid: str) -> bdk.TransactionDetails | None:
         return self.get_txs().get(txid)
 
@@ -1006,10 +1463,8 @@ class Wallet(BaseSaveableClass, CacheManager):
 
     def used_address_tip(self, is_change: bool) -> int:
         def reverse_search_used(tip_index) -> int:
-            for i in reversed(range(tip_index)):
-                addresses = self._get_addresses(is_change=is_change)
-                if len(addresses) - 1 < i:
-                    continue
+            addresses = self._get_addresses(is_change=is_change)
+            for i in reversed(range(min(tip_index, len(addresses)))):
                 if self.address_is_used(addresses[i]):
                     return i
             return 0
@@ -1017,6 +1472,22 @@ class Wallet(BaseSaveableClass, CacheManager):
         bdk_get_address = self.bdkwallet.get_internal_address if is_change else self.bdkwallet.get_address
         return reverse_search_used(bdk_get_address(bdk.AddressIndex.LAST_UNUSED()).index)
 
+    def used_address_tip_with_lookahead(self, is_change: bool, gap: int) -> int:
+        """Like used_address_tip, but also finds used addresses beyond the tip.
+
+        The transactions to not yet revealed addresses are known from the
+        sync.  The addresses after the last used address are peeked (and
+        cached) in a look-ahead window of size gap, until gap unused
+        addresses follow the last used address.
+        """
+        last_used = self.used_address_tip(is_change=is_change)
+        index = last_used + 1
+        while index <= last_used + gap:
+            if self.address_is_used(self.bdkwallet.peek_address(index, is_change=is_change)):
+                last_used = index
+            index += 1
+        return last_used
+
     def _get_bdk_tip(self, is_change: bool) -> int:
         if not self.bdkwallet:
             return self._tips[int(is_change)]
@@ -1031,7 +1502,8 @@ class Wallet(BaseSaveableClass, CacheManager):
         self._advance_tip_if_necessary(is_change=is_change, target=self._tips[int(is_change)])
         return self._tips[int(is_change)]
 
-    def _advance_tip_if_necessary(self, is_change: bool, target: int) -> None:
+    def _advance_tip_if_necessary(self, is_change: bool, target: int) -> int:
+        "Returns the number of revealed addresses"
         with self.write_lock:
             bdk_get_address = self.bdkwallet.get_internal_address if is_change else self.bdkwallet.get_address
 
@@ -1040,53 +1512,53 @@ class Wallet(BaseSaveableClass, CacheManager):
             old_bdk_tip = old_address_info.index
             number = target - old_bdk_tip
             if number == 0:
-                return
+                return 0
             if number < 0:
                 self._tips[int(is_change)] = old_bdk_tip
-                return
+                return 0
 
             logger.info(f"{self.id} indexing {number} new addresses")
 
-            def add_new_address() -> bdk.AddressInfo:
-                address_info: bdk.AddressInfo = bdk_get_address(bdk.AddressIndex.NEW())
-                logger.info(
-                    f"{self.id} Added {'change' if is_change else ''} address with index {address_info.index}"
-                )
-                return address_info
-
-            [add_new_address() for i in range(number)]
+            # reveal all addresses up to target at once, instead of 1 AddressIndex.NEW() per address
+            bdk_get_address(bdk.AddressIndex.RESET(target))
+            new_addresses = [
+                self.bdkwallet.peek_address(index, is_change=is_change)
+                for index in range(old_bdk_tip + 1, target + 1)
+            ]
+            logger.info(
+                f"{self.id} Added {'change' if is_change else ''} addresses with index {old_bdk_tip + 1} to {target}"
+            )
 
-        self.clear_cache()
+        self.invalidate_cache(
+            UpdateFilter(
+                addresses=new_addresses,
+                reason=UpdateFilterReason.NewAddressRevealed,
+            )
+        )
+        return number
 
     def advance_tips_by_gap(self) -> Tuple[int, int]:
         "Returns [number of added addresses, number of added change addresses]"
         tip = [0, 0]
         for is_change in [False, True]:
             gap = self.gap_change if is_change else self.gap
-            used_tip = self.used_address_tip(is_change=is_change)
-            self._advance_tip_if_necessary(is_change=is_change, target=used_tip + gap)
+            used_tip = self.used_address_tip_with_lookahead(is_change=is_change, gap=gap)
+            tip[int(is_change)] = self._advance_tip_if_necessary(is_change=is_change, target=used_tip + gap)
         return (tip[0], tip[1])
 
     def search_index_tuple(self, address, forward_search=500) -> Optional[AddressInfoMin]:
         """Looks for the address"""
-        # first check if the address is already indexed
         for is_change in [False, True]:
-            addresses = self._get_addresses(is_change=is_change)
-            if address in addresses:
-                return AddressInfoMin(
-                    address, addresses.index(address), AddressInfoMin.is_change_to_keychain(is_change)
-                )
+            # the tip and forward_search addresses beyond
+            self._index_lookahead(
+                is_change=is_change, count=len(self._get_addresses(is_change=is_change)) + forward_search
+            )
 
-        # if not then search forward
-        for is_change in [False, True]:
-            for index in range(self.tips[int(is_change)] + 1, forward_search + self.tips[int(is_change)] + 1):
-                for is_change in [False, True]:
-                    peek_address = self.bdkwallet.peek_address(index, is_change)
-                    if peek_address == address:
-                        return AddressInfoMin(
-                            address, index, keychain=AddressInfoMin.is_change_to_keychain(is_change)
-                        )
-        return None
+        entry = self.address_index.get(self._address_index_key, address)
+        if not entry:
+            return None
+        keychain, index = entry
+        return AddressInfoMin(address, index, keychain=keychain)
 
     def advance_tip_to_address(self, address: str, forward_search=500) -> Optional[AddressInfoMin]:
         """Looks for the address and advances the tip to this address"""
@@ -1123,19 +1595,21 @@ class Wallet(BaseSaveableClass, CacheManager):
         return out
 
     def is_change(self, address: str) -> bool:
-        return address in self.get_change_addresses()
+        info_min = self._get_address_info_min(address, bdk.KeychainKind.INTERNAL)
+        return bool(info_min)
 
     def _get_address_info_min(self, address: str, keychain: bdk.KeychainKind) -> Optional[AddressInfoMin]:
         "(is_change, index)"
-        if keychain == bdk.KeychainKind.EXTERNAL:
-            addresses = self.get_receiving_addresses()
-            if address in addresses:
-                return AddressInfoMin(keychain=keychain, index=addresses.index(address), address=address)
-        else:
-            addresses = self.get_change_addresses()
-            if address in addresses:
-                return AddressInfoMin(keychain=keychain, index=addresses.index(address), address=address)
-        return None
+        # this also keeps the address_index up to date
+        addresses = self._get_addresses(is_change=keychain == bdk.KeychainKind.INTERNAL)
+        entry = self.address_index.get(self._address_index_key, address)
+        if not entry:
+            return None
+        entry_keychain, index = entry
+        # the address_index also contains the look-ahead addresses
+        if entry_keychain != keychain or index >= len(addresses):
+            return None
+        return AddressInfoMin(keychain=keychain, index=index, address=address)
 
     def get_address_info_min(self, address: str) -> Optional[AddressInfoMin]:
         info_min = self._get_address_info_min(address, bdk.KeychainKind.EXTERNAL)
@@ -1155,120 +1629,65 @@ class Wallet(BaseSaveableClass, CacheManager):
             return txo_dict[outpoint_str]
         return None
 
-    @instance_lru_cache()
     def get_address_balances(self) -> defaultdict[str, Balance]:
-        """Converts the known utxos into
-        a dict of addresses and their balance
-        """
-
-        def get_confirmation_time(txid: str) -> Optional[bdk.BlockTime]:
-            if tx_details := self.get_tx(txid):
-                return tx_details.confirmation_time
-            return None
-
-        utxos = self.bdkwallet.list_unspent()
-
-        balances: defaultdict[str, Balance] = defaultdict(Balance)
-        for i, utxo in enumerate(utxos):
-            outpoint = OutPoint.from_bdk(utxo.outpoint)
-            txout = self.get_txout_of_outpoint(outpoint)
-            if not txout:
-                logger.warning(f"This should not happen. Most likely it is due to outdated caches.")
-                # this way of handeling this special case is suboptimal.
-                # Better would be to handle the caches such that the caches are always consistent
-                self.clear_instance_cache()
-                txout = self.get_txout_of_outpoint(outpoint)
-                if not txout:
-                    raise InconsistentBDKState(f"{outpoint.txid} not present in transaction details")
-
-            address = self.bdkwallet.get_address_of_txout(txout)
-            if address is None:
-                continue
-
-            if get_confirmation_time(outpoint.txid):
-                balances[address].confirmed += txout.value
-            else:
-                balances[address].untrusted_pending += txout.value
+        """A dict of the wallet addresses and their balance.
 
-        return balances
+        The balances are maintained incrementally by
+        self.fulltxdetail_index
+        """
+        # this also updates self.fulltxdetail_index
+        self.get_dict_fulltxdetail()
+        # the index also contains the outputs to foreign addresses, whose spending the wallet never sees
+        return defaultdict(
+            Balance,
+            {
+                address: balance
+                for address, balance in self.fulltxdetail_index.address_balances.items()
+                if self.is_my_address(address)
+            },
+        )
 
-    @instance_lru_cache()
     def get_addr_balance(self, address: str) -> Balance:
         """Return the balance of a set of addresses:
         confirmed and matured, unconfirmed, unmatured
         """
-        return self.get_address_balances()[address]
+        # this also updates self.fulltxdetail_index
+        self.get_dict_fulltxdetail()
+        balance = self.fulltxdetail_index.address_balances.get(address)
+        return balance if balance and self.is_my_address(address) else Balance()
 
     def get_involved_txids(self, address: str) -> Set[str]:
-        # this also fills self.cache_address_to_txids
+        # this also updates self.fulltxdetail_index
         self.get_dict_fulltxdetail()
-        return self.cache_address_to_txids.get(address, set())
+        return self.fulltxdetail_index.address_to_txids.get(address, set())
 
-    @instance_lru_cache()
+    @instance_lru_cache(depends_on=[CacheDependency.Txids])
     @time_logger
     def get_dict_fulltxdetail(self) -> Dict[str, FullTxDetail]:
         """
         Createa a map of txid : to FullTxDetail
 
+        Only the appended and removed transactions (relative to the
+        last call) are processed, see FullTxDetailIndex.
+
         Returns:
             FullTxDetail
         """
         start_time = time()
-        delta_txs = self.bdkwallet.list_delta_transactions(access_marker="get_dict_fulltxdetail")
+        delta_txs = self.fulltxdetail_index.update(self.bdkwallet.list_transactions())
 
-        # if transactions were removed (reorg or other), then recalculate everything
-        if delta_txs.removed or not self.cache_dict_fulltxdetail:
-            self.cache_dict_fulltxdetail = {}
-            txs = delta_txs.new_state
-        else:
-            txs = delta_txs.appended
-
-        def append_dicts(txid, python_utxos: List[Optional[PythonUtxo]]) -> None:
-            for python_utxo in python_utxos:
-                if not python_utxo:
-                    continue
-                self.cache_address_to_txids[python_utxo.address].add(txid)
-
-        def process_outputs(tx: bdk.TransactionDetails) -> Tuple[str, FullTxDetail]:
-            fulltxdetail = FullTxDetail.fill_received(tx, self.bdkwallet.get_address_of_txout)
-            if fulltxdetail.txid in self.cache_dict_fulltxdetail:
-                logger.error(
-                    f"Trying to add a tx with txid {fulltxdetail.txid} twice. Is it a mining output?"
-                )
-            return fulltxdetail.txid, fulltxdetail
-
-        def process_inputs(tx: bdk.TransactionDetails) -> Tuple[str, FullTxDetail]:
-            "this must be done AFTER process_outputs"
-            txid = tx.txid
-            fulltxdetail = self.cache_dict_fulltxdetail[txid]
-            fulltxdetail.fill_inputs(self.cache_dict_fulltxdetail)
-            return txid, fulltxdetail
-
-        key_value_pairs = list(map(process_outputs, txs))
-
-        self.cache_dict_fulltxdetail.update(key_value_pairs)
-        for txid, fulltxdetail in key_value_pairs:
-            append_dicts(txid, list(fulltxdetail.outputs.values()))
-
-        # speed test for wallet 600 transactions (with many inputs each) without profiling:
-        # map : 2.714s
-        # for loop:  2.76464
-        # multithreading : 6.3021s
-        # threadtable_batched: 4.1 s , this should perform best, however bdk is probably the bottleneck and not-multithreading capable
-        key_value_pairs = list(map(process_inputs, txs))
-        for txid, fulltxdetail in key_value_pairs:
-            append_dicts(txid, list(fulltxdetail.inputs.values()))
-
-        if txs:
-            logger.debug(f"get_dict_fulltxdetail  with {len(txs)} txs in {time()-  start_time}")
+        if delta_txs.was_changed():
+            logger.debug(
+                f"get_dict_fulltxdetail  with {len(delta_txs.appended)} appended and {len(delta_txs.removed)} removed txs in {time()-  start_time}"
+            )
 
-        return self.cache_dict_fulltxdetail
+        return self.fulltxdetail_index.dict_fulltxdetail
 
-    @instance_lru_cache(always_keep=False)
+    @instance_lru_cache(depends_on=[CacheDependency.Txids, CacheDependency.Addresses])
     def get_all_txos_dict(self, include_not_mine=False) -> Dict[str, PythonUtxo]:
         "Returns {str(outpoint) : python_utxo}"
         dict_fulltxdetail = self.get_dict_fulltxdetail()
-        my_addresses = self.get_addresses()
+        my_addresses = set(self.get_addresses())
 
         txos: Dict[str, PythonUtxo] = {}
         for fulltxdetail in dict_fulltxdetail.values():
@@ -1288,7 +1707,6 @@ class Wallet(BaseSaveableClass, CacheManager):
             if not txo.is_spent_by_txid
         ]
 
-    @instance_lru_cache()
     def address_is_used(self, address: str) -> bool:
         """Check if any tx had this address as an output."""
         return bool(self.get_involved_txids(address))
@@ -1322,18 +1740,31 @@ class Wallet(BaseSaveableClass, CacheManager):
         return self.get_input_and_output_txo_dict(txid)[TxoType.InputTxo]
 
     def get_categories_for_txid(self, txid: str) -> List[str]:
-        input_and_output_txo_dict = self.get_input_and_output_txo_dict(txid)
-        python_txos = sum(input_and_output_txo_dict.values(), [])
-        if not python_txos:
+        """The categories of the input and output addresses.
+
+        The result is stored in fulltxdetail_index.txid_to_categories,
+        which is invalidated only if the tx set or the category of an
+        involved address changes.
+        """
+        fulltxdetail = self.get_dict_fulltxdetail().get(txid)
+        if not fulltxdetail:
             return []
 
-        categories: List[str] = np.unique(
-            clean_list([self.labels.get_category_raw(python_utxo.address) for python_utxo in python_txos])
-        ).tolist()  # type: ignore
+        categories = self.fulltxdetail_index.txid_to_categories.get(txid)
+        if categories is None:
+            addresses = {python_utxo.address for python_utxo in fulltxdetail.outputs.values()}
+            addresses.update(
+                python_utxo.address for python_utxo in fulltxdetail.inputs.values() if python_utxo
+            )
+            if not addresses:
+                return []
+            categories = sorted(
+                {category for address in addresses if (category := self.labels.get_category_raw(address))}
+            )
+            self.fulltxdetail_index.txid_to_categories[txid] = categories
 
-        if not categories:
-            categories = [self.labels.get_default_category()]
-        return categories
+        # the default category can change, so it is not stored
+        return list(categories) if categories else [self.labels.get_default_category()]
 
     def get_label_for_address(self, address: str, autofill_from_txs=True, verbose_label=False) -> str:
         stored_label = self.labels.get_label(address, "")
@@ -1412,43 +1843,46 @@ class Wallet(BaseSaveableClass, CacheManager):
                 logger.error(f"Could not fetch self.blockchain.get_height()")
         return self._blockchain_height
 
-    @instance_lru_cache()
+    @instance_lru_cache(depends_on=[CacheDependency.ChainHeight])
     def get_height(self) -> int:
         return self.get_height_no_cache()
 
     def opportunistic_coin_select(
-        self, utxos: List[PythonUtxo], total_sent_value: int, opportunistic_merge_utxos: bool
+        self,
+        utxos: List[PythonUtxo],
+        total_sent_value: int,
+        opportunistic_merge_utxos: bool,
+        fee_rate: float = MIN_RELAY_FEE,
+        recipient_script_lengths: Optional[List[int]] = None,
     ) -> UtxosForInputs:
-        def utxo_value(utxo: PythonUtxo) -> int:
-            return utxo.txout.value
-
-        def is_outpoint_in_list(outpoint, utxos) -> bool:
-            outpoint = OutPoint.from_bdk(outpoint)
-            for utxo in utxos:
-                if outpoint == OutPoint.from_bdk(utxo.outpoint):
-                    return True
-            return False
-
-        # 1. select random utxos until >= total_sent_value
-        utxos = list(utxos).copy()
-        random.shuffle(utxos)
-        selected_utxos = []
-        selected_value = 0
+        utxos = list(utxos)
+        if recipient_script_lengths is None:
+            # assume 1 p2wpkh recipient
+            recipient_script_lengths = [22]
+        # the change output has the same script type as the wallet utxos
+        change_script_length = len(utxos[0].txout.script_pubkey.to_bytes()) if utxos else 22
+
+        # 1. select utxos (changeless if possible) until >= total_sent_value + fees
+        coin_selector = CoinSelector(
+            [utxo.txout.value for utxo in utxos],
+            input_mn_tuple=self.get_mn_tuple(),
+            recipient_weight=sum(output_weight(length) for length in recipient_script_lengths),
+            change_weight=output_weight(change_script_length),
+            fee_rate=fee_rate,
+        )
+        selected_indices = coin_selector.select(total_sent_value)
+        selected_utxos = [utxos[i] for i in selected_indices]
+        selected_value = int(coin_selector.values[selected_indices].sum())
         opportunistic_merging_utxos = []
-        for utxo in utxos:
-            selected_value += utxo.txout.value
-            selected_utxos.append(utxo)
-            if selected_value >= total_sent_value:
-                break
         logger.debug(
             f"Selected {len(selected_utxos)} outpoints with {Satoshis(selected_value, self.network).str_with_unit()}"
         )
 
         # 2. opportunistically  add additional outputs for merging
         if opportunistic_merge_utxos:
-            non_selected_utxos = [
-                utxo for utxo in utxos if not is_outpoint_in_list(utxo.outpoint, selected_utxos)
-            ]
+            is_selected = np.zeros(len(utxos), dtype=bool)
+            is_selected[selected_indices] = True
+            non_selected_indices = np.flatnonzero(~is_selected)
 
             # never choose more than half of all remaining outputs
             # on average this exponentially merges the utxos
@@ -1456,19 +1890,20 @@ class Wallet(BaseSaveableClass, CacheManager):
             number_of_opportunistic_outpoints = min(
                 200,
                 (
-                    np.random.randint(0, len(non_selected_utxos) // 2)
-                    if len(non_selected_utxos) // 2 > 0
+                    np.random.randint(0, len(non_selected_indices) // 2)
+                    if len(non_selected_indices) // 2 > 0
                     else 0
                 ),
             )
 
             # here we choose the smalles utxos first
             # Alternatively one could also choose them from the random order
-            opportunistic_merging_utxos = sorted(non_selected_utxos, key=utxo_value)[
-                :number_of_opportunistic_outpoints
-            ]
+            smallest_indices = non_selected_indices[
+                np.argsort(coin_selector.values[non_selected_indices], kind="stable")
+            ][:number_of_opportunistic_outpoints]
+            opportunistic_merging_utxos = [utxos[i] for i in smallest_indices]
             logger.debug(
-                f"Selected {len(opportunistic_merging_utxos)} additional opportunistic outpoints with small values (so total ={len(selected_utxos)+len(opportunistic_merging_utxos)}) with {Satoshis(sum([utxo.txout.value for utxo in opportunistic_merging_utxos]), self.network).str_with_unit()}"
+                f"Selected {len(opportunistic_merging_utxos)} additional opportunistic outpoints with small values (so total ={len(selected_utxos)+len(opportunistic_merging_utxos)}) with {Satoshis(int(coin_selector.values[smallest_indices].sum()), self.network).str_with_unit()}"
             )
 
         # now shuffle again the final utxos
@@ -1502,13 +1937,18 @@ class Wallet(BaseSaveableClass, CacheManager):
                 utxos=utxos_for_input.utxos,
                 total_sent_value=total_sent_value,
                 opportunistic_merge_utxos=txinfos.opportunistic_merge_utxos,
+                fee_rate=txinfos.fee_rate if txinfos.fee_rate is not None else MIN_RELAY_FEE,
+                recipient_script_lengths=[
+                    len(bdk.Address(recipient.address, network=self.network).script_pubkey().to_bytes())
+                    for recipient in txinfos.recipients
+                ],
             )
         else:
             # otherwise let the bdk wallet decide on the minimal coins to be spent, out of the utxos
             return UtxosForInputs(utxos=utxos_for_input.utxos, spend_all_utxos=False)
 
     def is_my_address(self, address: str) -> bool:
-        return address in self.get_addresses()
+        return bool(self.get_address_info_min(address))
 
     def determine_recipient_category(self, utxos: Iterable[PythonUtxo]) -> str:
         "Returns the first category it can determine from the addreses or txids"
@@ -1611,7 +2051,7 @@ class Wallet(BaseSaveableClass, CacheManager):
 
         # inputs: List[bdk.TxIn] = builder_result.psbt.extract_tx().input()
 
-        logger.info(json.loads(builder_result.psbt.json_serialize()))
+        logger.info(f"{self.id} created psbt {builder_result.psbt.txid()}")
         fee_rate = builder_result.psbt.fee_rate()
         if fee_rate is not None:
             logger.info(f"psbt fee after finalized {fee_rate.as_sat_per_vb()}")
@@ -1687,6 +2127,13 @@ class Wallet(BaseSaveableClass, CacheManager):
         address)"""
         self.clear_method(self._get_addresses)
         logger.debug(f"{self.__class__.__name__} update_with_filter {update_filter}")
+        # the chain data caches were already refreshed by refresh_caches() before this signal
+        if update_filter.reason not in [
+            UpdateFilterReason.TransactionChange,
+            UpdateFilterReason.ForceRefresh,
+            UpdateFilterReason.ChainHeightAdvanced,
+        ]:
+            self.invalidate_cache(update_filter)
 
         not_indexed_addresses = set(update_filter.addresses) - set(self.get_addresses())
         for not_indexed_address in not_indexed_addresses:
@@ -1725,73 +2172,11 @@ class Wallet(BaseSaveableClass, CacheManager):
                     conflicting_python_utxos.append(python_utxo)
         return conflicting_python_utxos
 
-    @instance_lru_cache()
+    @instance_lru_cache(depends_on=[CacheDependency.Txids])
     def sorted_delta_list_transactions(self, access_marker=None) -> List[bdk.TransactionDetails]:
         "Returns a List of TransactionDetails, sorted from old to new"
-
-        def check_relation(child: FullTxDetail, parent: FullTxDetail) -> bool:
-            visited = set()
-            stack = [child]
-
-            while stack:
-                current = stack.pop()
-
-                if current.txid == parent.txid:
-                    return True
-
-                if current.txid in visited:
-                    continue
-                visited.add(current.txid)
-
-                # the following loop puts all acenstors on the stack
-                # and the while loop will check if any of them matches the parent
-                for child_inp in current.inputs.values():
-                    if not child_inp:
-                        continue
-                    child_parent_txid = child_inp.outpoint.txid
-                    this_parent = dict_fulltxdetail.get(child_parent_txid)
-                    if this_parent:
-                        stack.append(this_parent)
-
-            return False
-
-        def compare_items(item1: FullTxDetail, item2: FullTxDetail) -> int:
-            future_height = 1e9  # that is far in the future
-
-            c1 = item1.tx.confirmation_time.height if item1.tx.confirmation_time else future_height
-            c2 = item2.tx.confirmation_time.height if item2.tx.confirmation_time else future_height
-
-            if c1 != c2:
-                # unequal
-                if c1 < c2:
-                    return -1
-                elif c1 > c2:
-                    return 1
-            else:
-                # equal height
-
-                # now check item1 is a (distant) child of item2
-                child = item1
-                parent = item2
-                if check_relation(child, parent):
-                    # sort this just as if the child had a larger confirmation_time.height
-                    return 1
-                # now check item2 is a (distant) child of item1
-                child = item2
-                parent = item1
-                if check_relation(child, parent):
-                    return -1
-
-            # cannot be decided
-            return 0
-
         dict_fulltxdetail = self.get_dict_fulltxdetail()
-
-        sorted_fulltxdetail = sorted(
-            dict_fulltxdetail.values(),
-            key=functools.cmp_to_key(compare_items),
-        )
-        return [fulltxdetail.tx for fulltxdetail in sorted_fulltxdetail]
+        return [dict_fulltxdetail[txid].tx for txid in self.tx_order.update(dict_fulltxdetail)]
 
     def is_in_mempool(self, txid: str) -> bool:
         # TODO: Currently in mempool and is in wallet is the same thing.
@@ -1817,6 +2202,11 @@ class Wallet(BaseSaveableClass, CacheManager):
 
         return result
 
+    def get_fee_stats(self) -> FeeStats:
+        "Fee statistics of all transactions (updated incrementally)"
+        self.fee_stats.update(self.sorted_delta_list_transactions())
+        return self.fee_stats
+
     def get_ema_fee_rate(self, n: int = 10, default=MIN_RELAY_FEE) -> float:
         """
         Calculate Exponential Moving Average (EMA) of the fee_rate of all transactions.
@@ -1824,22 +2214,8 @@ class Wallet(BaseSaveableClass, CacheManager):
         It weights the outgoing transactions heavier than the incoming transactions,
         because Exchanges typically overpay fees.
         """
-        all_txs = self.sorted_delta_list_transactions()
-        weight_sent = 10
-        weight_incoming = 1
-        all_weights = [(weight_sent if tx.sent else weight_incoming) for tx in all_txs]
-
-        fee_rates: List[float] = []
-        weights: List[float] = []
-        for weight, txdetail in zip(all_weights, all_txs):
-            if fee_info := FeeInfo.from_txdetails(txdetail):
-                fee_rates.append(fee_info.fee_rate())
-                weights.append(weight)
-
-        if not fee_rates:
-            return default
-
-        return calculate_ema(fee_rates, n=n, weights=weights)
+        ema = self.get_fee_stats().ema_fee_rate(n=n)
+        return default if ema is None else ema
 
 
 ###########
@@ -1855,8 +2231,15 @@ def get_wallet(wallet_id: str, signals: Signals) -> Optional[Wallet]:
 
 
 def get_wallet_of_address(address: str, signals: Signals) -> Optional[Wallet]:
-    for wallet in get_wallets(signals):
-        if wallet.is_my_address(address):
+    wallets = {wallet.id: wallet for wallet in get_wallets(signals)}
+    for wallet in wallets.values():
+        # indexes the addresses up to the tip (cached)
+        wallet.get_addresses()
+
+    for wallet_id, keychain, index in address_index.lookup(address):
+        wallet = wallets.get(wallet_id)
+        # the address_index also contains the look-ahead addresses
+        if wallet and index <= wallet.tips[int(keychain == bdk.KeychainKind.INTERNAL)]:
             return wallet
     return None
 
@@ -1912,21 +2295,17 @@ def get_label_from_any_wallet(
 class ToolsTxUiInfo:
     @staticmethod
     def fill_txo_dict_from_outpoints(
-        txuiinfos: TxUiInfos, outpoints: List[OutPoint], wallets: List[Wallet]
+        txuiinfos: TxUiInfos, outpoints: List[OutPoint], txo_registry: TxoRegistry
     ) -> None:
         "Will include the txo even if it is spent already  (useful for rbf)"
-
-        outpoint_dict = {
-            outpoint_str: (python_utxo, wallet)
-            for wallet in wallets
-            for outpoint_str, python_utxo in wallet.get_all_txos_dict().items()
-        }
+        txo_registry.sync()
         for outpoint in outpoints:
-            if not str(outpoint) in outpoint_dict:
+            result = txo_registry.get(outpoint, sync=False)
+            if not result:
                 logger.warning(f"no python_utxo found for outpoint {outpoint} ")
                 continue
-            python_utxo, wallet = outpoint_dict[str(outpoint)]
-            txuiinfos.main_wallet_id = wallet.id
+            python_utxo, wallet_id = result
+            txuiinfos.main_wallet_id = wallet_id
             txuiinfos.utxo_dict[outpoint] = python_utxo
 
     @staticmethod
@@ -1978,14 +2357,14 @@ class ToolsTxUiInfo:
         tx: bdk.Transaction,
         fee_info: Optional[FeeInfo],
         network: bdk.Network,
-        wallets: List[Wallet],
+        txo_registry: TxoRegistry,
     ) -> TxUiInfos:
 
         outpoints = [OutPoint.from_bdk(inp.previous_output) for inp in tx.input()]
 
         txinfos = TxUiInfos()
         # inputs
-        ToolsTxUiInfo.fill_txo_dict_from_outpoints(txinfos, outpoints, wallets=wallets)
+        ToolsTxUiInfo.fill_txo_dict_from_outpoints(txinfos, outpoints, txo_registry=txo_registry)
         txinfos.spend_all_utxos = True
         # outputs
         checked_max_amount = len(tx.output()) == 1  # if there is only 1 recipient, there is no change address
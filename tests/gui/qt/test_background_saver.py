@@ -0,0 +1,94 @@
+#
+# Bitcoin Safe
+# Copyright (C) 2024 Andreas Griffin
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of version 3 of the GNU General Public License as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see https://www.gnu.org/licenses/gpl-3.0.html
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS
+# BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN
+# ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+# CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+import threading
+from typing import Dict, List
+
+from pytestqt.qtbot import QtBot
+
+from bitcoin_safe.gui.qt.background_saver import BackgroundSaver
+
+
+def test_background_saver_debounces(qtbot: QtBot) -> None:
+    state = {"value": 0}
+    written: List[int] = []
+    write_threads: List[threading.Thread] = []
+
+    def write(snapshot: Dict) -> None:
+        write_threads.append(threading.current_thread())
+        written.append(snapshot["value"])
+
+    saver = BackgroundSaver(get_snapshot=lambda: dict(state), write=write, debounce_ms=50)
+    durations: List[float] = []
+    saver.signal_saved.connect(durations.append)
+
+    for i in range(10):
+        state["value"] = i
+        saver.request_save()
+    assert saver.has_pending_save()
+
+    qtbot.waitUntil(lambda: bool(durations), timeout=5000)
+    assert written == [9]
+    assert write_threads[0] is not threading.main_thread()
+    assert saver.last_save_duration is not None and saver.last_save_duration >= 0
+    assert not saver.has_pending_save()
+
+    # close writes a pending save in the main thread
+    state["value"] = 10
+    saver.request_save()
+    saver.close()
+    assert written == [9, 10]
+    assert write_threads[-1] is threading.main_thread()
+
+
+def test_background_saver_never_writes_older_snapshot(qtbot: QtBot) -> None:
+    state = {"value": 0}
+    written: List[int] = []
+    release = threading.Event()
+
+    def write(snapshot: Dict) -> None:
+        if threading.current_thread() is not threading.main_thread():
+            release.wait(5)
+        written.append(snapshot["value"])
+
+    saver = BackgroundSaver(get_snapshot=lambda: dict(state), write=write)
+    saver.save_in_background()
+    # requested while the 1. save is running
+    state["value"] = 1
+    saver.save_in_background()
+    assert saver.has_pending_save()
+
+    state["value"] = 2
+    threading.Timer(0.2, release.set).start()
+    saver.save_now()
+    qtbot.waitUntil(lambda: not saver._running and not saver.has_pending_save(), timeout=5000)
+    saver.close()
+
+    assert written[-1] == 2
+    assert written == sorted(written)
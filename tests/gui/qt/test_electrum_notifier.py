@@ -0,0 +1,134 @@
+#
+# Bitcoin Safe
+# Copyright (C) 2024 Andreas Griffin
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of version 3 of the GNU General Public License as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see https://www.gnu.org/licenses/gpl-3.0.html
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS
+# BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN
+# ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+# CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+import json
+import socket
+import threading
+from typing import Any, Dict, List
+
+import bdkpython as bdk
+from pytestqt.qtbot import QtBot
+
+from bitcoin_safe.electrum_notifier import ElectrumNotifier, address_to_scripthash
+from bitcoin_safe.network_config import NetworkConfig
+
+
+class FakeElectrumServer:
+    "Answers the subscriptions of 1 client and can push notifications to it"
+
+    def __init__(self) -> None:
+        self.server = socket.create_server(("127.0.0.1", 0))
+        self.port = self.server.getsockname()[1]
+        self.statuses: Dict[str, Any] = {}
+        self.subscribed: List[str] = []
+        self.conn: socket.socket | None = None
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def send(self, message: Dict[str, Any]) -> None:
+        assert self.conn
+        self.conn.sendall((json.dumps(message) + "\n").encode())
+
+    def notify(self, method: str, params: List[Any]) -> None:
+        self.send({"jsonrpc": "2.0", "method": method, "params": params})
+
+    def run(self) -> None:
+        self.conn, _ = self.server.accept()
+        buffer = b""
+        while True:
+            data = self.conn.recv(65536)
+            if not data:
+                return
+            buffer += data
+            *lines, buffer = buffer.split(b"\n")
+            for line in lines:
+                request = json.loads(line)
+                result: Any = None
+                if request["method"] == "server.version":
+                    result = ["FakeElectrum", "1.4"]
+                elif request["method"] == "blockchain.headers.subscribe":
+                    result = {"height": 100, "hex": "00"}
+                elif request["method"] == "blockchain.scripthash.subscribe":
+                    scripthash = request["params"][0]
+                    self.subscribed.append(scripthash)
+                    result = self.statuses.get(scripthash)
+                self.send({"jsonrpc": "2.0", "id": request["id"], "result": result})
+
+    def close(self) -> None:
+        if self.conn:
+            self.conn.shutdown(socket.SHUT_RDWR)
+            self.conn.close()
+        self.server.close()
+
+
+def test_address_to_scripthash() -> None:
+    # example from the electrum protocol documentation
+    assert (
+        address_to_scripthash("1A1zP1eP5QGefi2DMPTfTL5SLmv7DivfNa", bdk.Network.BITCOIN)
+        == "8b01df4e368ea28f8dc0423bcf7a4923e3a12d307c875e47a0cfbf90b5c39161"
+    )
+
+
+def test_electrum_notifier(qtbot: QtBot) -> None:
+    server = FakeElectrumServer()
+    network_config = NetworkConfig(network=bdk.Network.REGTEST)
+    network_config.electrum_url = f"127.0.0.1:{server.port}"
+    network_config.electrum_use_ssl = False
+
+    address = "bcrt1q3y9dezdy48czsck42q5udzmlcyjlppel5eg92k"
+    scripthash = address_to_scripthash(address, bdk.Network.REGTEST)
+
+    notifier = ElectrumNotifier(network_config)
+    notifier.watch_addresses("wallet_a", [address])
+    with qtbot.waitSignal(notifier.signal_active_changed, timeout=5000) as blocker:
+        notifier.start()
+    assert blocker.args == [True]
+    qtbot.waitUntil(lambda: scripthash in server.subscribed, timeout=5000)
+
+    with qtbot.waitSignal(notifier.signal_new_block, timeout=5000) as blocker:
+        server.notify("blockchain.headers.subscribe", [{"height": 101, "hex": "00"}])
+    assert blocker.args == [101]
+
+    with qtbot.waitSignal(notifier.signal_wallet_changed, timeout=5000) as blocker:
+        server.notify("blockchain.scripthash.subscribe", [scripthash, "new_status"])
+    assert blocker.args == ["wallet_a"]
+
+    # a 2nd wallet with the same address doesn't subscribe again
+    notifier.watch_addresses("wallet_b", [address])
+    notifier.unwatch_wallet("wallet_a")
+    with qtbot.waitSignal(notifier.signal_wallet_changed, timeout=5000) as blocker:
+        server.notify("blockchain.scripthash.subscribe", [scripthash, "newer_status"])
+    assert blocker.args == ["wallet_b"]
+    assert server.subscribed == [scripthash]
+
+    # the wallets fall back to polling, if the connection is lost
+    with qtbot.waitSignal(notifier.signal_active_changed, timeout=5000) as blocker:
+        server.close()
+    assert blocker.args == [False]
+    notifier.stop()
@@ -0,0 +1,135 @@
+#
+# Bitcoin Safe
+# Copyright (C) 2024 Andreas Griffin
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of version 3 of the GNU General Public License as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see https://www.gnu.org/licenses/gpl-3.0.html
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS
+# BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN
+# ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+# CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+import logging
+from types import SimpleNamespace
+from typing import Dict, List
+
+import bdkpython as bdk
+from pytestqt.qtbot import QtBot
+
+from bitcoin_safe.config import UserConfig
+from bitcoin_safe.gui.qt.hist_list import HistList
+from bitcoin_safe.gui.qt.my_treeview import MyItemDataRole
+from bitcoin_safe.signals import Signals, UpdateFilter, UpdateFilterReason
+
+from ...test_helpers import test_config  # type: ignore
+from ...test_tx_util import p2wpkh_script, synthetic_tx_details
+
+logger = logging.getLogger(__name__)
+
+external_txid = "aa" * 32
+
+
+class FakeWallet:
+    "Provides only what HistList needs"
+
+    def __init__(self, txs: List[bdk.TransactionDetails]) -> None:
+        self.id = "fake wallet"
+        self.network = bdk.Network.REGTEST
+        self.txs = txs
+        self.labels = SimpleNamespace(get_default_category=lambda: "Default")
+
+    def sorted_delta_list_transactions(self) -> List[bdk.TransactionDetails]:
+        return self.txs
+
+    def get_tx(self, txid: str) -> bdk.TransactionDetails | None:
+        return {tx.txid: tx for tx in self.txs}.get(txid)
+
+    def get_height(self) -> int:
+        return 1000
+
+    def is_in_mempool(self, txid: str) -> bool:
+        return True
+
+    def get_dict_fulltxdetail(self) -> Dict:
+        return {}
+
+    def get_label_for_txid(self, txid: str) -> str:
+        return f"label {txid[:4]}"
+
+    def get_categories_for_txid(self, txid: str) -> List[str]:
+        return []
+
+
+def tx(i: int, received: int, height: int | None = None) -> bdk.TransactionDetails:
+    return synthetic_tx_details(
+        [(external_txid, i)], [(received, p2wpkh_script(i))], height=height, received=received
+    )
+
+
+def shown_balances(hist_list: HistList) -> Dict[str, int]:
+    model = hist_list.sourceModel()
+    return {
+        model.data(model.index(row, HistList.Columns.TXID), MyItemDataRole.ROLE_KEY): model.data(
+            model.index(row, HistList.Columns.BALANCE), MyItemDataRole.ROLE_CLIPBOARD_DATA
+        )
+        for row in range(model.rowCount())
+    }
+
+
+def test_reconcile_content(qtbot: QtBot, test_config: UserConfig):
+    a, b, c = tx(1, 1000, height=100), tx(2, 500), tx(3, 200, height=101)
+    wallet = FakeWallet([a, b])
+    signals = Signals()
+    signals.get_wallets.connect(lambda: wallet)
+
+    hist_list = HistList(
+        fx=None,
+        config=test_config,
+        signals=signals,
+        mempool_data=SimpleNamespace(fee_rate_to_projected_block_index=lambda fee_rate: 0),
+        wallet_id=wallet.id,
+    )
+    qtbot.addWidget(hist_list)
+    hist_list.show()
+    hist_list.update_content()
+    assert shown_balances(hist_list) == {a.txid: 1000, b.txid: 1500}
+    item_of_a = hist_list.sourceModel().item(hist_list.find_row_by_key(a.txid) or 0, HistList.Columns.LABEL)
+
+    # c is confirmed before the unconfirmed b
+    wallet.txs = [a, c, b]
+    signals.wallet_signals[wallet.id].updated.emit(
+        UpdateFilter(refresh_all=True, reason=UpdateFilterReason.TransactionChange)
+    )
+    assert shown_balances(hist_list) == {a.txid: 1000, c.txid: 1200, b.txid: 1700}
+    assert hist_list.balance == 1700
+    # the row of a was not recreated
+    assert (
+        hist_list.sourceModel().item(hist_list.find_row_by_key(a.txid) or 0, HistList.Columns.LABEL)
+        is item_of_a
+    )
+    assert hist_list.get_text_from_coordinate(0, HistList.Columns.LABEL).startswith("label")
+
+    wallet.txs = [a, b]
+    signals.wallet_signals[wallet.id].updated.emit(
+        UpdateFilter(refresh_all=True, reason=UpdateFilterReason.TransactionChange)
+    )
+    assert shown_balances(hist_list) == {a.txid: 1000, b.txid: 1500}
+    assert hist_list.find_row_by_key(c.txid) is None
@@ -0,0 +1,147 @@
+#
+# Bitcoin Safe
+# Copyright (C) 2024 Andreas Griffin
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of version 3 of the GNU General Public License as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see https://www.gnu.org/licenses/gpl-3.0.html
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS
+# BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN
+# ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+# CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+import enum
+import logging
+from time import time
+from typing import List
+
+from PyQt6.QtCore import Qt
+from PyQt6.QtGui import QStandardItem
+from pytestqt.qtbot import QtBot
+
+from bitcoin_safe.config import UserConfig
+from bitcoin_safe.gui.qt.my_treeview import (
+    MyItemDataRole,
+    MySortModel,
+    MyStandardItemModel,
+    MyTreeView,
+)
+from bitcoin_safe.signals import Signals, UpdateFilter
+
+from ...test_helpers import test_config  # type: ignore
+
+logger = logging.getLogger(__name__)
+
+
+class LazyList(MyTreeView):
+    class Columns(MyTreeView.BaseColumnsEnum):
+        KEY = enum.auto()
+        LABEL = enum.auto()
+
+    filter_columns = [Columns.KEY, Columns.LABEL]
+    lazy_columns = {Columns.LABEL}
+
+    def __init__(self, config: UserConfig, signals: Signals) -> None:
+        super().__init__(config=config, signals=signals)
+        self.refreshed_keys: List[str] = []
+        self._source_model = MyStandardItemModel(self)
+        self.proxy = MySortModel(
+            self, source_model=self._source_model, sort_role=MyItemDataRole.ROLE_SORT_ORDER
+        )
+        self.setModel(self.proxy)
+
+    def fill(self, n: int) -> None:
+        self._before_update_content()
+        self._source_model.clear()
+        self.update_headers(["Key", "Label"])
+        for i in range(n):
+            items = [QStandardItem(f"key {i}"), QStandardItem("")]
+            items[self.key_column].setData(f"key {i}", MyItemDataRole.ROLE_KEY)
+            items[self.Columns.KEY].setData(i, MyItemDataRole.ROLE_SORT_ORDER)
+            self.append_row(items)
+        self._after_update_content()
+
+    def refresh_row(self, key: str, row: int) -> None:
+        self.refreshed_keys.append(key)
+        self._source_model.set_row_index(
+            key,
+            addresses=[f"address of {key}"],
+            categories=["even" if key.endswith(("0", "2", "4", "6", "8")) else "odd"],
+        )
+        item = self._source_model.item(row, self.Columns.LABEL)
+        if item:
+            item.setText(f"label of {key}")
+
+
+def test_rows_are_refreshed_lazily(qtbot: QtBot, test_config: UserConfig):
+    tree = LazyList(config=test_config, signals=Signals())
+    qtbot.addWidget(tree)
+    tree.resize(400, 300)
+    tree.show()
+
+    n = 20_000
+    start_time = time()
+    tree.fill(n)
+    qtbot.wait(50)
+    logger.info(f"Filling and showing {n} rows took {time()-start_time}s")
+
+    # only the visible rows were formatted
+    assert 0 < len(tree.refreshed_keys) < 100
+
+    # accessing a row formats it exactly once
+    proxy = tree.model()
+    idx = proxy.index(n - 1, LazyList.Columns.LABEL)
+    key = proxy.data(idx.siblingAtColumn(tree.key_column), MyItemDataRole.ROLE_KEY)
+    assert proxy.data(idx) == f"label of {key}"
+    assert tree.get_text_from_coordinate(n - 1, LazyList.Columns.LABEL) == f"label of {key}"
+    assert tree.refreshed_keys.count(key) == 1
+
+    # sorting by a lazy column formats all rows
+    tree.sortByColumn(LazyList.Columns.LABEL, Qt.SortOrder.AscendingOrder)
+    assert len(set(tree.refreshed_keys)) == n
+    assert proxy.data(proxy.index(0, LazyList.Columns.LABEL)) == "label of key 0"
+    assert len(tree.refreshed_keys) == n
+
+
+def test_row_index(qtbot: QtBot, test_config: UserConfig):
+    tree = LazyList(config=test_config, signals=Signals())
+    qtbot.addWidget(tree)
+    tree.fill(10)
+    model = tree.sourceModel()
+    assert [tree.find_row_by_key(f"key {i}") for i in range(10)] == list(range(10))
+
+    # removing a row shifts the following rows
+    tree.delete_item("key 3")
+    assert tree.find_row_by_key("key 3") is None
+    assert tree.find_row_by_key("key 4") == 3
+    tree.fill(0)
+    assert tree.find_row_by_key("key 4") is None
+    tree.fill(10)
+
+    # rows that were never accessed are not refreshed by an UpdateFilter
+    assert tree.rows_to_refresh(UpdateFilter(txids=["key 1"]), keys=["key 1"]) == {}
+
+    for row in range(model.rowCount()):
+        model.ensure_row_refreshed(row)
+    assert tree.rows_to_refresh(UpdateFilter(addresses=["address of key 1"])) == {"key 1": 1}
+    assert tree.rows_to_refresh(UpdateFilter(categories=["odd"])) == {
+        f"key {i}": i for i in range(10) if i % 2
+    }
+    assert tree.rows_to_refresh(UpdateFilter(), keys=["key 2", "unknown"]) == {"key 2": 2}
@@ -0,0 +1,51 @@
+#
+# Bitcoin Safe
+# Copyright (C) 2024 Andreas Griffin
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of version 3 of the GNU General Public License as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see https://www.gnu.org/licenses/gpl-3.0.html
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS
+# BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN
+# ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+# CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+import bdkpython as bdk
+from pytestqt.qtbot import QtBot
+
+from bitcoin_safe.gui.qt.network_settings.main import NetworkSettingsUI
+from bitcoin_safe.network_config import NetworkConfigs
+
+
+def test_network_settings_roundtrip(qtbot: QtBot) -> None:
+    network_configs = NetworkConfigs()
+    network_config = network_configs.configs[bdk.Network.REGTEST.name]
+    network_config.esplora_concurrency = 8
+    network_config.electrum_retry = 3
+
+    network_settings = NetworkSettingsUI(bdk.Network.REGTEST, network_configs, signals=None)
+    qtbot.addWidget(network_settings)
+
+    from_ui = network_settings.get_network_settings_from_ui()
+    assert from_ui.esplora_concurrency == 8
+    assert from_ui.electrum_retry == 3
+    # automatic
+    assert from_ui.timeout is None
+    assert vars(from_ui) == vars(network_config)
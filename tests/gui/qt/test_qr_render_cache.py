@@ -0,0 +1,97 @@
+#
+# Bitcoin Safe
+# Copyright (C) 2024 Andreas Griffin
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of version 3 of the GNU General Public License as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see https://www.gnu.org/licenses/gpl-3.0.html
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS
+# BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN
+# ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+# CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+from typing import List, Optional
+
+from bitcoin_safe.gui.qt.qr_render_cache import QrRenderCache
+
+
+class Owner:
+    "Stands in for a widget showing a qr code"
+
+
+def test_qr_render_cache_reuses_fragments_and_images() -> None:
+    cache = QrRenderCache(max_workers=2)
+    owner = Owner()
+    generated: List[str] = []
+
+    def generate_fragments() -> List[str]:
+        generated.append("called")
+        return [f"fragment {i}" for i in range(10)]
+
+    first_images: List[Optional[str]] = []
+    cache.set_active(owner, ("hash", "bbqr"))
+    assert cache.get_images(("hash", "bbqr")) is None
+    images = cache.render(("hash", "bbqr"), generate_fragments, on_first_image=first_images.append)
+
+    assert len(images) == 10
+    assert all(images)
+    assert first_images == images[:1]
+
+    # switching back to the same qr type is a cache hit
+    assert cache.get_images(("hash", "bbqr")) == images
+    assert cache.render(("hash", "bbqr"), generate_fragments) == images
+    assert len(generated) == 1
+
+
+def test_qr_render_cache_evicts_images_of_inactive_owners() -> None:
+    cache = QrRenderCache(max_entries=2, max_image_size=0)
+    active_owner = Owner()
+    inactive_owner = Owner()
+
+    cache.set_active(inactive_owner, "inactive")
+    cache.render("inactive", lambda: ["a", "b"])
+    cache.set_active(inactive_owner, None)
+
+    cache.set_active(active_owner, "active")
+    cache.render("active", lambda: ["c", "d"])
+
+    # the images of the shown qr code are kept, even above max_image_size
+    assert cache.get_images("active") is not None
+    assert cache.get_images("inactive") is None
+    generated: List[str] = []
+    # the fragments are kept
+    cache.render("inactive", lambda: generated + ["never called"])
+    assert not generated
+
+    # only max_entries are kept
+    cache.render("other", lambda: ["e"])
+    assert cache.get_images("active") is not None
+    assert len(cache._entries) == 2
+
+
+def test_qr_render_cache_forgets_deleted_owners() -> None:
+    cache = QrRenderCache(max_image_size=0)
+    owner = Owner()
+    cache.set_active(owner, "key")
+    cache.render("key", lambda: ["a"])
+    assert cache.is_active(owner, "key")
+
+    del owner
+    cache.render("other", lambda: ["b"])
+    assert cache.get_images("key") is None
@@ -0,0 +1,135 @@
+#
+# Bitcoin Safe
+# Copyright (C) 2024 Andreas Griffin
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of version 3 of the GNU General Public License as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see https://www.gnu.org/licenses/gpl-3.0.html
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS
+# BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN
+# ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+# CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+from typing import List
+
+import bdkpython as bdk
+from PyQt6.QtCore import QObject, pyqtSignal
+from pytestqt.qtbot import QtBot
+
+from bitcoin_safe.config import UserConfig
+from bitcoin_safe.gui.qt.qt_wallet_base import SyncStatus
+from bitcoin_safe.gui.qt.sync_scheduler import SyncPriority, SyncScheduler
+from bitcoin_safe.pythonbdk_types import BlockchainType
+
+
+class FakeQTWallet(QObject):
+    "Provides only what SyncScheduler needs"
+
+    signal_on_change_sync_status = pyqtSignal(SyncStatus)
+
+    class _Wallet:
+        def __init__(self, id: str) -> None:
+            self.id = id
+
+    def __init__(self, id: str, config: UserConfig, started: List[str]) -> None:
+        super().__init__()
+        self.wallet = self._Wallet(id)
+        self.config = config
+        self.sync_status = SyncStatus.unknown
+        self.started = started
+
+    def set_sync_status(self, new: SyncStatus) -> None:
+        self.sync_status = new
+        self.signal_on_change_sync_status.emit(new)
+
+    def sync(self) -> None:
+        self.started.append(self.wallet.id)
+        self.set_sync_status(SyncStatus.syncing)
+
+
+def make_config(electrum_url: str) -> UserConfig:
+    config = UserConfig()
+    config.network = bdk.Network.REGTEST
+    config.network_config.server_type = BlockchainType.Electrum
+    config.network_config.electrum_url = electrum_url
+    return config
+
+
+def test_sync_scheduler(qtbot: QtBot) -> None:
+    started: List[str] = []
+    visible = {"wallet_id": "c"}
+    scheduler = SyncScheduler(
+        get_visible_wallet_id=lambda: visible["wallet_id"], max_workers=2, max_per_server=1, backoff_base=60
+    )
+    config_a = make_config("server_a:50001")
+    config_b = make_config("server_b:50001")
+    wallets = {
+        "a": FakeQTWallet("a", config_a, started),
+        "b": FakeQTWallet("b", config_a, started),
+        "c": FakeQTWallet("c", config_a, started),
+        "d": FakeQTWallet("d", config_b, started),
+    }
+    for qt_wallet in wallets.values():
+        scheduler.add_qt_wallet(qt_wallet)
+
+    # fill the only slot of server_a, so that the order of the others is decided by priority
+    scheduler.request_sync("a", SyncPriority.regular)
+    assert started == ["a"]
+    scheduler.request_sync("b", SyncPriority.regular)
+    scheduler.request_sync("c", SyncPriority.regular)
+    scheduler.request_sync("d", SyncPriority.regular)
+    # server_a is busy, server_b is free
+    assert started == ["a", "d"]
+
+    # coalescing
+    scheduler.request_sync("b", SyncPriority.regular)
+    scheduler.request_sync("d", SyncPriority.regular)
+    scheduler.request_sync("d", SyncPriority.user)
+    assert set(scheduler.pending) == {"b", "c"}
+
+    # the visible wallet goes first
+    wallets["a"].set_sync_status(SyncStatus.synced)
+    assert started == ["a", "d", "c"]
+
+    # the coalesced follow-up sync of d
+    wallets["d"].set_sync_status(SyncStatus.synced)
+    assert started == ["a", "d", "c", "d"]
+    wallets["d"].set_sync_status(SyncStatus.synced)
+
+    # a higher priority beats visibility
+    scheduler.request_sync("a", SyncPriority.user)
+    wallets["c"].set_sync_status(SyncStatus.synced)
+    assert started == ["a", "d", "c", "d", "a"]
+
+    # backoff after a failure
+    wallets["a"].set_sync_status(SyncStatus.error)
+    assert started == ["a", "d", "c", "d", "a", "b"]
+    wallets["b"].set_sync_status(SyncStatus.synced)
+    assert set(scheduler.pending) == {"a"}
+    assert scheduler.timer_backoff.isActive()
+    assert started == ["a", "d", "c", "d", "a", "b"]
+
+    # the user can skip the backoff
+    scheduler.request_sync("a", SyncPriority.user)
+    assert started == ["a", "d", "c", "d", "a", "b", "a"]
+    wallets["a"].set_sync_status(SyncStatus.synced)
+    assert not scheduler.pending
+    assert not scheduler.running
+    scheduler.close()
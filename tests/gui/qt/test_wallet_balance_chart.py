@@ -0,0 +1,105 @@
+#
+# Bitcoin Safe
+# Copyright (C) 2024 Andreas Griffin
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of version 3 of the GNU General Public License as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see https://www.gnu.org/licenses/gpl-3.0.html
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS
+# BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN
+# ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+# CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+from typing import List
+
+import bdkpython as bdk
+import numpy as np
+from pytestqt.qtbot import QtBot
+
+from bitcoin_safe.gui.qt.wallet_balance_chart import WalletBalanceChart, downsample_min_max
+from bitcoin_safe.signals import UpdateFilter, UpdateFilterReason, WalletSignals
+
+from ...test_tx_util import p2wpkh_script, synthetic_tx_details
+
+
+class FakeWallet:
+    "Provides only what WalletBalanceChart needs"
+
+    def __init__(self, txs: List[bdk.TransactionDetails]) -> None:
+        self.network = bdk.Network.REGTEST
+        self.txs = txs
+
+    def sorted_delta_list_transactions(self) -> List[bdk.TransactionDetails]:
+        return self.txs
+
+
+def test_downsample_min_max() -> None:
+    rng = np.random.default_rng(0)
+    timestamps = np.sort(rng.uniform(0, 1e8, 100_000))
+    values = np.cumsum(rng.normal(size=len(timestamps)))
+    data = np.column_stack([timestamps, values])
+
+    downsampled = downsample_min_max(data, n_buckets=500)
+    assert len(downsampled) <= 4 * 500
+    assert np.all(np.diff(downsampled[:, 0]) >= 0)
+    # the extrema and the end points survive
+    assert np.max(downsampled[:, 1]) == np.max(values)
+    assert np.min(downsampled[:, 1]) == np.min(values)
+    assert (downsampled[0] == data[0]).all()
+    assert (downsampled[-1] == data[-1]).all()
+
+    # small data is not touched
+    assert len(downsample_min_max(data[:10], n_buckets=500)) == 10
+
+
+def test_balance_timeline_is_patched(qtbot: QtBot) -> None:
+    def tx(i: int, received: int, sent: int = 0, height: int | None = None) -> bdk.TransactionDetails:
+        return synthetic_tx_details(
+            inputs=[(f"{i:064x}", 0)],
+            outputs=[(received, p2wpkh_script(i))],
+            height=height,
+            received=received,
+            sent=sent,
+        )
+
+    txs = [tx(i, received=100_000, height=i + 1) for i in range(10)]
+    wallet = FakeWallet(txs)
+    chart = WalletBalanceChart(wallet, WalletSignals())  # type: ignore
+    qtbot.addWidget(chart)
+
+    def update() -> None:
+        chart.update_balances(UpdateFilter(refresh_all=True, reason=UpdateFilterReason.TransactionChange))
+
+    update()
+    assert chart._balances.tolist() == [100_000 * (i + 1) for i in range(10)]
+
+    # an appended unconfirmed tx
+    wallet.txs = txs + [tx(10, received=0, sent=50_000)]
+    update()
+    assert chart._balances.tolist()[-1] == 950_000
+    assert np.isnan(chart._timestamps[-1])
+
+    # a replaced tx in the middle
+    wallet.txs = txs[:5] + [tx(11, received=0, sent=200_000, height=6)] + txs[6:]
+    update()
+    assert chart._balances.tolist() == [100_000 * (i + 1) for i in range(5)] + [
+        300_000 + 100_000 * i for i in range(5)
+    ]
+    assert chart._last_update_chart_args is not None
@@ -0,0 +1,114 @@
+#
+# Bitcoin Safe
+# Copyright (C) 2024 Andreas Griffin
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of version 3 of the GNU General Public License as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see https://www.gnu.org/licenses/gpl-3.0.html
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS
+# BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN
+# ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+# CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+import gc
+
+import bdkpython as bdk
+
+from bitcoin_safe.address_index import AddressIndex, address_index
+from bitcoin_safe.config import UserConfig
+from bitcoin_safe.signals import Signals
+from bitcoin_safe.wallet import Wallet, get_wallet_of_address
+
+from ..test_helpers import test_config  # type: ignore
+from .test_wallet import create_multisig_protowallet
+
+
+def test_address_index():
+    index = AddressIndex()
+    key_a = index.register("a")
+    key_b = index.register("b")
+
+    index.extend(key_a, bdk.KeychainKind.EXTERNAL, 0, ["a0", "a1"])
+    # overlapping and non-contiguous extensions
+    index.extend(key_a, bdk.KeychainKind.EXTERNAL, 1, ["a1", "a2"])
+    index.extend(key_a, bdk.KeychainKind.EXTERNAL, 5, ["a5"])
+    index.extend(key_a, bdk.KeychainKind.INTERNAL, 0, ["c0"])
+    # the same address in 2 wallets
+    index.extend(key_b, bdk.KeychainKind.EXTERNAL, 0, ["a0"])
+
+    assert index.count(key_a, bdk.KeychainKind.EXTERNAL) == 3
+    assert index.get(key_a, "a2") == (bdk.KeychainKind.EXTERNAL, 2)
+    assert index.get(key_a, "a5") is None
+    assert index.get(key_a, "c0") == (bdk.KeychainKind.INTERNAL, 0)
+    assert index.get(key_b, "a1") is None
+    assert sorted(wallet_id for wallet_id, _, _ in index.lookup("a0")) == ["a", "b"]
+
+    index.set_wallet_id(key_b, "renamed")
+    index.remove(key_a)
+    assert index.lookup("a0") == [("renamed", bdk.KeychainKind.EXTERNAL, 0)]
+    assert index.lookup("a1") == []
+    # a removed wallet is not indexed again
+    index.extend(key_a, bdk.KeychainKind.EXTERNAL, 0, ["a0"])
+    assert index.get(key_a, "a0") is None
+
+
+def test_wallet_address_lookups(test_config: UserConfig):
+    protowallet = create_multisig_protowallet(
+        threshold=1,
+        signers=1,
+        key_origins=["m/84h/1h/0h"],
+        wallet_id="some id",
+        network=test_config.network,
+    )
+    wallet = Wallet.from_protowallet(protowallet=protowallet, config=test_config)
+    tip = wallet.tips[0]
+    address = wallet.get_receiving_addresses()[tip]
+    change_address = wallet.get_change_addresses()[0]
+    lookahead_address = wallet.bdkwallet.peek_address(tip + 100, is_change=False)
+
+    assert wallet.is_my_address(address)
+    assert wallet.is_my_address(change_address)
+    assert wallet.is_change(change_address)
+    assert not wallet.is_change(address)
+    info_min = wallet.get_address_info_min(address)
+    assert info_min and info_min.index == tip and not info_min.is_change()
+
+    # beyond the tip
+    assert not wallet.is_my_address(lookahead_address)
+    info_min = wallet.search_index_tuple(lookahead_address)
+    assert info_min and info_min.index == tip + 100
+    assert not wallet.is_my_address(lookahead_address)
+    assert wallet.search_index_tuple(lookahead_address, forward_search=10) is not None
+
+    # the tip advances
+    wallet.advance_tip_to_address(lookahead_address)
+    assert wallet.is_my_address(lookahead_address)
+
+    assert [wallet_id for wallet_id, _, _ in address_index.lookup(address)] == ["some id"]
+    signals = Signals()
+    signals.get_wallets.connect(lambda: wallet, slot_name=wallet.id)
+    assert get_wallet_of_address(address, signals) is wallet
+    # indexed as look-ahead address, but beyond the tip
+    lookahead_address = wallet.bdkwallet.peek_address(wallet.tips[0] + 100, is_change=False)
+    assert wallet.search_index_tuple(lookahead_address)
+    assert get_wallet_of_address(lookahead_address, signals) is None
+    del wallet, signals
+    gc.collect()
+    assert address_index.lookup(address) == []
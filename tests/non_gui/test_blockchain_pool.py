@@ -0,0 +1,111 @@
+#
+# Bitcoin Safe
+# Copyright (C) 2024 Andreas Griffin
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of version 3 of the GNU General Public License as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see https://www.gnu.org/licenses/gpl-3.0.html
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS
+# BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN
+# ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+# CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+import threading
+from typing import List
+
+import pytest
+
+from bitcoin_safe.blockchain_pool import BlockchainPool
+
+
+class FakeBlockchain:
+    def __init__(self) -> None:
+        self.healthy = True
+
+    def get_height(self) -> int:
+        if not self.healthy:
+            raise ConnectionError("connection lost")
+        return 100
+
+
+def test_blockchain_pool_reuses_connections() -> None:
+    created: List[FakeBlockchain] = []
+
+    def factory() -> FakeBlockchain:
+        created.append(FakeBlockchain())
+        return created[-1]
+
+    pool = BlockchainPool(max_per_key=2, health_check_interval=0)
+
+    # sequential syncs of many wallets use 1 connection
+    for _ in range(20):
+        with pool.connection("server_a", factory) as blockchain:  # type: ignore
+            assert blockchain is created[0]
+    assert len(created) == 1
+    assert pool.get("server_a", factory) is created[0]  # type: ignore
+
+    # concurrent syncs open at most max_per_key connections
+    with pool.connection("server_a", factory) as b1:  # type: ignore
+        with pool.connection("server_a", factory) as b2:  # type: ignore
+            assert b1 is not b2
+            assert len(created) == 2
+            # get() shares a busy connection instead of opening a new one
+            assert pool.get("server_a", factory) in [b1, b2]  # type: ignore
+
+            acquired = threading.Event()
+
+            def third_sync() -> None:
+                with pool.connection("server_a", factory):  # type: ignore
+                    acquired.set()
+
+            thread = threading.Thread(target=third_sync)
+            thread.start()
+            assert not acquired.wait(timeout=0.2)
+        thread.join(timeout=5)
+        assert acquired.is_set()
+    assert len(created) == 2
+
+    # a changed config (key) gets its own connection
+    with pool.connection("server_b", factory) as blockchain:  # type: ignore
+        assert blockchain is created[2]
+
+
+def test_blockchain_pool_drops_broken_connections() -> None:
+    created: List[FakeBlockchain] = []
+
+    def factory() -> FakeBlockchain:
+        created.append(FakeBlockchain())
+        return created[-1]
+
+    pool = BlockchainPool(max_per_key=1, health_check_interval=0)
+    with pool.connection("server", factory):  # type: ignore
+        pass
+
+    # fails the health check
+    created[0].healthy = False
+    with pool.connection("server", factory) as blockchain:  # type: ignore
+        assert blockchain is created[1]
+
+    # an exception during the usage drops the connection
+    with pytest.raises(ConnectionError):
+        with pool.connection("server", factory):  # type: ignore
+            raise ConnectionError()
+    with pool.connection("server", factory) as blockchain:  # type: ignore
+        assert blockchain is created[2]
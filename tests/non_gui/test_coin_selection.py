@@ -0,0 +1,148 @@
+#
+# Bitcoin Safe
+# Copyright (C) 2024 Andreas Griffin
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of version 3 of the GNU General Public License as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see https://www.gnu.org/licenses/gpl-3.0.html
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS
+# BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN
+# ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+# CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import logging
+import random
+from time import time
+from typing import List
+
+import bdkpython as bdk
+import numpy as np
+import pytest
+
+from bitcoin_safe.coin_selection import CoinSelector, output_weight
+from bitcoin_safe.config import UserConfig
+from bitcoin_safe.pythonbdk_types import OutPoint, PythonUtxo, TxOut
+from bitcoin_safe.wallet import Wallet
+
+from ..test_helpers import test_config  # type: ignore
+from .test_wallet import create_multisig_protowallet
+
+logger = logging.getLogger(__name__)
+
+P2WPKH_SCRIPT = bdk.Script([0, 20] + [1] * 20)
+
+
+def create_selector(values: List[int], fee_rate: float = 3, num_recipients: int = 1) -> CoinSelector:
+    return CoinSelector(
+        values,
+        input_mn_tuple=(1, 1),
+        recipient_weight=num_recipients * output_weight(22),
+        change_weight=output_weight(22),
+        fee_rate=fee_rate,
+    )
+
+
+def test_branch_and_bound_finds_changeless_selection():
+    selector = create_selector([50_000, 31_000, 20_000, 10_000, 7_000])
+    # 20_000 + 10_000 pay exactly the amount and the fees
+    amount = 20_000 + 10_000 - 2 * selector.input_fee - selector.base_fee
+
+    selected = selector.select(amount)
+
+    assert sorted(selector.values[selected].tolist()) == [10_000, 20_000]
+    assert selector.waste(selected, amount + selector.base_fee, has_change=False) == 2 * selector.input_waste
+
+
+def test_fallback_with_change():
+    random.seed(0)
+    selector = create_selector([1_000_000] * 5 + [2_000_000])
+
+    selected = selector.select(75_000)
+
+    # no changeless solution exists, so 1 utxo with change is chosen
+    assert len(selected) == 1
+    assert selector.effective_values[selected].sum() >= 75_000 + selector.base_fee + selector.change_fee
+
+
+def test_uneconomical_utxos_are_not_selected():
+    # at 100 sat/vB spending a 500 sat utxo costs more than it is worth
+    selector = create_selector([500] * 10 + [100_000], fee_rate=100)
+
+    selected = selector.select(50_000)
+
+    assert selector.values[selected].tolist() == [100_000]
+
+
+def test_insufficient_funds_selects_all():
+    selector = create_selector([1_000, 2_000])
+
+    assert sorted(selector.select(10_000).tolist()) == [0, 1]
+
+
+def create_utxos(values: List[int]) -> List[PythonUtxo]:
+    return [
+        PythonUtxo(
+            address="",
+            outpoint=OutPoint(txid=f"{i:064x}", vout=0),
+            txout=TxOut(value=value, script_pubkey=P2WPKH_SCRIPT),
+        )
+        for i, value in enumerate(values)
+    ]
+
+
+@pytest.mark.parametrize("opportunistic_merge_utxos", [True, False])
+def test_benchmark_opportunistic_coin_select_50k(test_config: UserConfig, opportunistic_merge_utxos: bool):
+    "The scenario of test_wallet_coin_select.py (Private category), plus 50k dust utxos"
+    protowallet = create_multisig_protowallet(
+        threshold=1,
+        signers=1,
+        key_origins=["m/84h/1h/0h"],
+        wallet_id="benchmark",
+        network=test_config.network,
+    )
+    wallet = Wallet.from_protowallet(protowallet=protowallet, config=test_config)
+
+    rng = np.random.default_rng(0)
+    random.seed(0)
+    np.random.seed(0)
+    values = [1_000_000] * 5 + rng.integers(1_000, 10_000, size=50_000).tolist()
+    utxos = create_utxos(values)
+    recpient_amounts = [15_000, 25_000, 35_000]
+
+    start_time = time()
+    utxos_for_input = wallet.opportunistic_coin_select(
+        utxos=utxos,
+        total_sent_value=sum(recpient_amounts),
+        opportunistic_merge_utxos=opportunistic_merge_utxos,
+        fee_rate=3,
+        recipient_script_lengths=[22] * len(recpient_amounts),
+    )
+    duration = time() - start_time
+    logger.info(f"opportunistic_coin_select of {len(utxos)} utxos in {duration:.3f}s")
+
+    selected_outpoints = {str(utxo.outpoint) for utxo in utxos_for_input.utxos}
+    assert len(selected_outpoints) == len(utxos_for_input.utxos)
+    assert sum(utxo.txout.value for utxo in utxos_for_input.utxos) >= sum(recpient_amounts)
+    assert utxos_for_input.spend_all_utxos
+    if opportunistic_merge_utxos:
+        assert 0 < len(utxos_for_input.included_opportunistic_merging_utxos) <= 200
+    else:
+        assert not utxos_for_input.included_opportunistic_merging_utxos
+    # generous bound (the previous pairwise outpoint comparison needed seconds)
+    assert duration < 5
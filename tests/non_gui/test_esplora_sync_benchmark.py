@@ -0,0 +1,154 @@
+#
+# Bitcoin Safe
+# Copyright (C) 2024 Andreas Griffin
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of version 3 of the GNU General Public License as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see https://www.gnu.org/licenses/gpl-3.0.html
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS
+# BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN
+# ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+# CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+import logging
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict, Generator, List
+
+import bdkpython as bdk
+import pytest
+
+from bitcoin_safe.config import UserConfig
+from bitcoin_safe.network_config import NetworkConfig
+from bitcoin_safe.pythonbdk_types import BlockchainType
+from bitcoin_safe.wallet import Wallet
+
+from .test_wallet import create_multisig_protowallet
+
+logger = logging.getLogger(__name__)
+
+
+class EsploraStandIn(ThreadingHTTPServer):
+    """Answers the esplora requests of a sync of an unused wallet, with a
+    fixed latency per request (like a remote server)."""
+
+    request_queue_size = 128
+    daemon_threads = True
+
+    def __init__(self, latency: float) -> None:
+        self.latency = latency
+        self.paths: List[str] = []
+        super().__init__(("127.0.0.1", 0), self._Handler)
+
+    class _Handler(BaseHTTPRequestHandler):
+        server: "EsploraStandIn"
+
+        def do_GET(self) -> None:
+            self.server.paths.append(self.path)
+            time.sleep(self.server.latency)
+            if self.path.endswith("/blocks/tip/height"):
+                body = b"100"
+            elif self.path.endswith("/blocks/tip/hash"):
+                body = b"00" * 32
+            else:
+                # no transactions for the scripthash
+                body = b"[]"
+            self.send_response(200)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args) -> None:
+            pass
+
+
+@pytest.fixture
+def esplora_stand_in() -> Generator[EsploraStandIn, None, None]:
+    server = EsploraStandIn(latency=0.01)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def test_network_config_auto_tuning() -> None:
+    network_config = NetworkConfig(network=bdk.Network.REGTEST)
+    network_config.server_type = BlockchainType.Esplora
+    network_config.esplora_url = "http://127.0.0.1:3002"
+    assert network_config.get_esplora_concurrency() == 16
+    network_config.esplora_url = "https://blockstream.info/api"
+    assert network_config.get_esplora_concurrency() == 4
+    assert network_config.get_timeout() == 10
+    network_config.esplora_url = "http://explorerzydxu5ecjrkwceayqybizmpjjznk5izmitf2modhcusuqlid.onion/api"
+    assert network_config.get_timeout() == 30
+
+    # explicit values win
+    network_config.esplora_concurrency = 2
+    network_config.timeout = 5
+    assert network_config.get_esplora_concurrency() == 2
+    assert network_config.get_timeout() == 5
+
+    # saved configs without the new fields get the defaults
+    dump = network_config.dump()
+    for key in ["esplora_concurrency", "timeout", "electrum_retry"]:
+        del dump[key]
+    restored = NetworkConfig.from_dump(dump)
+    assert restored.esplora_concurrency is None
+    assert restored.electrum_retry == 2
+
+
+def test_benchmark_esplora_sync_concurrency(esplora_stand_in: EsploraStandIn) -> None:
+    class BenchmarkConfig(UserConfig):
+        config_dir = Path(tempfile.mkdtemp())
+
+    config = BenchmarkConfig()
+    config.network = bdk.Network.REGTEST
+    config.persist_chain_state = False
+    config.network_config.server_type = BlockchainType.Esplora
+    config.network_config.esplora_url = f"http://127.0.0.1:{esplora_stand_in.server_address[1]}"
+
+    protowallet = create_multisig_protowallet(
+        threshold=1, signers=1, key_origins=["m/84h/1h/0h"], wallet_id="benchmark", network=config.network
+    )
+    protowallet.gap = 100
+
+    durations: Dict[int, float] = {}
+    for concurrency in [1, 4, 16]:
+        config.network_config.esplora_concurrency = concurrency
+        wallet = Wallet.from_protowallet(protowallet, config)
+        esplora_stand_in.paths.clear()
+
+        start_time = time.time()
+        wallet.sync()
+        durations[concurrency] = time.time() - start_time
+
+        n_requests = len(esplora_stand_in.paths)
+        assert n_requests > protowallet.gap
+        logger.info(
+            f"Esplora sync with concurrency={concurrency}: {n_requests} requests in "
+            f"{durations[concurrency]:.3f}s = {n_requests / durations[concurrency]:.0f} requests/s"
+        )
+
+    # the requests are latency bound, so parallel requests are much faster
+    assert durations[16] < durations[4] < durations[1]
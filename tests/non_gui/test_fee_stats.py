@@ -0,0 +1,126 @@
+#
+# Bitcoin Safe
+# Copyright (C) 2024 Andreas Griffin
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of version 3 of the GNU General Public License as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see https://www.gnu.org/licenses/gpl-3.0.html
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS
+# BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN
+# ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+# CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+from types import SimpleNamespace
+from typing import List, Optional
+
+import numpy as np
+import pytest
+
+from bitcoin_safe.fee_stats import FeeStats
+from bitcoin_safe.util import calculate_ema
+
+
+def calculate_ema_loop(values: List[float], n: int = 10, weights: Optional[List[float]] = None) -> float:
+    "The reference implementation (python loop)"
+    alpha = 2 / (n + 1)
+    adjusted_weights = np.array(weights if weights else [1] * len(values)) / np.max(weights or [1])
+    ema = values[0]
+    for weight, value in zip(adjusted_weights, values):
+        weighted_alpha = min(1, alpha * weight)
+        ema = value * weighted_alpha + (ema * (1 - weighted_alpha))
+    return ema
+
+
+def test_calculate_ema_matches_loop():
+    rng = np.random.default_rng(0)
+    for size in [1, 2, 10, 500]:
+        values = rng.uniform(1, 100, size=size).tolist()
+        weights = rng.choice([1, 10], size=size).tolist()
+        for n in [1, 10, 50]:
+            assert calculate_ema(values, n=n) == pytest.approx(calculate_ema_loop(values, n=n))
+            assert calculate_ema(values, n=n, weights=weights) == pytest.approx(
+                calculate_ema_loop(values, n=n, weights=weights)
+            )
+
+
+class VsizeCounter:
+    calls = 0
+
+
+def make_tx(txid: str, fee: Optional[int], vsize: int = 100, sent: int = 0, height: int = 0):
+    def get_vsize() -> int:
+        VsizeCounter.calls += 1
+        return vsize
+
+    return SimpleNamespace(
+        txid=txid,
+        fee=fee,
+        sent=sent,
+        received=1000,
+        transaction=SimpleNamespace(vsize=get_vsize),
+        confirmation_time=SimpleNamespace(height=height, timestamp=height) if height else None,
+    )
+
+
+def test_fee_stats_update_and_statistics():
+    fee_stats = FeeStats()
+    assert fee_stats.ema_fee_rate() is None
+    assert fee_stats.percentile_fee_rate(50) is None
+
+    txs = [
+        make_tx("a", fee=None, height=1),
+        make_tx("b", fee=200, height=2),
+        make_tx("c", fee=1000, sent=5000, height=3),
+    ]
+    VsizeCounter.calls = 0
+    fee_stats.update(txs)
+    assert len(fee_stats) == 3
+    assert VsizeCounter.calls == 3
+    assert fee_stats.height.tolist() == [1, 2, 3]
+    assert fee_stats.percentile_fee_rate(50) == pytest.approx(6)
+    assert fee_stats.percentile_fee_rate(50, only_sent=True) == pytest.approx(10)
+    assert fee_stats.ema_fee_rate() == pytest.approx(calculate_ema_loop([2, 10], n=10, weights=[1, 10]))
+
+    # appended txs only call vsize for the new rows
+    txs = txs + [make_tx("d", fee=300)]
+    fee_stats.update(txs)
+    assert len(fee_stats) == 4
+    assert VsizeCounter.calls == 4
+
+    # a tx modified in place
+    txs[0].fee = 500
+    fee_stats.update(txs)
+    assert fee_stats.fee_rates()[0] == pytest.approx(5)
+    assert VsizeCounter.calls == 4
+    txs[0].fee = None
+
+    # a modified tx (new object) rebuilds the columns, but reuses the vsizes
+    txs = [txs[0], make_tx("b", fee=200, height=2), txs[2], make_tx("d", fee=300, height=4)]
+    fee_stats.update(txs)
+    assert VsizeCounter.calls == 4
+    assert fee_stats.height.tolist() == [1, 2, 3, 4]
+
+    # a removed tx
+    fee_stats.update(txs[:2])
+    assert fee_stats.fee_rates()[1:].tolist() == [2]
+    assert np.isnan(fee_stats.fee_rates()[0])
+
+    fee_stats.clear()
+    assert len(fee_stats) == 0
+    assert fee_stats.ema_fee_rate() is None
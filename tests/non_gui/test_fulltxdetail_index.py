@@ -0,0 +1,204 @@
+#
+# Bitcoin Safe
+# Copyright (C) 2024 Andreas Griffin
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of version 3 of the GNU General Public License as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see https://www.gnu.org/licenses/gpl-3.0.html
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS
+# BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN
+# ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+# CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import logging
+from typing import Dict, Optional, Tuple
+
+import bdkpython as bdk
+
+from bitcoin_safe.config import UserConfig
+from bitcoin_safe.pythonbdk_types import TxOut
+from bitcoin_safe.wallet import FullTxDetailIndex, Wallet
+
+from ..test_helpers import test_config  # type: ignore
+from ..test_tx_util import p2wpkh_address, p2wpkh_script, synthetic_tx_details
+from .test_wallet import create_multisig_protowallet
+
+logger = logging.getLogger(__name__)
+
+external_txid = "aa" * 32
+
+
+def get_address_of_txout(txout: TxOut) -> Optional[str]:
+    return bdk.Address.from_script(txout.script_pubkey, bdk.Network.REGTEST).as_string()
+
+
+def test_incremental_chain_and_rbf_replacement():
+    funding = synthetic_tx_details([(external_txid, 0)], [(100_000, p2wpkh_script(1))], height=100)
+    payment = synthetic_tx_details(
+        [(funding.txid, 0)], [(60_000, p2wpkh_script(2)), (39_000, p2wpkh_script(3))]
+    )
+    child = synthetic_tx_details([(payment.txid, 1)], [(38_000, p2wpkh_script(4))])
+
+    index = FullTxDetailIndex(get_address_of_txout)
+    delta = index.update([funding, payment, child])
+    assert len(delta.appended) == 3
+    assert not delta.removed
+
+    funding_output = index.dict_fulltxdetail[funding.txid].outputs[f"{funding.txid}:0"]
+    assert funding_output.is_spent_by_txid == payment.txid
+    assert index.dict_fulltxdetail[child.txid].inputs[f"{payment.txid}:1"]
+    assert index.address_to_txids[p2wpkh_address(1)] == {funding.txid, payment.txid}
+    assert index.address_to_txids[p2wpkh_address(3)] == {payment.txid, child.txid}
+
+    # rbf: payment is replaced by a payment with a different change output
+    replacement = synthetic_tx_details(
+        [(funding.txid, 0)], [(60_000, p2wpkh_script(2)), (38_500, p2wpkh_script(5))]
+    )
+    funding_fulltxdetail = index.dict_fulltxdetail[funding.txid]
+    delta = index.update([funding, replacement, child])
+    assert [tx.txid for tx in delta.removed] == [payment.txid]
+    assert [tx.txid for tx in delta.appended] == [replacement.txid]
+
+    # unchanged transactions are not recomputed
+    assert index.dict_fulltxdetail[funding.txid] is funding_fulltxdetail
+    assert funding_output.is_spent_by_txid == replacement.txid
+    assert index.dict_fulltxdetail[child.txid].inputs[f"{payment.txid}:1"] is None
+    assert index.address_to_txids[p2wpkh_address(1)] == {funding.txid, replacement.txid}
+    assert index.address_to_txids[p2wpkh_address(2)] == {replacement.txid}
+    assert p2wpkh_address(3) not in index.address_to_txids
+    assert index.address_to_txids[p2wpkh_address(4)] == {child.txid}
+
+
+def test_parent_arriving_after_child_is_linked():
+    parent = synthetic_tx_details([(external_txid, 1)], [(50_000, p2wpkh_script(10))])
+    child = synthetic_tx_details([(parent.txid, 0)], [(49_000, p2wpkh_script(11))])
+
+    index = FullTxDetailIndex(get_address_of_txout)
+    index.update([child])
+    assert index.dict_fulltxdetail[child.txid].inputs[f"{parent.txid}:0"] is None
+
+    index.update([child, parent])
+    parent_output = index.dict_fulltxdetail[parent.txid].outputs[f"{parent.txid}:0"]
+    assert parent_output.is_spent_by_txid == child.txid
+    assert index.dict_fulltxdetail[child.txid].inputs[f"{parent.txid}:0"] is parent_output
+    assert index.address_to_txids[p2wpkh_address(10)] == {parent.txid, child.txid}
+
+    # and removing the parent again un-links everything
+    index.update([child])
+    assert index.dict_fulltxdetail[child.txid].inputs[f"{parent.txid}:0"] is None
+    assert p2wpkh_address(10) not in index.address_to_txids
+
+
+def test_confirmation_is_refreshed_for_unchanged_txids():
+    unconfirmed = synthetic_tx_details([(external_txid, 2)], [(50_000, p2wpkh_script(20))])
+    confirmed = synthetic_tx_details([(external_txid, 2)], [(50_000, p2wpkh_script(20))], height=200)
+    assert unconfirmed.txid == confirmed.txid
+
+    index = FullTxDetailIndex(get_address_of_txout)
+    index.update([unconfirmed])
+    delta = index.update([confirmed])
+    assert not delta.was_changed()
+    assert index.dict_fulltxdetail[confirmed.txid].tx.confirmation_time.height == 200
+    assert [tx.txid for tx in delta.modified] == [confirmed.txid]
+    assert delta.affected_addresses == {p2wpkh_address(20)}
+    assert delta.affected_outpoints == {f"{external_txid}:2", f"{confirmed.txid}:0"}
+
+
+def balances(index: FullTxDetailIndex) -> Dict[str, Tuple[int, int]]:
+    return {
+        address: (balance.confirmed, balance.untrusted_pending)
+        for address, balance in index.address_balances.items()
+    }
+
+
+def test_address_balances_follow_the_delta():
+    funding = synthetic_tx_details([(external_txid, 0)], [(100_000, p2wpkh_script(1))], height=100)
+    payment = synthetic_tx_details(
+        [(funding.txid, 0)], [(60_000, p2wpkh_script(2)), (39_000, p2wpkh_script(3))]
+    )
+
+    index = FullTxDetailIndex(get_address_of_txout)
+    index.update([funding])
+    assert balances(index) == {p2wpkh_address(1): (100_000, 0)}
+
+    index.update([funding, payment])
+    assert balances(index) == {p2wpkh_address(2): (0, 60_000), p2wpkh_address(3): (0, 39_000)}
+
+    # confirming the payment moves the balance from pending to confirmed
+    confirmed_payment = synthetic_tx_details(
+        [(funding.txid, 0)], [(60_000, p2wpkh_script(2)), (39_000, p2wpkh_script(3))], height=101
+    )
+    index.update([funding, confirmed_payment])
+    assert balances(index) == {p2wpkh_address(2): (60_000, 0), p2wpkh_address(3): (39_000, 0)}
+
+    # the payment disappears (reorg and eviction) and the funding output is unspent again
+    delta = index.update([funding])
+    assert balances(index) == {p2wpkh_address(1): (100_000, 0)}
+    assert delta.affected_addresses == {p2wpkh_address(1), p2wpkh_address(2), p2wpkh_address(3)}
+    assert set(index.address_to_txids) == {p2wpkh_address(1)}
+
+
+def test_txid_to_categories_is_invalidated_by_the_involved_addresses():
+    funding = synthetic_tx_details([(external_txid, 0)], [(100_000, p2wpkh_script(1))], height=100)
+    other = synthetic_tx_details([(external_txid, 1)], [(50_000, p2wpkh_script(5))], height=100)
+
+    index = FullTxDetailIndex(get_address_of_txout)
+    index.update([funding, other])
+    index.txid_to_categories = {funding.txid: ["KYC"], other.txid: ["Private"]}
+
+    index.invalidate_categories([p2wpkh_address(1)])
+    assert index.txid_to_categories == {other.txid: ["Private"]}
+
+    # a new child tx involves address 1, but not address 5
+    index.txid_to_categories[funding.txid] = ["KYC"]
+    payment = synthetic_tx_details([(funding.txid, 0)], [(99_000, p2wpkh_script(2))])
+    index.update([funding, other, payment])
+    assert index.txid_to_categories == {other.txid: ["Private"]}
+
+    # removed txs are forgotten
+    index.update([funding])
+    assert index.txid_to_categories == {}
+
+    index.txid_to_categories[funding.txid] = ["KYC"]
+    index.invalidate_categories()
+    assert index.txid_to_categories == {}
+
+
+def test_wallet_address_balances_only_contain_wallet_addresses(test_config: UserConfig):
+    protowallet = create_multisig_protowallet(
+        threshold=1,
+        signers=1,
+        key_origins=["m/84h/1h/0h"],
+        wallet_id="balances",
+        network=test_config.network,
+    )
+    wallet = Wallet.from_protowallet(protowallet=protowallet, config=test_config)
+    my_address = wallet.get_receiving_addresses()[0]
+    my_script = bytes(bdk.Address(my_address, test_config.network).script_pubkey().to_bytes())
+    # a payment to a foreign address, with change back to the wallet
+    payment = synthetic_tx_details(
+        [(external_txid, 0)], [(60_000, p2wpkh_script(1)), (39_000, my_script)], height=100
+    )
+    wallet.bdkwallet.list_transactions = lambda include_raw=True: [payment]  # type: ignore
+
+    assert wallet.fulltxdetail_index.address_balances.keys() == set()
+    assert dict(wallet.get_address_balances()) == {my_address: wallet.get_addr_balance(my_address)}
+    assert wallet.get_addr_balance(my_address).confirmed == 39_000
+    assert p2wpkh_address(1) in wallet.fulltxdetail_index.address_balances
+    assert wallet.get_addr_balance(p2wpkh_address(1)).total == 0
@@ -0,0 +1,136 @@
+#
+# Bitcoin Safe
+# Copyright (C) 2024 Andreas Griffin
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of version 3 of the GNU General Public License as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see https://www.gnu.org/licenses/gpl-3.0.html
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS
+# BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN
+# ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+# CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+import logging
+from collections import Counter
+
+from bitcoin_safe.signals import UpdateFilter, UpdateFilterReason
+from bitcoin_safe.util import CacheDependency, CacheManager, instance_lru_cache
+
+logger = logging.getLogger(__name__)
+
+
+class CachedThing(CacheManager):
+    def __init__(self) -> None:
+        super().__init__()
+        self.calls: Counter = Counter()
+
+    @instance_lru_cache(key_dependency=CacheDependency.Addresses)
+    def balance(self, address: str) -> int:
+        self.calls["balance"] += 1
+        return len(address)
+
+    @instance_lru_cache(depends_on=[CacheDependency.Txids])
+    def txs(self) -> int:
+        self.calls["txs"] += 1
+        return self.calls["txs"]
+
+    @instance_lru_cache(depends_on=[CacheDependency.ChainHeight])
+    def height(self) -> int:
+        self.calls["height"] += 1
+        return self.calls["height"]
+
+    @instance_lru_cache()
+    def anything(self) -> int:
+        self.calls["anything"] += 1
+        return self.calls["anything"]
+
+    @instance_lru_cache(maxsize=2)
+    def bounded(self, i: int) -> int:
+        self.calls["bounded"] += 1
+        return i
+
+
+def fill(thing: CachedThing) -> None:
+    thing.balance("a")
+    thing.balance("bb")
+    thing.txs()
+    thing.height()
+    thing.anything()
+
+
+def test_per_key_invalidation():
+    thing = CachedThing()
+    fill(thing)
+    fill(thing)
+    assert thing.calls == Counter(balance=2, txs=1, height=1, anything=1)
+
+    thing.invalidate_instance_cache(UpdateFilter(addresses=["a"]).cache_dependencies())
+    fill(thing)
+    # only balance("a") and the method without dependencies are recomputed
+    assert thing.calls == Counter(balance=3, txs=1, height=1, anything=2)
+
+    thing.invalidate_instance_cache(UpdateFilter(txids=["txid"]).cache_dependencies())
+    fill(thing)
+    assert thing.calls == Counter(balance=3, txs=2, height=1, anything=3)
+
+    thing.invalidate_instance_cache(
+        UpdateFilter(reason=UpdateFilterReason.ChainHeightAdvanced).cache_dependencies()
+    )
+    fill(thing)
+    assert thing.calls == Counter(balance=3, txs=2, height=2, anything=4)
+
+
+def test_label_changes_do_not_invalidate_chain_data():
+    thing = CachedThing()
+    fill(thing)
+    thing.invalidate_instance_cache(
+        UpdateFilter(addresses=["a"], reason=UpdateFilterReason.UserInput).cache_dependencies()
+    )
+    thing.invalidate_instance_cache(
+        UpdateFilter(refresh_all=True, reason=UpdateFilterReason.UserImport).cache_dependencies()
+    )
+    # an empty change invalidates nothing
+    thing.invalidate_instance_cache(UpdateFilter().cache_dependencies())
+    fill(thing)
+    # only the method without declared dependencies is recomputed
+    assert thing.calls == Counter(balance=2, txs=1, height=1, anything=2)
+
+    thing.invalidate_instance_cache(UpdateFilter(refresh_all=True).cache_dependencies())
+    fill(thing)
+    assert thing.calls == Counter(balance=4, txs=2, height=2, anything=3)
+
+
+def test_counters_and_maxsize():
+    thing = CachedThing()
+    for i in [1, 2, 1, 3, 2]:
+        thing.bounded(i)
+
+    info = thing.instance_cache_info()["CachedThing.bounded"]
+    # 1 miss, 2 miss, 1 hit, 3 miss (evicts 2), 2 miss (evicts 1)
+    assert (info.hits, info.misses, info.evictions, info.currsize, info.maxsize) == (1, 4, 2, 2, 2)
+
+    thing.balance("a")
+    thing.balance("b")
+    thing.invalidate_instance_cache({CacheDependency.Addresses: {"a"}})
+    info = thing.instance_cache_info()["CachedThing.balance"]
+    assert (info.invalidations, info.currsize) == (1, 1)
+
+    thing.clear_instance_cache()
+    assert thing.instance_cache_info()["CachedThing.balance"].currsize == 0
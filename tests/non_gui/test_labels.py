@@ -28,8 +28,10 @@
 
 
 import datetime
+import json
 
 from bitcoin_safe.labels import Label, Labels, LabelType
+from bitcoin_safe.storage import ClassSerializer
 from bitcoin_safe.util import clean_lines
 
 
@@ -42,28 +44,64 @@ def test_label_export():
     assert labels.dump()["__class__"] == "Labels"
     assert labels.dump()["categories"] == ["category 0"]
 
-    data = list(labels.dump()["data"].values())
-    assert len(data) == 1
-    assert data[0].dump() == {
-        "VERSION": data[0].VERSION,
-        "__class__": "Label",
-        "category": "category 0",
-        "label": "my label",
-        "ref": "some_address",
-        "timestamp": timestamp,
-        "type": "addr",
+    assert labels.dump()["label_columns"] == {
+        "type": ["addr"],
+        "ref": ["some_address"],
+        "label": ["my label"],
+        "category": ["category 0"],
+        "timestamp": [timestamp],
     }
 
     assert (
         labels.dumps()
         == """{"VERSION": """
         + f'"{labels.VERSION}"'
-        + """, "__class__": "Labels", "categories": ["category 0"], "data": {"some_address": {"VERSION": """
-        + f'"{data[0].VERSION}"'
-        + ', "__class__": "Label", "category": "category 0", "label": "my label", "ref": "some_address", "timestamp": '
+        + """, "__class__": "Labels", "categories": ["category 0"], "default_category": "default", """
+        + """"label_columns": {"category": ["category 0"], "label": ["my label"], "ref": ["some_address"], "timestamp": ["""
+        + f"{timestamp}"
+        + """], "type": ["addr"]}}"""
+    )
+
+
+def test_label_columns_roundtrip():
+    labels = Labels()
+    for i in range(1000):
+        labels.set_addr_label(f"address{i}", f"label {i}", timestamp=i)
+        labels.set_tx_category(f"txid{i}", f"category {i % 3}", timestamp=i)
+    labels.import_labels([Label(LabelType.output, "txid0:0", timestamp=1, origin="origin", spendable=False)])
+
+    restored = Labels.from_dump(json.loads(labels.dumps()))
+    # loaded lazily
+    assert restored._data is None
+    assert restored.dump()["label_columns"] == labels.dump()["label_columns"]
+    assert restored._data is None
+
+    assert restored.data == labels.data
+    assert restored.categories == labels.categories
+    assert restored.get_category("txid5") == "category 2"
+    assert restored.data["txid0:0"].spendable is False
+
+    # changes after loading are saved
+    restored.set_addr_label("address0", "changed")
+    assert Labels.from_dump(json.loads(restored.dumps())).get_label("address0") == "changed"
+
+
+def test_load_labels_saved_as_data():
+    "Files saved before label_columns contain 1 Label dict per label"
+    timestamp = datetime.datetime(2000, 1, 1, 0, 0, 0).timestamp()
+    dumps = (
+        """{"VERSION": "0.1.0", "__class__": "Labels", "categories": ["category 0"], "data": {"some_address": {"VERSION": "0.0.3", """
+        + """"__class__": "Label", "category": "category 0", "label": "my label", "ref": "some_address", "timestamp": """
         + f"{timestamp}"
         + ', "type": "addr"}}, "default_category": "default"}'
     )
+    labels = json.loads(
+        dumps, object_hook=ClassSerializer.general_deserializer(Labels.get_known_classes(), {})
+    )
+    assert isinstance(labels, Labels)
+    assert labels.get_label("some_address") == "my label"
+    assert labels.get_category("some_address") == "category 0"
+    assert labels.get_timestamp("some_address") == timestamp
 
 
 def test_dumps_data():
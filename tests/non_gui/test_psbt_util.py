@@ -27,9 +27,11 @@
 # SOFTWARE.
 
 
+import json
+
 import bdkpython as bdk
 
-from bitcoin_safe.psbt_util import SimpleOutput, SimplePSBT
+from bitcoin_safe.psbt_util import SimpleOutput, SimplePSBT, decode_psbt
 from bitcoin_safe.pythonbdk_types import TxOut
 
 p2wsh_psbt_0_2of3 = bdk.PartiallySignedTransaction(
@@ -145,3 +147,47 @@ def test_to_txout():
     txout = simple_output.to_txout()
 
     assert isinstance(txout, TxOut)  # Should return a TxOut object
+
+
+def test_decode_psbt_matches_json_serialize():
+    for psbt in [
+        p2wsh_psbt_0_2of3,
+        p2wsh_psbt_1_2of3,
+        p2wsh_psbt_0_1of1,
+        p2wsh_psbt_1_1of1,
+        p2wsh_psbt_0_2of2,
+        p2sh_0_2of3,
+        p2sh_1_2of3,
+        p2sh_2_2of3,
+    ]:
+        psbt_json = json.loads(psbt.json_serialize())
+        decoded = decode_psbt(psbt.serialize())
+
+        assert decoded.txid == psbt.txid()
+        assert decoded.unsigned_tx == psbt_json["unsigned_tx"]
+        assert [str(txin.previous_output) for txin in decoded.txins] == [
+            str(txin.previous_output) for txin in psbt.extract_tx().input()
+        ]
+        for decoded_input, json_input in zip(decoded.inputs, psbt_json["inputs"]):
+            for key, value in json_input.items():
+                if key == "partial_sigs":
+                    assert decoded_input[key] == {k: {"sig": v["sig"]} for k, v in value.items()}
+                elif key in decoded_input:
+                    assert decoded_input[key] == value
+                else:
+                    assert not value
+        for decoded_output, json_output in zip(decoded.outputs, psbt_json["outputs"]):
+            for key, value in json_output.items():
+                if key in decoded_output:
+                    assert decoded_output[key] == value
+                else:
+                    assert not value
+
+
+def test_from_psbt_returns_new_instances():
+    simple_psbt = SimplePSBT.from_psbt(p2wsh_psbt_1_2of3)
+    simple_psbt.inputs[0].wallet_id = "my wallet"
+
+    # the decoding is cached, but the enriched SimplePSBT must not leak into the next call
+    assert decode_psbt(p2wsh_psbt_1_2of3.serialize()) is decode_psbt(p2wsh_psbt_1_2of3.serialize())
+    assert SimplePSBT.from_psbt(p2wsh_psbt_1_2of3).inputs[0].wallet_id is None
@@ -0,0 +1,137 @@
+#
+# Bitcoin Safe
+# Copyright (C) 2024 Andreas Griffin
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of version 3 of the GNU General Public License as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see https://www.gnu.org/licenses/gpl-3.0.html
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS
+# BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN
+# ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+# CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+import threading
+from typing import Dict, List
+
+from bitcoin_safe.labels import Labels
+from bitcoin_safe.search_index import SearchHit, SearchKind, WalletSearchIndex
+from bitcoin_safe.signals import UpdateFilter, UpdateFilterReason
+
+
+class FakeTxo:
+    def __init__(self, is_spent_by_txid=None) -> None:
+        self.is_spent_by_txid = is_spent_by_txid
+
+
+class FakeFullTxDetailIndex:
+    def __init__(self, dict_fulltxdetail: Dict[str, object]) -> None:
+        self.lock = threading.Lock()
+        self.dict_fulltxdetail = dict_fulltxdetail
+
+
+class FakeWallet:
+    def __init__(self) -> None:
+        self.labels = Labels()
+        self.receiving_addresses: List[str] = [f"bc1qreceive{i:05d}" for i in range(100)]
+        self.change_addresses: List[str] = [f"bc1qchange{i:05d}" for i in range(50)]
+        self.fulltxdetail_index = FakeFullTxDetailIndex({f"{i:064x}": object() for i in range(200)})
+        self.txos: Dict[str, FakeTxo] = {f"{i:064x}:0": FakeTxo() for i in range(200)}
+
+    def get_receiving_addresses(self) -> List[str]:
+        return self.receiving_addresses
+
+    def get_change_addresses(self) -> List[str]:
+        return self.change_addresses
+
+    def get_dict_fulltxdetail(self) -> Dict[str, object]:
+        # like the FullTxDetailIndex, always the same dict
+        return self.fulltxdetail_index.dict_fulltxdetail
+
+    def get_all_txos_dict(self) -> Dict[str, FakeTxo]:
+        return self.txos
+
+
+def search(
+    search_index: WalletSearchIndex, wallet: FakeWallet, text: str, max_results=1000
+) -> List[SearchHit]:
+    search_index.sync(wallet)  # type: ignore
+    return search_index.search(text, max_results=max_results)
+
+
+def test_search_index() -> None:
+    wallet = FakeWallet()
+    wallet.labels.set_addr_label("bc1qreceive00007", "Salary from ACME")
+    search_index = WalletSearchIndex()
+
+    assert search(search_index, wallet, "receive0001") == [
+        SearchHit(SearchKind.Address, f"bc1qreceive0001{i}", f"bc1qreceive0001{i}") for i in range(10)
+    ]
+    # labels are case insensitive, addresses are not
+    assert search(search_index, wallet, "acme") == [
+        SearchHit(SearchKind.AddressLabel, "Salary from ACME", "bc1qreceive00007")
+    ]
+    assert search(search_index, wallet, "BC1Q") == []
+    # a hit may not span 2 entries
+    assert search(search_index, wallet, "00099bc1q") == []
+
+    # result cap
+    assert len(search(search_index, wallet, "bc1q", max_results=7)) == 7
+
+    # label delta
+    txid = f"{5:064x}"
+    wallet.labels.set_tx_label(txid, "Rent")
+    assert search(search_index, wallet, "rent") == []
+    search_index.mark_dirty(UpdateFilter(txids=[txid], reason=UpdateFilterReason.UserInput))
+    assert search(search_index, wallet, "rent") == [SearchHit(SearchKind.TxLabel, "Rent", txid)]
+
+    # tx delta (the txids are updated in place, the txos cache returns a new object)
+    spending_txid = f"{1000:064x}"
+    wallet.get_dict_fulltxdetail()[spending_txid] = object()
+    wallet.txos = {**wallet.txos, f"{5:064x}:0": FakeTxo(is_spent_by_txid=spending_txid)}
+    assert search(search_index, wallet, f"{1000:064x}") == [
+        SearchHit(SearchKind.Txid, spending_txid, spending_txid)
+    ]
+    assert search(search_index, wallet, f"{5:064x}:") == [
+        SearchHit(SearchKind.SpentTxo, f"{5:064x}:0", spending_txid)
+    ]
+
+    # removed tx
+    del wallet.get_dict_fulltxdetail()[txid]
+    assert search(search_index, wallet, "rent") == []
+    assert [hit for hit in search(search_index, wallet, txid) if hit.kind == SearchKind.Txid] == []
+
+
+def test_search_index_lowercase_changes_length() -> None:
+    wallet = FakeWallet()
+    # "İ".lower() has 2 characters
+    wallet.labels.set_addr_label("bc1qreceive00001", "İİİİ rent")
+    wallet.labels.set_addr_label("bc1qreceive00002", "Salary")
+    wallet.labels.set_addr_label("bc1qreceive00003", "Food")
+    search_index = WalletSearchIndex()
+
+    assert search(search_index, wallet, "rent") == [
+        SearchHit(SearchKind.AddressLabel, "İİİİ rent", "bc1qreceive00001")
+    ]
+    assert search(search_index, wallet, "salary") == [
+        SearchHit(SearchKind.AddressLabel, "Salary", "bc1qreceive00002")
+    ]
+    assert search(search_index, wallet, "food") == [
+        SearchHit(SearchKind.AddressLabel, "Food", "bc1qreceive00003")
+    ]
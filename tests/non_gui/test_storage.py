@@ -0,0 +1,147 @@
+#
+# Bitcoin Safe
+# Copyright (C) 2024 Andreas Griffin
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of version 3 of the GNU General Public License as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see https://www.gnu.org/licenses/gpl-3.0.html
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS
+# BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN
+# ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+# CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+import io
+from base64 import urlsafe_b64decode as b64d
+from base64 import urlsafe_b64encode as b64e
+from unittest.mock import patch
+
+import pytest
+from cryptography.fernet import Fernet, InvalidToken
+
+from bitcoin_safe.storage import DerivedKeyCache, Encrypt, Storage
+
+password = "my password"
+iterations = 1000
+
+
+def fernet_token(encrypt: Encrypt, message: bytes, salt: bytes) -> bytes:
+    "The format as created by Fernet"
+    key = encrypt._derive_key(password.encode(), salt, iterations)
+    return b64e(salt + iterations.to_bytes(4, "big") + b64d(Fernet(key).encrypt(message)))
+
+
+@pytest.mark.parametrize("length", [0, 1, 15, 16, 17, 100_000])
+def test_compatible_with_fernet(length: int):
+    encrypt = Encrypt()
+    encrypt.chunk_size = 3 * 16 * 10
+    message = bytes(i % 251 for i in range(length))
+
+    # decrypt a token created by Fernet
+    salt = b"s" * 16
+    assert encrypt.password_decrypt(fernet_token(encrypt, message, salt), password) == message
+
+    # Fernet decrypts the streamed token
+    token = b64d(encrypt.password_encrypt(message, password, iterations=iterations))
+    salt, token_iterations = token[:16], int.from_bytes(token[16:20], "big")
+    assert token_iterations == iterations
+    key = encrypt._derive_key(password.encode(), salt, iterations)
+    assert Fernet(key).decrypt(b64e(token[20:])) == message
+
+
+def test_wrong_password_or_modified_token():
+    encrypt = Encrypt()
+    token = encrypt.password_encrypt(b"secret", password, iterations=iterations)
+    with pytest.raises(InvalidToken):
+        encrypt.password_decrypt(token, "wrong password")
+
+    raw = bytearray(b64d(token))
+    raw[-40] ^= 1
+    with pytest.raises(InvalidToken):
+        encrypt.password_decrypt(b64e(bytes(raw)), password)
+    with pytest.raises(InvalidToken):
+        encrypt.password_decrypt(token[:-8], password)
+
+
+def test_key_cache_skips_key_derivation(tmp_path):
+    storage = Storage()
+    key_cache = DerivedKeyCache()
+    filename = str(tmp_path / "wallet")
+
+    with patch.object(Encrypt, "_derive_key", wraps=storage.encrypt._derive_key) as derive_key:
+        storage.save("content", filename, password=password, key_cache=key_cache)
+        storage.save("content 2", filename, password=password, key_cache=key_cache)
+        assert storage.load(filename, password=password, key_cache=key_cache) == "content 2"
+        assert derive_key.call_count == 1
+
+        # a different password must not use the cached key
+        storage.save("content 3", filename, password="other", key_cache=key_cache)
+        assert derive_key.call_count == 2
+        assert storage.load(filename, password="other") == "content 3"
+        with pytest.raises(InvalidToken):
+            storage.load(filename, password=password, key_cache=key_cache)
+
+
+def test_key_cache_clear():
+    key_cache = DerivedKeyCache()
+    key_cache.set(password, salt=b"s" * 16, iterations=iterations, key=b"k" * 32)
+    assert key_cache.get(password) == b"k" * 32
+    assert key_cache.get("wrong password") is None
+    assert key_cache.get(password, salt=b"t" * 16) is None
+
+    key = key_cache._key
+    key_cache.clear()
+    assert key == bytearray(32)
+    assert key_cache.get(password) is None
+
+
+def test_has_password(tmp_path):
+    storage = Storage()
+    filename = str(tmp_path / "wallet")
+    storage.save("{}", filename)
+    assert not Storage.has_password(filename)
+    storage.save("{}", filename, password=password)
+    assert Storage.has_password(filename)
+
+
+def test_streamed_file_matches_token():
+    encrypt = Encrypt()
+    encrypt.chunk_size = 3 * 16
+    message = b"x" * 1000
+    file = io.BytesIO()
+    encrypt.encrypt_to_file(message, file, password, iterations=iterations)
+    assert encrypt.decrypt_from_file(io.BytesIO(file.getvalue()), password) == message
+
+
+def test_storage_save_is_atomic(tmp_path) -> None:
+    filename = str(tmp_path / "file")
+    storage = Storage()
+    storage.save("old", filename)
+
+    class Failing(str):
+        def encode(self, *args, **kwargs):
+            raise OSError("disk full")
+
+    try:
+        storage.save(Failing("new"), filename)
+    except OSError:
+        pass
+    assert storage.load(filename) == "old"
+    # no temporary files are left behind
+    assert [p.name for p in tmp_path.iterdir()] == ["file"]
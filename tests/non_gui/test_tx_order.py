@@ -0,0 +1,166 @@
+#
+# Bitcoin Safe
+# Copyright (C) 2024 Andreas Griffin
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of version 3 of the GNU General Public License as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see https://www.gnu.org/licenses/gpl-3.0.html
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS
+# BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN
+# ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+# CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import logging
+import random
+from time import time
+from types import SimpleNamespace
+from typing import Dict, List, Optional
+
+import bdkpython as bdk
+
+from bitcoin_safe.pythonbdk_types import FullTxDetail, TxOut
+from bitcoin_safe.wallet import FullTxDetailIndex, TopologicalTxOrder
+
+from ..test_tx_util import p2wpkh_script, synthetic_tx_details
+
+logger = logging.getLogger(__name__)
+
+
+def get_address_of_txout(txout: TxOut) -> Optional[str]:
+    return bdk.Address.from_script(txout.script_pubkey, bdk.Network.REGTEST).as_string()
+
+
+def assert_valid_order(sorted_txids: List[str], dict_fulltxdetail: Dict[str, FullTxDetail]) -> None:
+    assert len(sorted_txids) == len(dict_fulltxdetail)
+    position = {txid: i for i, txid in enumerate(sorted_txids)}
+    heights = [TopologicalTxOrder.height_of(dict_fulltxdetail[txid]) for txid in sorted_txids]
+    assert heights == sorted(heights)
+    for txid, fulltxdetail in dict_fulltxdetail.items():
+        for outpoint_str in fulltxdetail.inputs:
+            parent_txid = outpoint_str.split(":")[0]
+            if parent_txid in position:
+                assert position[parent_txid] < position[txid]
+
+
+def test_parents_before_children_in_same_block_and_mempool():
+    funding = synthetic_tx_details([("aa" * 32, 0)], [(100_000, p2wpkh_script(1))], height=100)
+    same_block_parent = synthetic_tx_details([(funding.txid, 0)], [(90_000, p2wpkh_script(2))], height=101)
+    same_block_child = synthetic_tx_details(
+        [(same_block_parent.txid, 0)], [(80_000, p2wpkh_script(3))], height=101
+    )
+    unconfirmed_parent = synthetic_tx_details([(same_block_child.txid, 0)], [(70_000, p2wpkh_script(4))])
+    unconfirmed_child = synthetic_tx_details([(unconfirmed_parent.txid, 0)], [(60_000, p2wpkh_script(5))])
+
+    index = FullTxDetailIndex(get_address_of_txout)
+    # deliberately in reverse order
+    index.update([unconfirmed_child, unconfirmed_parent, same_block_child, same_block_parent, funding])
+    order = TopologicalTxOrder()
+    assert order.update(index.dict_fulltxdetail) == [
+        funding.txid,
+        same_block_parent.txid,
+        same_block_child.txid,
+        unconfirmed_parent.txid,
+        unconfirmed_child.txid,
+    ]
+
+    # the parent gets confirmed, which moves it into a new height group
+    confirmed_parent = synthetic_tx_details(
+        [(same_block_child.txid, 0)], [(70_000, p2wpkh_script(4))], height=102
+    )
+    index.update([unconfirmed_child, confirmed_parent, same_block_child, same_block_parent, funding])
+    sorted_txids = order.update(index.dict_fulltxdetail)
+    assert sorted_txids[-2:] == [confirmed_parent.txid, unconfirmed_child.txid]
+    assert_valid_order(sorted_txids, index.dict_fulltxdetail)
+
+
+def synthetic_wallet(
+    n_singletons=20_000, n_clusters=40, cluster_size=500, n_chains=10, chain_length=1000, seed=0
+) -> Dict[str, FullTxDetail]:
+    """A 50k tx wallet (with the default values).
+
+    Only the attributes relevant for the ordering are filled, such that
+    the benchmark measures the sorting and not the creation of the bdk
+    objects.
+    """
+    rng = random.Random(seed)
+    fulltxdetails: List[FullTxDetail] = []
+
+    def add(txid: str, height: Optional[int], parent_outpoints: List[str]) -> None:
+        tx = SimpleNamespace(
+            txid=txid, confirmation_time=SimpleNamespace(height=height, timestamp=height) if height else None
+        )
+        fulltxdetail = FullTxDetail(tx)  # type: ignore
+        fulltxdetail.inputs = {outpoint: None for outpoint in parent_outpoints}
+        fulltxdetails.append(fulltxdetail)
+
+    for i in range(n_singletons):
+        add(f"single{i}", height=1 + i, parent_outpoints=[f"external{i}:0"])
+
+    # large same-block clusters: a batched payout and children spending it (partly in chains)
+    for c in range(n_clusters):
+        height = n_singletons + 1 + c
+        add(f"batch{c}", height=height, parent_outpoints=[f"external-batch{c}:0"])
+        for j in range(1, cluster_size):
+            parent = f"batch{c}" if j % 5 == 1 else f"cluster{c}-{j-1}"
+            add(
+                f"cluster{c}-{j}", height=height, parent_outpoints=[f"{parent}:{j % 7}", f"external{c}-{j}:0"]
+            )
+
+    # long unconfirmed chains
+    for c in range(n_chains):
+        add(f"chain{c}-0", height=None, parent_outpoints=[f"single{c}:0"])
+        for j in range(1, chain_length):
+            add(f"chain{c}-{j}", height=None, parent_outpoints=[f"chain{c}-{j-1}:0"])
+
+    rng.shuffle(fulltxdetails)
+    return {fulltxdetail.txid: fulltxdetail for fulltxdetail in fulltxdetails}
+
+
+def test_benchmark_topological_order_50k():
+    dict_fulltxdetail = synthetic_wallet()
+    assert len(dict_fulltxdetail) == 50_000
+
+    order = TopologicalTxOrder()
+    start_time = time()
+    sorted_txids = order.update(dict_fulltxdetail)
+    duration_full = time() - start_time
+    assert_valid_order(sorted_txids, dict_fulltxdetail)
+
+    # a delta with 3 new unconfirmed transactions only re-sorts the unconfirmed group
+    for i in range(3):
+        tx = SimpleNamespace(txid=f"new{i}", confirmation_time=None)
+        fulltxdetail = FullTxDetail(tx)  # type: ignore
+        fulltxdetail.inputs = {f"chain{i}-999:0": None}
+        dict_fulltxdetail[fulltxdetail.txid] = fulltxdetail
+    start_time = time()
+    sorted_txids = order.update(dict_fulltxdetail)
+    duration_delta = time() - start_time
+    assert_valid_order(sorted_txids, dict_fulltxdetail)
+
+    start_time = time()
+    order.update(dict_fulltxdetail)
+    duration_unchanged = time() - start_time
+
+    logger.info(
+        f"TopologicalTxOrder with {len(dict_fulltxdetail)} txs: full {duration_full:.3f}s, "
+        f"delta {duration_delta:.3f}s, unchanged {duration_unchanged:.3f}s"
+    )
+    # generous bounds (the previous pairwise comparison needed minutes)
+    assert duration_full < 10
+    assert duration_delta < duration_full
@@ -0,0 +1,84 @@
+#
+# Bitcoin Safe
+# Copyright (C) 2024 Andreas Griffin
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of version 3 of the GNU General Public License as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see https://www.gnu.org/licenses/gpl-3.0.html
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS
+# BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN
+# ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN
+# CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+from typing import Dict, List
+
+from bitcoin_safe.pythonbdk_types import OutPoint, PythonUtxo
+from bitcoin_safe.txo_registry import TxoRegistry
+
+
+def make_txo(txid: str, vout: int, address: str) -> PythonUtxo:
+    return PythonUtxo(address=address, outpoint=OutPoint(txid=txid, vout=vout), txout=None)  # type: ignore
+
+
+class FakeWallet:
+    "Returns the identical dicts, until set_txos is called (like the cache of Wallet)"
+
+    def __init__(self, id: str, txos: List[PythonUtxo], my_addresses: List[str]) -> None:
+        self.id = id
+        self.set_txos(txos, my_addresses)
+
+    def set_txos(self, txos: List[PythonUtxo], my_addresses: List[str]) -> None:
+        self._all_txos = {str(txo.outpoint): txo for txo in txos}
+        self._my_txos = {key: txo for key, txo in self._all_txos.items() if txo.address in my_addresses}
+
+    def get_all_txos_dict(self, include_not_mine=False) -> Dict[str, PythonUtxo]:
+        return self._all_txos if include_not_mine else self._my_txos
+
+
+def test_txo_registry():
+    txo_a0 = make_txo("a", 0, "addr_a")
+    txo_a1 = make_txo("a", 1, "addr_b")  # a payment from wallet a to wallet b
+    txo_b0 = make_txo("b", 0, "addr_b2")
+    wallet_a = FakeWallet("a", [txo_a0, txo_a1], my_addresses=["addr_a"])
+    wallet_b = FakeWallet("b", [txo_a1], my_addresses=["addr_b"])
+    wallets = {"a": wallet_a, "b": wallet_b}
+    registry = TxoRegistry(get_wallets=lambda: wallets)
+
+    assert registry.get("a:0") == (txo_a0, "a")
+    # the owning wallet is preferred
+    assert registry.get(OutPoint(txid="a", vout=1)) == (txo_a1, "b")
+    assert registry.get("b:0") is None
+
+    # a txo that is not mine
+    wallet_b.set_txos([txo_a1, txo_b0], my_addresses=["addr_b"])
+    assert registry.get("b:0") is None
+    assert registry.get("b:0", include_not_mine=True) == (txo_b0, "b")
+    # newly revealed address
+    wallet_b.set_txos([txo_a1, txo_b0], my_addresses=["addr_b", "addr_b2"])
+    assert registry.get("b:0") == (txo_b0, "b")
+    assert registry.get_python_txos(["a:0", "b:0", "c:0"]) == {"a:0": txo_a0, "b:0": txo_b0}
+
+    # removed txos and closed wallets
+    wallet_a.set_txos([txo_a1], my_addresses=["addr_a"])
+    assert registry.get("a:0", include_not_mine=True) is None
+    del wallets["b"]
+    assert registry.get("a:1") is None
+    assert registry.get("a:1", include_not_mine=True) == (txo_a1, "a")
+    assert registry.get("b:0", include_not_mine=True) is None
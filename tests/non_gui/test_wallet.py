@@ -28,6 +28,9 @@
 
 
 import logging
+import os
+import tempfile
+from pathlib import Path
 from typing import List, Optional
 
 import bdkpython as bdk
@@ -36,6 +39,7 @@ from bitcoin_usb.software_signer import derive
 
 from bitcoin_safe.config import UserConfig
 from bitcoin_safe.keystore import KeyStore
+from bitcoin_safe.pythonbdk_types import BlockchainType
 from bitcoin_safe.wallet import ProtoWallet, Wallet, WalletInputsInconsistentError
 
 from ..test_helpers import test_config, test_config_main_chain  # type: ignore
@@ -411,6 +415,56 @@ def test_wallet_dump_and_restore(test_config: UserConfig):
         assert org_keystore.is_equal(restored_keystore)
 
 
+def test_wallet_snapshot(test_config: UserConfig):
+    "The snapshot serializes like the wallet, and doesn't change with the wallet"
+    protowallet = create_multisig_protowallet(
+        threshold=2,
+        signers=3,
+        key_origins=[f"m/{i}h/1h/0h/2h" for i in range(3)],
+        wallet_id="some id",
+        network=test_config.network,
+    )
+    wallet = Wallet.from_protowallet(protowallet=protowallet, config=test_config)
+    wallet.labels.set_addr_label("some address", "some label")
+
+    snapshot = wallet.snapshot()
+    expected = wallet.dumps(indent=4)
+    assert Wallet.dumps_snapshot(snapshot, indent=4) == expected
+
+    wallet.labels.set_addr_label("some address", "changed label")
+    wallet._tips[0] += 1
+    assert Wallet.dumps_snapshot(snapshot, indent=4) == expected
+
+
+def test_advance_tips_by_gap_in_one_pass(test_config: UserConfig):
+    "Used addresses far beyond the tip are found with the look-ahead, and revealed at once"
+    protowallet = create_multisig_protowallet(
+        threshold=1,
+        signers=1,
+        key_origins=["m/84h/1h/0h"],
+        wallet_id="some id",
+        network=test_config.network,
+    )
+    protowallet.gap = 20
+    wallet = Wallet.from_protowallet(protowallet=protowallet, config=test_config)
+    gap = wallet.gap
+
+    used_indexes = [5, 5 + gap, 5 + 2 * gap, 5 + 3 * gap - 1]
+    used_addresses = {wallet.bdkwallet.peek_address(index, is_change=False) for index in used_indexes}
+    # not reachable, since there are more than gap unused addresses in between
+    used_addresses.add(wallet.bdkwallet.peek_address(used_indexes[-1] + gap + 1, is_change=False))
+    wallet.address_is_used = lambda address: address in used_addresses  # type: ignore
+
+    target = used_indexes[-1] + gap
+    assert wallet.advance_tips_by_gap()[0] == target
+    assert wallet.tips[0] == target
+    assert wallet.get_receiving_addresses() == [
+        wallet.bdkwallet.peek_address(index, is_change=False) for index in range(target + 1)
+    ]
+    # converged
+    assert wallet.advance_tips_by_gap() == (0, 0)
+
+
 def test_bacon_wallet_tx_are_fetched(test_config_main_chain: UserConfig):
     wallet_id = "bacon wallet"
     expected_descriptor = "wpkh([9a6a2580/84h/0h/0h]xpub6DEzNop46vmxR49zYWFnMwmEfawSNmAMf6dLH5YKDY463twtvw1XD7ihwJRLPRGZJz799VPFzXHpZu6WdhT29WnaeuChS6aZHZPFmqczR5K/<0;1>/*)#fkxd7j3k"
@@ -435,3 +489,110 @@ def test_bacon_wallet_tx_are_fetched(test_config_main_chain: UserConfig):
     tx_list = wallet.sorted_delta_list_transactions()
     assert len(tx_list) >= 28
     assert tx_list[0].txid == "5d321554674865dffb7a5406002ba5d68d4819d0eff805393d4917921d68f3c5"
+
+
+def test_chain_state_db():
+    class ChainStateConfig(UserConfig):
+        config_dir = Path(tempfile.mkdtemp())
+
+    config = ChainStateConfig()
+    config.network = bdk.Network.REGTEST
+    config.network_config.server_type = BlockchainType.Electrum
+
+    protowallet = create_multisig_protowallet(
+        threshold=1, signers=1, key_origins=["m/84h/1h/0h"], wallet_id="chain state", network=config.network
+    )
+    wallet = Wallet.from_protowallet(protowallet, config)
+    db_file = wallet._chain_state_db_file()
+    assert os.path.isfile(db_file)
+    # reopening uses the same db
+    wallet = Wallet.from_protowallet(protowallet, config)
+    assert wallet._chain_state_db_file() == db_file
+
+    # a different descriptor has its own chain state
+    other_protowallet = create_multisig_protowallet(
+        threshold=1, signers=1, key_origins=["m/84h/1h/1h"], wallet_id="chain state", network=config.network
+    )
+    assert Wallet.from_protowallet(other_protowallet, config)._chain_state_db_file() != db_file
+
+    # a corrupted db is replaced
+    with open(db_file, "wb") as file:
+        file.write(b"not a sqlite db" * 100)
+    wallet = Wallet.from_protowallet(protowallet, config)
+    assert wallet.get_addresses()
+    with open(db_file, "rb") as file:
+        assert file.read(15) == b"SQLite format 3"
+
+    # wallets that are saved encrypted do not leave the chain state on disk
+    Wallet(
+        protowallet.id,
+        wallet.multipath_descriptor.as_string_private(),
+        keystores=wallet.keystores,
+        network=config.network,
+        config=config,
+        persist_chain_state=False,
+    )
+    assert not os.path.isfile(db_file)
+
+
+def test_chain_state_db_removed_when_saved_with_password():
+    class ChainStateConfig(UserConfig):
+        config_dir = Path(tempfile.mkdtemp())
+
+    config = ChainStateConfig()
+    config.network = bdk.Network.REGTEST
+    config.network_config.server_type = BlockchainType.Electrum
+
+    protowallet = create_multisig_protowallet(
+        threshold=1, signers=1, key_origins=["m/84h/1h/0h"], wallet_id="encrypted", network=config.network
+    )
+    wallet = Wallet.from_protowallet(protowallet, config)
+    db_file = wallet._chain_state_db_file()
+    assert os.path.isfile(db_file)
+
+    # saving without a password keeps the chain state
+    wallet_file = os.path.join(config.wallet_dir, "encrypted.wallet")
+    wallet.save(wallet_file)
+    assert os.path.isfile(db_file)
+    assert wallet._uses_chain_state_db()
+
+    # saving with a password moves the chain state into memory
+    addresses = wallet.get_addresses()
+    wallet.save(wallet_file, password="password")
+    assert not os.path.isfile(db_file)
+    assert not wallet._uses_chain_state_db()
+    assert wallet.get_addresses() == addresses
+
+    # a changed password doesn't create the db again
+    assert not wallet.set_password_protected(True)
+    wallet.save(wallet_file, password="new password")
+    assert not os.path.isfile(db_file)
+
+    reopened_wallet = Wallet.from_file(wallet_file, config, password="new password")
+    assert not reopened_wallet._uses_chain_state_db()
+    assert not os.path.isfile(db_file)
+
+
+def test_chain_state_db_removed_after_rename():
+    class ChainStateConfig(UserConfig):
+        config_dir = Path(tempfile.mkdtemp())
+
+    config = ChainStateConfig()
+    config.network = bdk.Network.REGTEST
+    config.network_config.server_type = BlockchainType.Electrum
+
+    protowallet = create_multisig_protowallet(
+        threshold=1, signers=1, key_origins=["m/84h/1h/0h"], wallet_id="old name", network=config.network
+    )
+    wallet = Wallet.from_protowallet(protowallet, config)
+    db_file = wallet._chain_state_db_file()
+    assert os.path.isfile(db_file)
+
+    # the renamed wallet keeps its chain state
+    wallet.set_wallet_id("new name")
+    assert wallet._chain_state_db_file() == db_file
+
+    # and deletes it, when it is saved with a password
+    wallet.save(os.path.join(config.wallet_dir, "new name.wallet"), password="password")
+    assert not os.path.isfile(db_file)
+    assert not os.listdir(os.path.dirname(db_file))
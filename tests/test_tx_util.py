@@ -27,6 +27,8 @@
 # SOFTWARE.
 
 
+from typing import List, Optional, Tuple
+
 import bdkpython as bdk
 
 from bitcoin_safe.util import serialized_to_hex
@@ -57,3 +59,61 @@ testnet_V0_P2WPKH = "02000000000101b510088211a0ce4f2a11ad3e2dd3bc58eb1546e82f2dc
 testnet_single_sig = "01000000012bdef9b8c5accc612b9a224ea10ed41766c81e9f5843cd307890c772e5a8c940030000006a4730440220727bd733c14c4acdce4d540ab7322f1d8cb2a7dfd52b01478a7e6b1f0bcdc133022061740b54a0391c16c1dcfa271fda36e8cd64c2edacc02135d6b149b91fd3e8370121037435c194e9b01b3d7f7a2802d6684a3af68d05bbf4ec8f17021980d777691f1dfdffffff040000000000000000536a4c5054325b4eafb44dafd23822773389a2ef237622d8d4301fce3ae4efc225d9d60178028d36b669d3ef162372c84d2f42af1a6db00930e0c15ad0353d9ede775024eb68c500276110000300276028001d4a10270000000000001976a914000000000000000000000000000000000000000088ac10270000000000001976a914000000000000000000000000000000000000000088ac85416c32000000001976a914ba27f99e007c7f605a8305e318c1abde3cd220ac88ac00000000"
 # bb44e92d86bb93e0c07b12bb25fa22a140555acdf5c962ce842545bc71fc280b
 testnet_tr_single = "02000000000101ca811846625fca3ea3128bb604865b7849d94e907d68a4d987f38c32b2e6ac3f0100000000ffffffff02400d03000000000022512071bf4399511a0483e9cfb4c9f730a74e89473009035c23527695d2e425f01275fcf3020000000000225120d96a99b93e0bf0318e780556f1ff51992e16d3a9c1587dc75552c52053fb6ad0014042a596571709ab7f769964bb90d519929c50e16fbcc320c54d4e247522e0bcf08a99482897b2a6a8d63b1256cdeb131bb1f4b781e90bbf30dc6f3284b8fad08d00000000"
+
+
+##### synthetic transactions
+
+
+def _varint(n: int) -> bytes:
+    if n < 0xFD:
+        return n.to_bytes(1, "little")
+    if n <= 0xFFFF:
+        return b"\xfd" + n.to_bytes(2, "little")
+    return b"\xfe" + n.to_bytes(4, "little")
+
+
+def p2wpkh_script(i: int) -> bytes:
+    "A unique (unspendable) p2wpkh script_pubkey for each i"
+    return bytes([0x00, 0x14]) + i.to_bytes(20, "big")
+
+
+def p2wpkh_address(i: int, network=bdk.Network.REGTEST) -> str:
+    return bdk.Address.from_script(bdk.Script(list(p2wpkh_script(i))), network).as_string()
+
+
+def synthetic_transaction(inputs: List[Tuple[str, int]], outputs: List[Tuple[int, bytes]]) -> bdk.Transaction:
+    """Builds an unsigned (legacy serialized) transaction.
+
+    inputs: [(prev txid, prev vout)], must not be empty
+    outputs: [(value, script_pubkey)]
+    """
+    raw = (2).to_bytes(4, "little")
+    raw += _varint(len(inputs))
+    for txid, vout in inputs:
+        raw += bytes.fromhex(txid)[::-1] + vout.to_bytes(4, "little") + b"\x00" + b"\xfd\xff\xff\xff"
+    raw += _varint(len(outputs))
+    for value, script in outputs:
+        raw += value.to_bytes(8, "little") + _varint(len(script)) + script
+    raw += (0).to_bytes(4, "little")
+    return bdk.Transaction(list(raw))
+
+
+def synthetic_tx_details(
+    inputs: List[Tuple[str, int]],
+    outputs: List[Tuple[int, bytes]],
+    height: Optional[int] = None,
+    fee: int = 1000,
+    received: int = 0,
+    sent: int = 0,
+) -> bdk.TransactionDetails:
+    tx = synthetic_transaction(inputs, outputs)
+    return bdk.TransactionDetails(
+        transaction=tx,
+        fee=fee,
+        received=received,
+        sent=sent,
+        txid=tx.txid(),
+        confirmation_time=(
+            bdk.BlockTime(height=height, timestamp=1_600_000_000 + height * 600) if height else None
+        ),
+    )